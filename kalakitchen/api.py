@@ -3,6 +3,7 @@ KalaKitchen FastAPI Server
 """
 from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from typing import Optional
 import uvicorn
 from .workflow import KalaKitchenWorkflow
@@ -26,15 +27,27 @@ app.add_middleware(
 # Initialize workflow
 workflow = KalaKitchenWorkflow()
 
+@app.on_event("startup")
+async def startup():
+    """Open the shared HTTP pool and warm persistent caches before serving requests"""
+    await workflow.warm_up()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Close pooled HTTP connections"""
+    await workflow.close()
+
 @app.post("/analyze", response_model=dict)
 async def analyze_video(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     language: str = "en",
-    region: str = "US"
+    region: str = "US",
+    fast_report: bool = False
 ):
     """
-    Upload and analyze a cooking video
+    Upload and analyze a cooking video. fast_report=true skips Gemini for
+    the learner pack and summary and fills them from templates.
     """
     try:
         # Validate file
@@ -46,7 +59,7 @@ async def analyze_video(
         
         # Start analysis
         video_id = await workflow.analyze_video(
-            video_content, file.filename, language, region
+            video_content, file.filename, language, region, fast_report
         )
         
         return {
@@ -58,6 +71,24 @@ async def analyze_video(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/resume/{video_id}", response_model=dict)
+async def resume_analysis(video_id: str):
+    """
+    Resume a failed or interrupted analysis from its last completed stages
+    """
+    try:
+        await workflow.resume_analysis(video_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="No checkpoint for this video")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    return {
+        "success": True,
+        "video_id": video_id,
+        "message": "Video analysis resumed"
+    }
+
 @app.get("/status/{video_id}", response_model=ProcessingStatus)
 async def get_status(video_id: str):
     """
@@ -92,7 +123,8 @@ async def get_result(video_id: str):
 async def analyze_video_sync(
     file: UploadFile = File(...),
     language: str = "en",
-    region: str = "US"
+    region: str = "US",
+    fast_report: bool = False
 ):
     """
     Upload and analyze a cooking video synchronously (waits for completion)
@@ -107,7 +139,7 @@ async def analyze_video_sync(
         
         # Run complete analysis
         result = await workflow.analyze_video_sync(
-            video_content, file.filename, language, region
+            video_content, file.filename, language, region, fast_report
         )
         
         return result
@@ -118,7 +150,20 @@ async def analyze_video_sync(
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "KalaKitchen"}
+    return {
+        "status": "healthy",
+        "service": "KalaKitchen",
+        "coalescing": workflow.get_coalescing_stats(),
+        "enrichment_store": workflow.get_enrichment_stats(),
+        "circuit_breakers": workflow.get_breaker_stats()
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    LLM call counts, latency/token histograms and cost in Prometheus text format
+    """
+    return workflow.get_metrics()
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+KalaKitchen Evidence Lookup Benchmark
+
+Compares per-ingredient scans of the transcript and keyframes with lookups
+in a prebuilt EvidenceIndex on a synthetic hour-long video:
+
+    python -m kalakitchen.benchmarks.evidence_index --minutes 60 --ingredients 25
+"""
+import argparse
+import random
+import time
+from kalakitchen.evidence import (
+    EvidenceIndex, extract_quantity_patterns, extract_visual_quantity_cues, contains_measurements
+)
+from kalakitchen.models import TranscriptSegment, KeyframeData
+
+INGREDIENTS = [
+    "onion", "garlic", "ginger", "tomato", "turmeric", "cumin seeds", "coriander powder",
+    "garam masala", "chili powder", "salt", "oil", "ghee", "rice", "flour", "sugar",
+    "milk", "yogurt", "butter", "green chili", "curry leaves", "mustard seeds", "lemon juice",
+    "potato", "carrot", "black pepper", "cinnamon", "cardamom", "bay leaf", "paneer", "cream"
+]
+
+PHRASES = [
+    "now add {q} {unit} of {name}",
+    "stir the {name} for a minute",
+    "we need about {q} {unit} {name} here",
+    "let it cook on medium heat",
+    "you can see the {name} turning golden",
+    "take a large bowl and mix everything",
+]
+
+UNITS = ["tsp", "tbsp", "cup", "cups", "g", "cloves"]
+
+def synthetic_video(minutes: int, seed: int):
+    """Transcript segments every 3s and keyframes every 5s"""
+    rng = random.Random(seed)
+    
+    def sentence():
+        return rng.choice(PHRASES).format(
+            q=rng.randint(1, 4), unit=rng.choice(UNITS), name=rng.choice(INGREDIENTS)
+        )
+    
+    transcript = [
+        TranscriptSegment(start=t, end=t + 3, text=sentence(), confidence=rng.randint(60, 95))
+        for t in range(0, minutes * 60, 3)
+    ]
+    keyframes = [
+        KeyframeData(
+            frame_id=f"frame_{t:05d}",
+            timestamp=t,
+            ocr_text=[sentence()] if rng.random() < 0.3 else [],
+            objects_detected=[],
+            description=f"a small bowl of {rng.choice(INGREDIENTS)} next to a pinch of salt"
+        )
+        for t in range(0, minutes * 60, 5)
+    ]
+    return transcript, keyframes
+
+def scan_evidence(name: str, transcript, keyframes) -> int:
+    """Per-ingredient substring scan, as done before the index"""
+    name = name.lower()
+    found = 0
+    for segment in transcript:
+        text = segment.text.lower()
+        if name in text:
+            found += len(extract_quantity_patterns(text))
+    for frame in keyframes:
+        for ocr_text in frame.ocr_text:
+            text = ocr_text.lower()
+            if name in text or contains_measurements(text):
+                found += len(extract_quantity_patterns(text))
+        description = frame.description.lower()
+        if name in description:
+            found += len(extract_visual_quantity_cues(description))
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description="KalaKitchen evidence lookup benchmark")
+    parser.add_argument("--minutes", type=int, default=60, help="Synthetic video length (default: 60)")
+    parser.add_argument("--ingredients", type=int, default=25, help="Ingredients looked up (default: 25)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    args = parser.parse_args()
+    
+    transcript, keyframes = synthetic_video(args.minutes, args.seed)
+    names = (INGREDIENTS * (args.ingredients // len(INGREDIENTS) + 1))[:args.ingredients]
+    
+    started = time.perf_counter()
+    for name in names:
+        scan_evidence(name, transcript, keyframes)
+    scan_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    index = EvidenceIndex(transcript, keyframes)
+    build_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    for name in names:
+        index.transcript_evidence(name)
+        index.ocr_evidence(name)
+        index.visual_evidence(name)
+    lookup_time = time.perf_counter() - started
+    
+    print("\n" + "=" * 60)
+    print(f"{len(transcript)} segments, {len(keyframes)} keyframes, {len(names)} ingredients")
+    print("=" * 60)
+    print(f"Scan:   {scan_time * 1000:.1f}ms")
+    print(f"Index:  {(build_time + lookup_time) * 1000:.1f}ms "
+          f"(build {build_time * 1000:.1f}ms, lookups {lookup_time * 1000:.2f}ms)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+KalaKitchen Nutrition Totals Benchmark
+
+Compares the per-ingredient loop over pydantic objects with the NumPy
+nutrient matrix on a synthetic recipe catalog, and times the Monte Carlo
+confidence intervals:
+    
+    python -m kalakitchen.benchmarks.nutrition_matrix --recipes 5000 --ingredients 15
+"""
+import argparse
+import random
+import time
+from kalakitchen.bots.nutrition_mapper import NutritionMapper
+from kalakitchen.models import Ingredient, NutritionPer100g
+from kalakitchen.nutrition_matrix import NutrientMatrix, NUTRIENTS
+
+def synthetic_catalog(recipes: int, ingredients: int, seed: int):
+    """Recipes sharing a pool of 200 ingredients with partial nutrition data"""
+    rng = random.Random(seed)
+    pool = [
+        NutritionPer100g(**{
+            nutrient: rng.uniform(0, 400) if rng.random() < 0.8 else None
+            for nutrient in NUTRIENTS
+        })
+        for _ in range(200)
+    ]
+    return [
+        [
+            Ingredient(
+                name=f"ingredient {rng.randrange(200)}",
+                original_text="",
+                quantity_in_grams=rng.uniform(2, 500) if rng.random() < 0.9 else None,
+                nutrition_per_100g=rng.choice(pool) if rng.random() < 0.85 else None
+            )
+            for _ in range(rng.randint(max(1, ingredients // 2), ingredients * 3 // 2))
+        ]
+        for _ in range(recipes)
+    ]
+
+def loop_totals(ingredients):
+    """Per-ingredient, per-nutrient accumulation, as done before the matrix"""
+    totals = dict.fromkeys(NUTRIENTS, 0.0)
+    for ingredient in ingredients:
+        if not ingredient.nutrition_per_100g or not ingredient.quantity_in_grams:
+            continue
+        scale_factor = ingredient.quantity_in_grams / 100.0
+        for nutrient in NUTRIENTS:
+            value = getattr(ingredient.nutrition_per_100g, nutrient)
+            if value:
+                totals[nutrient] += value * scale_factor
+    return totals
+
+def main():
+    parser = argparse.ArgumentParser(description="KalaKitchen nutrition totals benchmark")
+    parser.add_argument("--recipes", type=int, default=5000, help="Recipes in the catalog (default: 5000)")
+    parser.add_argument("--ingredients", type=int, default=15, help="Average ingredients per recipe (default: 15)")
+    parser.add_argument("--draws", type=int, default=2000, help="Monte Carlo draws per recipe for intervals (default: 2000)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    args = parser.parse_args()
+    
+    catalog = synthetic_catalog(args.recipes, args.ingredients, args.seed)
+    
+    started = time.perf_counter()
+    for recipe in catalog:
+        loop_totals(recipe)
+    loop_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    engine = NutrientMatrix.from_recipes(catalog)
+    build_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    engine.totals()
+    product_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    engine.intervals(args.draws, 0.9)
+    interval_time = time.perf_counter() - started
+    
+    mapper = NutritionMapper()
+    started = time.perf_counter()
+    for recipe in catalog:
+        mapper.calculate_nutrition_summary(recipe)
+    single_time = time.perf_counter() - started
+    
+    started = time.perf_counter()
+    mapper.calculate_nutrition_summaries(catalog)
+    batch_time = time.perf_counter() - started
+    
+    print("\n" + "=" * 60)
+    print(f"{args.recipes} recipes, {len(engine.grams)} ingredients, "
+          f"{len(engine.foods)} distinct foods, {len(NUTRIENTS)} nutrients")
+    print("=" * 60)
+    print(f"Loop totals:    {loop_time * 1000:.1f}ms")
+    print(f"Matrix totals:  {(build_time + product_time) * 1000:.1f}ms "
+          f"(pack {build_time * 1000:.1f}ms, product {product_time * 1000:.2f}ms)")
+    # Packing the pydantic objects costs about as much as the loop it replaces
+    print(f"Speedup: {loop_time / (build_time + product_time):.1f}x end to end, "
+          f"{loop_time / product_time:.0f}x once packed")
+    print(f"Matrix intervals: {interval_time * 1000:.1f}ms "
+          f"({interval_time * 1000 / args.recipes:.2f}ms per recipe, {args.draws} draws)")
+    print(f"Summaries one at a time: {single_time * 1000:.1f}ms")
+    print(f"Summaries in one batch:  {batch_time * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+KalaKitchen Pipeline Throughput Benchmark
+
+Record Gemini responses once with a live key, then replay them offline:
+
+    LLM_BACKEND=record python -m kalakitchen.benchmarks.pipeline_throughput videos/*.mp4
+    python -m kalakitchen.benchmarks.pipeline_throughput videos/*.mp4 --replay --latency 1.5 --error-rate 0.02
+"""
+import asyncio
+import argparse
+import statistics
+import time
+from pathlib import Path
+from kalakitchen.config import settings
+
+async def run_benchmark(video_paths, concurrency: int, repeat: int):
+    """Analyze every video `repeat` times with at most `concurrency` jobs in flight"""
+    
+    # Import after settings are adjusted so the gateway picks up the backend
+    from kalakitchen.workflow import KalaKitchenWorkflow
+    
+    workflow = KalaKitchenWorkflow()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    failures = 0
+    
+    async def analyze(video_path: Path):
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await workflow.analyze_video_sync(video_path.read_bytes(), video_path.name)
+                latencies.append(time.perf_counter() - started)
+            except Exception as e:
+                failures += 1
+                print(f"Analysis failed for {video_path.name}: {e}")
+    
+    started = time.perf_counter()
+    await asyncio.gather(*(analyze(path) for path in video_paths for _ in range(repeat)))
+    elapsed = time.perf_counter() - started
+    
+    print("\n" + "=" * 60)
+    print(f"BACKEND: {settings.LLM_BACKEND}")
+    print("=" * 60)
+    print(f"Jobs: {len(latencies)} completed, {failures} failed")
+    print(f"Wall time: {elapsed:.1f}s")
+    if latencies:
+        latencies.sort()
+        print(f"Throughput: {len(latencies) / elapsed * 60:.1f} videos/min")
+        print(f"Latency p50: {statistics.median(latencies):.2f}s")
+        print(f"Latency p95: {latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]:.2f}s")
+    print(f"Coalescing: {workflow.get_coalescing_stats()}")
+
+def main():
+    parser = argparse.ArgumentParser(description="KalaKitchen pipeline throughput benchmark")
+    parser.add_argument("videos", nargs="+", help="Cooking video files")
+    parser.add_argument("--concurrency", type=int, default=4, help="Jobs in flight (default: 4)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per video (default: 1)")
+    parser.add_argument("--replay", action="store_true", help="Serve Gemini from the cassette, offline")
+    parser.add_argument("--cassette", help="Cassette file (default: LLM_CASSETTE_PATH)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Injected replay latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Injected replay latency jitter in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Injected transient error rate (0-1)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for injected latency/errors")
+    
+    args = parser.parse_args()
+    
+    if args.cassette:
+        settings.LLM_CASSETTE_PATH = args.cassette
+    if args.replay:
+        settings.LLM_BACKEND = "replay"
+        settings.LLM_REPLAY_LATENCY_SECONDS = args.latency
+        settings.LLM_REPLAY_LATENCY_JITTER_SECONDS = args.jitter
+        settings.LLM_REPLAY_ERROR_RATE = args.error_rate
+        settings.LLM_REPLAY_SEED = args.seed
+    
+    # Every request should reach the backend, not the response cache
+    settings.LLM_CACHE_ENABLED = False
+    
+    video_paths = [Path(video) for video in args.videos]
+    missing = [str(path) for path in video_paths if not path.exists()]
+    if missing:
+        print(f"Error: Video file not found: {', '.join(missing)}")
+        return
+    
+    asyncio.run(run_benchmark(video_paths, args.concurrency, args.repeat))
+
+if __name__ == "__main__":
+    main()
@@ -1,22 +1,30 @@
 """
 ASRBot - Handles audio transcription using Whisper or Gemini
 """
+import asyncio
+import math
 import whisper
 import ffmpeg
 from pathlib import Path
-from typing import List
-import google.generativeai as genai
+from typing import List, Optional
 from ..models import TranscriptSegment
 from ..config import settings
+from ..llm.gateway import LLMGateway, get_default_gateway
+from ..llm.structured import StructuredResponder
+
+def whisper_confidence(avg_logprob: float) -> float:
+    """Whisper's average token log-probability as a 0-100 per-token probability"""
+    return min(100.0, max(0.0, math.exp(avg_logprob) * 100))
 
 class ASRBot:
-    def __init__(self):
+    def __init__(self, gateway: Optional[LLMGateway] = None):
         # Initialize Whisper model
         self.whisper_model = whisper.load_model(settings.WHISPER_MODEL)
         
-        # Configure Gemini
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.gemini_model = genai.GenerativeModel(settings.GEMINI_MODEL)
+        # Shared Gemini gateway
+        self.gateway = gateway or get_default_gateway()
+        self.llm = self.gateway.client("asr")
+        self.responder = StructuredResponder(self.llm)
     
     async def transcribe_video(self, video_path: Path, use_gemini: bool = False) -> List[TranscriptSegment]:
         """
@@ -26,14 +34,14 @@ class ASRBot:
         audio_path = video_path.parent / f"{video_path.stem}_audio.wav"
         
         try:
-            # Extract audio using ffmpeg
-            (
+            # Extract audio using ffmpeg, off the event loop so other stages keep running
+            extract = (
                 ffmpeg
                 .input(str(video_path))
                 .output(str(audio_path), acodec='pcm_s16le', ac=1, ar='16000')
                 .overwrite_output()
-                .run(quiet=True)
             )
+            await asyncio.get_running_loop().run_in_executor(None, lambda: extract.run(quiet=True))
             
             if use_gemini:
                 return await self._transcribe_with_gemini(audio_path)
@@ -47,10 +55,9 @@ class ASRBot:
     
     async def _transcribe_with_whisper(self, audio_path: Path) -> List[TranscriptSegment]:
         """Transcribe using Whisper model"""
-        result = self.whisper_model.transcribe(
-            str(audio_path),
-            word_timestamps=True,
-            verbose=False
+        result = await asyncio.get_running_loop().run_in_executor(
+            None,
+            lambda: self.whisper_model.transcribe(str(audio_path), word_timestamps=True, verbose=False)
         )
         
         segments = []
@@ -59,7 +66,7 @@ class ASRBot:
                 start=segment["start"],
                 end=segment["end"],
                 text=segment["text"].strip(),
-                confidence=segment.get("avg_logprob", 0.0) * 100  # Convert to 0-100 scale
+                confidence=whisper_confidence(segment.get("avg_logprob", 0.0))
             ))
         
         return segments
@@ -67,9 +74,6 @@ class ASRBot:
     async def _transcribe_with_gemini(self, audio_path: Path) -> List[TranscriptSegment]:
         """Transcribe using Gemini model"""
         try:
-            # Upload audio file to Gemini
-            audio_file = genai.upload_file(str(audio_path))
-            
             prompt = """
             Transcribe this audio file and provide timestamped segments.
             Return the result as a JSON array with objects containing:
@@ -81,19 +85,14 @@ class ASRBot:
             Focus on cooking-related terminology and preserve any non-English food terms.
             """
             
-            response = self.gemini_model.generate_content([prompt, audio_file])
-            
-            # Parse Gemini response (would need proper JSON parsing)
-            # For now, return a placeholder - in production, parse the JSON response
-            segments = [
-                TranscriptSegment(
-                    start=0.0,
-                    end=10.0,
-                    text="Gemini transcription placeholder",
-                    confidence=85.0
-                )
-            ]
+            # The gateway uploads the audio file only on a cache miss
+            segments = await self.responder.generate_list(
+                [prompt, audio_path], TranscriptSegment
+            )
+            if not segments:
+                raise ValueError("no valid transcript segments returned")
             
+            segments.sort(key=lambda segment: segment.start)
             return segments
             
         except Exception as e:
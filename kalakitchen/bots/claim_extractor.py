@@ -1,33 +1,96 @@
 """
 ClaimExtractor - Uses Gemini to extract structured recipe claims from multimodal data
 """
-import json
-from typing import List, Dict, Any
-import google.generativeai as genai
-from ..models import TranscriptSegment, KeyframeData, CookingStep, Ingredient, RecipeTitle
+import asyncio
+import re
+from typing import List, Dict, Any, Optional
+from ..models import (
+    TranscriptSegment, KeyframeData, CookingStep, Ingredient, RecipeTitle, ExtractedClaims
+)
 from ..config import settings, GEMINI_PROMPTS
+from ..llm.gateway import LLMGateway, get_default_gateway
+from ..llm.structured import StructuredResponder
+
+# Fields filled in by later pipeline stages, not requested from Gemini
+CLAIM_SCHEMA_EXCLUDE = {
+    "CookingStep": {"media_refs"},
+    "Ingredient": {
+        "quantity_in_grams", "medicinal_notes", "nutrition_per_100g",
+        "provenance", "substitutions", "cultural_notes"
+    },
+}
+
+# Steps from different windows starting this close together are the same step
+STEP_DUPLICATE_SECONDS = 5.0
 
 class ClaimExtractor:
-    def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.gemini_model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    def __init__(self, gateway: Optional[LLMGateway] = None):
+        self.gateway = gateway or get_default_gateway()
+        self.llm = self.gateway.client("claim_extractor")
+        self.responder = StructuredResponder(self.llm)
     
     async def extract_claims(self, 
                            transcript: List[TranscriptSegment],
                            keyframes: List[KeyframeData],
                            duration: float,
                            language: str = "en",
-                           region: str = "US") -> Dict[str, Any]:
+                           region: str = "US",
+                           map_reduce: Optional[bool] = None) -> Dict[str, Any]:
         """
-        Extract structured recipe claims using Gemini multimodal reasoning
+        Extract structured recipe claims using Gemini multimodal reasoning.
+        
+        When map_reduce is None it is enabled automatically for videos longer
+        than CLAIM_MAP_REDUCE_MIN_SECONDS.
         """
         
+        # Long videos are split into time windows and extracted concurrently
+        if map_reduce is None:
+            map_reduce = duration >= settings.CLAIM_MAP_REDUCE_MIN_SECONDS
+        if map_reduce:
+            try:
+                return await self._extract_claims_map_reduce(
+                    transcript, keyframes, duration, language, region
+                )
+            except Exception as e:
+                print(f"Map-reduce claim extraction failed: {e}")
+                return self._create_fallback_claims(transcript, keyframes, duration)
+        
         # Prepare transcript text
         transcript_text = self._format_transcript(transcript)
         
         # Prepare keyframe descriptions
         keyframe_text = self._format_keyframes(keyframes)
         
+        extraction_prompt = self._build_extraction_prompt(
+            transcript_text, keyframe_text, duration, language, region
+        )
+        
+        try:
+            # Schema-constrained, incrementally parsed Gemini response
+            claims = await self.responder.generate_model(
+                extraction_prompt, ExtractedClaims, exclude=CLAIM_SCHEMA_EXCLUDE
+            )
+            if claims is None:
+                return self._create_fallback_claims(transcript, keyframes, duration)
+            
+            # Convert to structured models
+            structured_claims = self._structure_claims(claims.dict(), transcript, keyframes)
+            
+            return structured_claims
+            
+        except Exception as e:
+            print(f"Claim extraction failed: {e}")
+            return self._create_fallback_claims(transcript, keyframes, duration)
+    
+    def _build_extraction_prompt(self,
+                                 transcript_text: str,
+                                 keyframe_text: str,
+                                 duration: float,
+                                 language: str,
+                                 region: str,
+                                 window_note: str = "") -> str:
+        """Build the full claim extraction prompt"""
+        
         # Create comprehensive prompt
         prompt = GEMINI_PROMPTS["claim_extraction"].format(
             transcript=transcript_text,
@@ -38,9 +101,9 @@ class ClaimExtractor:
         )
         
         # Add detailed extraction instructions
-        extraction_prompt = f"""
+        return f"""
         {prompt}
-        
+        {window_note}
         EXTRACTION REQUIREMENTS:
         
         1. RECIPE TITLE:
@@ -79,21 +142,233 @@ class ClaimExtractor:
         Return structured JSON with all extracted information and confidence scores.
         Preserve cultural authenticity - don't anglicize ingredient names.
         """
+    
+    async def _extract_claims_map_reduce(self,
+                                       transcript: List[TranscriptSegment],
+                                       keyframes: List[KeyframeData],
+                                       duration: float,
+                                       language: str,
+                                       region: str) -> Dict[str, Any]:
+        """Extract partial claims per time window concurrently, then merge locally"""
         
-        try:
-            response = self.gemini_model.generate_content(extraction_prompt)
-            
-            # Parse Gemini's JSON response
-            claims_data = self._parse_gemini_response(response.text)
-            
-            # Convert to structured models
-            structured_claims = self._structure_claims(claims_data, transcript, keyframes)
+        windows = self._build_windows(transcript, keyframes, duration)
+        semaphore = asyncio.Semaphore(settings.CLAIM_MAX_CONCURRENT_WINDOWS)
+        
+        async def extract_window(index: int, window: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                return await self._extract_window_claims(
+                    window, index, len(windows), duration, language, region
+                )
+        
+        results = await asyncio.gather(
+            *(extract_window(i, window) for i, window in enumerate(windows))
+        )
+        extracted = [(window, partial) for window, partial in zip(windows, results) if partial]
+        
+        if not extracted:
+            return self._create_fallback_claims(transcript, keyframes, duration)
+        
+        claims_data = self._reduce_window_claims(
+            [partial for _, partial in extracted], [window for window, _ in extracted]
+        )
+        claims_data["windows"] = len(windows)
+        
+        return self._structure_claims(claims_data, transcript, keyframes)
+    
+    def _build_windows(self,
+                       transcript: List[TranscriptSegment],
+                       keyframes: List[KeyframeData],
+                       duration: float) -> List[Dict[str, Any]]:
+        """Split the transcript/keyframe timeline into fixed-size time windows"""
+        
+        window_size = settings.CLAIM_WINDOW_SECONDS
+        overlap = settings.CLAIM_WINDOW_OVERLAP_SECONDS
+        
+        # Cover the full timeline even if metadata under-reports the duration
+        timeline_end = max(
+            [duration] +
+            [segment.end for segment in transcript] +
+            [frame.timestamp for frame in keyframes]
+        )
+        
+        windows = []
+        start = 0.0
+        while start < timeline_end or not windows:
+            end = start + window_size
+            # Overlap gives each window some context from its neighbours
+            context_start = max(0.0, start - overlap)
+            context_end = end + overlap
             
-            return structured_claims
+            windows.append({
+                "start": start,
+                "end": end,
+                "segments": [
+                    segment for segment in transcript
+                    if segment.end > context_start and segment.start < context_end
+                ],
+                "keyframes": [
+                    frame for frame in keyframes
+                    if context_start <= frame.timestamp < context_end
+                ]
+            })
+            start = end
+        
+        # Windows without any evidence would only produce hallucinated claims
+        return [w for w in windows if w["segments"] or w["keyframes"]] or windows[:1]
+    
+    async def _extract_window_claims(self,
+                                   window: Dict[str, Any],
+                                   index: int,
+                                   window_count: int,
+                                   duration: float,
+                                   language: str,
+                                   region: str) -> Optional[Dict[str, Any]]:
+        """Extract partial claims for a single time window"""
+        
+        window_note = f"""
+        PARTIAL VIDEO WINDOW {index + 1} OF {window_count}:
+        This input covers only {window['start']:.1f}s - {window['end']:.1f}s of the video
+        (plus a little surrounding context). Report only steps that start, and
+        ingredients that are added, within {window['start']:.1f}s - {window['end']:.1f}s.
+        Keep all timestamps absolute (seconds from the start of the full video).
+        """
+        
+        prompt = self._build_extraction_prompt(
+            self._format_transcript(window["segments"]),
+            self._format_keyframes(window["keyframes"]),
+            duration, language, region, window_note
+        )
+        
+        try:
+            claims = await self.responder.generate_model(
+                prompt, ExtractedClaims, exclude=CLAIM_SCHEMA_EXCLUDE
+            )
+            return claims.dict() if claims else None
             
         except Exception as e:
-            print(f"Claim extraction failed: {e}")
-            return self._create_fallback_claims(transcript, keyframes, duration)
+            print(f"Claim extraction failed for window {index + 1}/{window_count}: {e}")
+            return None
+    
+    def _reduce_window_claims(self,
+                              partials: List[Dict[str, Any]],
+                              windows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Merge partial window claims into a single claims dictionary.
+        
+        Windows overlap, so the same step or ingredient mention can be
+        reported by two neighbouring windows. Steps from different windows
+        starting within STEP_DUPLICATE_SECONDS are kept once; ingredient
+        mentions are located in the transcript and counted once per
+        transcript segment.
+        """
+        
+        # Recipe title: keep the most confident candidate
+        titles = [p.get("recipe_title") for p in partials if isinstance(p.get("recipe_title"), dict)]
+        recipe_title = max(titles, key=lambda t: t.get("confidence", 0), default={})
+        
+        # Steps: order by time and drop duplicates reported by adjacent windows
+        steps = []
+        kept_starts = []
+        all_steps = [
+            (i, s) for i, p in enumerate(partials) for s in p.get("steps", []) if isinstance(s, dict)
+        ]
+        for window_index, step in sorted(
+            all_steps, key=lambda item: (item[1].get("start") or 0.0, item[1].get("end") or 0.0)
+        ):
+            start = step.get("start") or 0.0
+            if any(index != window_index and abs(start - kept) <= STEP_DUPLICATE_SECONDS
+                   for index, kept in kept_starts):
+                continue
+            kept_starts.append((window_index, start))
+            steps.append(step)
+        
+        # Ingredients: deduplicate by normalized name and combine quantities
+        ingredients: Dict[str, Dict[str, Any]] = {}
+        seen_mentions = set()
+        for partial, window in zip(partials, windows):
+            for ing in partial.get("ingredients", []):
+                if not isinstance(ing, dict) or not ing.get("name"):
+                    continue
+                key = self._normalize_name(ing["name"])
+                mention_time = self._mention_time(ing, window["segments"])
+                if mention_time is not None:
+                    mention = (key, mention_time)
+                else:
+                    mention = (key, self._normalize_name(ing.get("original_text") or ""),
+                               ing.get("quantity"), (ing.get("unit") or "").lower())
+                if mention in seen_mentions:
+                    # Same mention reported by the neighbouring window
+                    continue
+                seen_mentions.add(mention)
+                if key in ingredients:
+                    ingredients[key] = self._merge_ingredient_claims(ingredients[key], ing)
+                else:
+                    ingredients[key] = dict(ing)
+        
+        # Tools: case-insensitive union, preserving first-seen order
+        tools = []
+        seen_tools = set()
+        for partial in partials:
+            for tool in partial.get("tools", []):
+                name = tool.get("name", "") if isinstance(tool, dict) else str(tool)
+                key = self._normalize_name(name)
+                if key and key not in seen_tools:
+                    seen_tools.add(key)
+                    tools.append(name)
+        
+        return {
+            "recipe_title": recipe_title,
+            "steps": steps,
+            "ingredients": list(ingredients.values()),
+            "tools": tools
+        }
+    
+    def _merge_ingredient_claims(self, existing: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+        """Combine two claims for the same ingredient from different windows"""
+        merged = dict(existing)
+        
+        existing_qty, new_qty = existing.get("quantity"), new.get("quantity")
+        existing_unit = (existing.get("unit") or "").lower()
+        new_unit = (new.get("unit") or "").lower()
+        
+        if isinstance(existing_qty, (int, float)) and isinstance(new_qty, (int, float)):
+            if existing_unit == new_unit:
+                # Same ingredient added again later in the video
+                merged["quantity"] = existing_qty + new_qty
+                merged["estimated"] = bool(existing.get("estimated")) or bool(new.get("estimated"))
+            elif existing.get("estimated") and not new.get("estimated"):
+                # Units differ: prefer the explicitly stated amount
+                merged["quantity"], merged["unit"] = new_qty, new.get("unit")
+                merged["estimated"] = False
+                merged["estimation_method"] = new.get("estimation_method")
+        elif not isinstance(existing_qty, (int, float)) and isinstance(new_qty, (int, float)):
+            merged["quantity"], merged["unit"] = new_qty, new.get("unit")
+            merged["estimated"] = new.get("estimated", False)
+            merged["estimation_method"] = new.get("estimation_method")
+        
+        texts = [t for t in (existing.get("original_text"), new.get("original_text")) if t]
+        merged["original_text"] = "; ".join(dict.fromkeys(texts))
+        merged["uses"] = list(dict.fromkeys(existing.get("uses", []) + new.get("uses", [])))
+        
+        return merged
+    
+    def _mention_time(self,
+                      ingredient: Dict[str, Any],
+                      segments: List[TranscriptSegment]) -> Optional[float]:
+        """Start of the transcript segment an ingredient claim was taken from, if it can be found"""
+        for text in (ingredient.get("original_text"), ingredient.get("name")):
+            needle = self._normalize_name(text or "")
+            if not needle:
+                continue
+            for segment in segments:
+                if needle in self._normalize_name(segment.text):
+                    return segment.start
+        return None
+    
+    def _normalize_name(self, name: str) -> str:
+        """Normalize a name for deduplication (case, punctuation, whitespace)"""
+        name = re.sub(r'[^\w\s]', ' ', name.lower())
+        return " ".join(name.split())
     
     def _format_transcript(self, transcript: List[TranscriptSegment]) -> str:
         """Format transcript for Gemini analysis"""
@@ -118,31 +393,6 @@ class ClaimExtractor:
         
         return "\n".join(formatted)
     
-    def _parse_gemini_response(self, response_text: str) -> Dict[str, Any]:
-        """Parse Gemini's JSON response"""
-        try:
-            # Try to extract JSON from response
-            import re
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                return json.loads(json_match.group())
-            else:
-                # Fallback parsing if no JSON found
-                return self._parse_text_response(response_text)
-        except json.JSONDecodeError:
-            return self._parse_text_response(response_text)
-    
-    def _parse_text_response(self, response_text: str) -> Dict[str, Any]:
-        """Fallback parser for non-JSON responses"""
-        # Basic text parsing as fallback
-        return {
-            "recipe_title": {"text": "Recipe from video", "confidence": 50},
-            "steps": [],
-            "ingredients": [],
-            "tools": [],
-            "raw_response": response_text
-        }
-    
     def _structure_claims(self, claims_data: Dict[str, Any], 
                          transcript: List[TranscriptSegment],
                          keyframes: List[KeyframeData]) -> Dict[str, Any]:
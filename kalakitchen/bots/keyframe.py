@@ -1,20 +1,21 @@
 """
 KeyframeBot - Handles keyframe analysis, OCR, and object detection
 """
+import asyncio
 import cv2
 import pytesseract
 from pathlib import Path
-from typing import List, Dict
-import google.generativeai as genai
+from typing import List, Dict, Optional
 from PIL import Image
 from ..models import KeyframeData
 from ..config import settings
+from ..llm.gateway import LLMGateway, get_default_gateway
 
 class KeyframeBot:
-    def __init__(self):
-        # Configure Gemini for vision tasks
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.gemini_model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    def __init__(self, gateway: Optional[LLMGateway] = None):
+        # Shared Gemini gateway for vision tasks
+        self.gateway = gateway or get_default_gateway()
+        self.llm = self.gateway.client("keyframe")
     
     async def analyze_keyframes(self, keyframes_dir: Path) -> List[KeyframeData]:
         """
@@ -41,11 +42,10 @@ class KeyframeBot:
         """Analyze a single keyframe"""
         frame_id = frame_path.stem
         
-        # Load image
-        image = cv2.imread(str(frame_path))
-        
-        # Extract OCR text
-        ocr_text = self._extract_ocr_text(image)
+        # Load image and extract OCR text off the event loop
+        ocr_text = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: self._extract_ocr_text(cv2.imread(str(frame_path)))
+        )
         
         # Use Gemini for object detection and scene description
         objects_detected, description = await self._analyze_with_gemini(frame_path)
@@ -110,9 +110,6 @@ class KeyframeBot:
     async def _analyze_with_gemini(self, frame_path: Path) -> tuple[List[str], str]:
         """Use Gemini Vision to analyze the frame"""
         try:
-            # Upload image to Gemini
-            image_file = genai.upload_file(str(frame_path))
-            
             prompt = """
             Analyze this cooking video frame and identify:
             
@@ -131,7 +128,8 @@ class KeyframeBot:
             DESCRIPTION: [detailed scene description]
             """
             
-            response = self.gemini_model.generate_content([prompt, image_file])
+            # The gateway uploads the frame only on a cache miss
+            response = await self.llm.generate_content_async([prompt, frame_path])
             response_text = response.text
             
             # Parse response
@@ -1,12 +1,23 @@
 """
 NutritionMapper - Calculates nutrition totals and per-serving values
 """
+import numpy as np
 from typing import List, Dict, Optional
-from ..models import Ingredient, NutritionSummary, NutritionPer100g
+from ..config import settings
+from ..models import Ingredient, NutrientInterval, NutritionSummary
+from ..nutrition_matrix import NutrientMatrix, NUTRIENTS
+
+# Main ingredients that set the serving count, checked in order, with grams per serving
+MAIN_INGREDIENT_SERVINGS = [
+    ('rice', 75), ('pasta', 75),                    # dry rice/pasta
+    ('chicken', 150), ('beef', 150), ('fish', 150),  # protein
+    ('flour', 100),                                 # baked goods
+]
 
 class NutritionMapper:
     def __init__(self):
-        pass
+        # Serving size per ingredient name, memoized across recipes
+        self._serving_sizes: Dict[str, float] = {}
     
     def calculate_nutrition_summary(self, 
                                   ingredients: List[Ingredient],
@@ -14,123 +25,136 @@ class NutritionMapper:
         """
         Calculate total nutrition and per-serving values
         """
-        # Calculate totals
-        totals = self._calculate_totals(ingredients)
+        return self.calculate_nutrition_summaries([ingredients], [estimated_servings])[0]
+    
+    def calculate_nutrition_summaries(self,
+                                      recipes: List[List[Ingredient]],
+                                      servings: Optional[List[Optional[int]]] = None) -> List[NutritionSummary]:
+        """
+        Calculate summaries for many recipes at once (catalog recomputation):
+        totals for all recipes come from one nutrient matrix product and
+        per-serving values from one broadcast divide. Confidence intervals
+        come from Monte Carlo draws of the gram amounts, with servings held
+        at their estimate.
+        """
+        servings = list(servings) if servings else [None] * len(recipes)
         
         # Estimate servings if not provided
-        if not estimated_servings:
-            estimated_servings = self._estimate_servings(ingredients)
+        estimated = self._estimate_servings_batch(recipes).tolist()
+        servings = [given or int(estimate) for given, estimate in zip(servings, estimated)]
+        
+        matrix = NutrientMatrix.from_recipes(recipes)
+        divisor = np.array(servings, dtype=float)[:, None]
+        totals = self._round_totals(matrix.totals())
+        per_serving = totals / divisor
         
-        # Calculate per-serving values
-        per_serving = {}
-        if estimated_servings and estimated_servings > 0:
-            for key, value in totals.items():
-                if value is not None:
-                    per_serving[key] = round(value / estimated_servings, 2)
+        level = settings.NUTRITION_CONFIDENCE_LEVEL
+        with_intervals = settings.NUTRITION_UNCERTAINTY_DRAWS > 0
+        if with_intervals:
+            low, high = matrix.intervals(settings.NUTRITION_UNCERTAINTY_DRAWS, level)
+            intervals = zip(low.tolist(), high.tolist(), (low / divisor).tolist(), (high / divisor).tolist())
+        else:
+            intervals = [(None,) * 4] * len(recipes)
         
-        return NutritionSummary(
-            total_calories=totals.get('calories'),
-            total_protein_g=totals.get('protein_g'),
-            total_fat_g=totals.get('fat_g'),
-            total_carbs_g=totals.get('carbs_g'),
-            servings=estimated_servings,
-            per_serving=per_serving if per_serving else None
-        )
+        summaries = []
+        for recipe_totals, recipe_per_serving, recipe_servings, recipe_intervals in zip(
+                totals.tolist(), per_serving.tolist(), servings, intervals):
+            values = dict(zip(NUTRIENTS, recipe_totals))
+            summaries.append(NutritionSummary(
+                total_calories=self._value(values['calories']),
+                total_protein_g=self._value(values['protein_g']),
+                total_fat_g=self._value(values['fat_g']),
+                total_carbs_g=self._value(values['carbs_g']),
+                servings=recipe_servings,
+                per_serving={
+                    nutrient: round(value, 2)
+                    for nutrient, total, value in zip(NUTRIENTS, recipe_totals, recipe_per_serving)
+                    if total > 0
+                } or None,
+                confidence_level=level if with_intervals else None,
+                total_intervals=self._intervals(recipe_totals, *recipe_intervals[:2]) if with_intervals else None,
+                per_serving_intervals=self._intervals(recipe_totals, *recipe_intervals[2:]) if with_intervals else None
+            ))
+        return summaries
+    
+    def _intervals(self,
+                   totals: List[float],
+                   low: List[float],
+                   high: List[float]) -> Optional[Dict[str, NutrientInterval]]:
+        """Rounded intervals for the nutrients that have a total"""
+        return {
+            nutrient: NutrientInterval(low=round(lower, 2), high=round(upper, 2))
+            for nutrient, total, lower, upper in zip(NUTRIENTS, totals, low, high)
+            if total > 0
+        } or None
     
     def _calculate_totals(self, ingredients: List[Ingredient]) -> Dict[str, Optional[float]]:
         """Calculate total nutrition values for all ingredients"""
-        totals = {
-            'calories': 0,
-            'protein_g': 0,
-            'fat_g': 0,
-            'carbs_g': 0,
-            'fiber_g': 0,
-            'sugar_g': 0,
-            'sodium_mg': 0,
-            'potassium_mg': 0,
-            'vitamin_c_mg': 0,
-            'iron_mg': 0,
-            'calcium_mg': 0
-        }
-        
-        for ingredient in ingredients:
-            if not ingredient.nutrition_per_100g or not ingredient.quantity_in_grams:
-                continue
-            
-            # Calculate scaling factor (ingredient grams / 100g)
-            scale_factor = ingredient.quantity_in_grams / 100.0
-            
-            nutrition = ingredient.nutrition_per_100g
-            
-            # Add scaled nutrition values
-            if nutrition.calories:
-                totals['calories'] += nutrition.calories * scale_factor
-            if nutrition.protein_g:
-                totals['protein_g'] += nutrition.protein_g * scale_factor
-            if nutrition.fat_g:
-                totals['fat_g'] += nutrition.fat_g * scale_factor
-            if nutrition.carbs_g:
-                totals['carbs_g'] += nutrition.carbs_g * scale_factor
-            if nutrition.fiber_g:
-                totals['fiber_g'] += nutrition.fiber_g * scale_factor
-            if nutrition.sugar_g:
-                totals['sugar_g'] += nutrition.sugar_g * scale_factor
-            if nutrition.sodium_mg:
-                totals['sodium_mg'] += nutrition.sodium_mg * scale_factor
-            if nutrition.potassium_mg:
-                totals['potassium_mg'] += nutrition.potassium_mg * scale_factor
-            if nutrition.vitamin_c_mg:
-                totals['vitamin_c_mg'] += nutrition.vitamin_c_mg * scale_factor
-            if nutrition.iron_mg:
-                totals['iron_mg'] += nutrition.iron_mg * scale_factor
-            if nutrition.calcium_mg:
-                totals['calcium_mg'] += nutrition.calcium_mg * scale_factor
-        
-        # Round values
-        for key in totals:
-            if totals[key] > 0:
-                totals[key] = round(totals[key], 2)
-            else:
-                totals[key] = None
-        
-        return totals
+        totals = self._round_totals(NutrientMatrix.from_recipes([ingredients]).totals())[0]
+        return {nutrient: self._value(value) for nutrient, value in zip(NUTRIENTS, totals.tolist())}
+    
+    def _round_totals(self, totals: np.ndarray) -> np.ndarray:
+        """Round values; totals that are not positive are reported as missing"""
+        return np.where(totals > 0, np.round(totals, 2), 0.0)
+    
+    def _value(self, value: float) -> Optional[float]:
+        return value if value > 0 else None
     
     def _estimate_servings(self, ingredients: List[Ingredient]) -> int:
         """Estimate number of servings based on ingredient quantities"""
+        return int(self._estimate_servings_batch([ingredients])[0])
+    
+    def _estimate_servings_batch(self, recipes: List[List[Ingredient]]) -> np.ndarray:
+        """
+        Estimate servings for many recipes at once. The first main ingredient
+        with a known weight sets the count; otherwise it follows the total
+        ingredient weight.
+        """
+        grams = []
+        serving_sizes = []
+        for ingredients in recipes:
+            for ingredient in ingredients:
+                grams.append(ingredient.quantity_in_grams or 0.0)
+                serving_sizes.append(self._serving_size(ingredient.canonical_id or ingredient.name))
+        grams = np.array(grams, dtype=float)
+        serving_sizes = np.array(serving_sizes, dtype=float)
         
-        # Look for main ingredients to estimate servings
-        main_ingredients = ['rice', 'pasta', 'chicken', 'beef', 'fish', 'flour']
+        # Default to 2 servings if no good estimate
+        servings = np.full(len(recipes), 2.0)
         
-        for ingredient in ingredients:
-            ingredient_name = ingredient.name.lower()
-            
-            # Check if this is a main ingredient
-            for main_ing in main_ingredients:
-                if main_ing in ingredient_name and ingredient.quantity_in_grams:
-                    # Estimate servings based on main ingredient amount
-                    if main_ing in ['rice', 'pasta']:
-                        # ~75g dry rice/pasta per serving
-                        return max(1, round(ingredient.quantity_in_grams / 75))
-                    elif main_ing in ['chicken', 'beef', 'fish']:
-                        # ~150g protein per serving
-                        return max(1, round(ingredient.quantity_in_grams / 150))
-                    elif main_ing == 'flour':
-                        # ~100g flour per serving for baked goods
-                        return max(1, round(ingredient.quantity_in_grams / 100))
+        offsets = np.concatenate(([0], np.cumsum([len(ingredients) for ingredients in recipes], dtype=np.intp)))
+        starts = offsets[:-1]
+        nonempty = offsets[1:] > starts
+        if not nonempty.any():
+            return servings
         
-        # Default estimation based on total ingredient count and quantities
-        total_weight = sum(
-            ing.quantity_in_grams for ing in ingredients 
-            if ing.quantity_in_grams
-        )
+        # Default estimation based on total ingredient weight: ~300g per
+        # serving, capped at 8 servings for reasonableness
+        total_weight = np.add.reduceat(grams, starts[nonempty])
+        by_weight = np.where(total_weight > 0, np.clip(np.rint(total_weight / 300), 1, 8), 2.0)
         
-        if total_weight:
-            # Estimate ~300g total ingredients per serving
-            estimated = max(1, round(total_weight / 300))
-            return min(estimated, 8)  # Cap at 8 servings for reasonableness
+        # Position of each recipe's first main ingredient with a weight
+        is_main = ~np.isnan(serving_sizes) & (grams > 0)
+        positions = np.where(is_main, np.arange(len(grams)), len(grams))
+        first_main = np.minimum.reduceat(positions, starts[nonempty])
+        has_main = first_main < len(grams)
+        first_main = np.where(has_main, first_main, 0)
+        by_main = np.maximum(1, np.rint(grams[first_main] / np.nan_to_num(serving_sizes[first_main], nan=1.0)))
         
-        # Default to 2 servings if no good estimate
-        return 2
+        servings[nonempty] = np.where(has_main, by_main, by_weight)
+        return servings
+    
+    def _serving_size(self, ingredient_name: str) -> float:
+        """Grams per serving if this is a main ingredient, otherwise NaN"""
+        size = self._serving_sizes.get(ingredient_name)
+        if size is None:
+            name = ingredient_name.replace('_', ' ').lower()
+            size = next(
+                (grams for main_ing, grams in MAIN_INGREDIENT_SERVINGS if main_ing in name),
+                float('nan')
+            )
+            self._serving_sizes[ingredient_name] = size
+        return size
     
     def validate_nutrition_data(self, nutrition_summary: NutritionSummary) -> List[str]:
         """Validate nutrition data and return list of issues"""
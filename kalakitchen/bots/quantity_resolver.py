@@ -1,331 +1,271 @@
 """
 QuantityResolver - Merges evidence from multiple sources to determine ingredient quantities
 """
-import re
-from typing import List, Dict, Any, Optional, Tuple
-import google.generativeai as genai
-from ..models import Ingredient, TranscriptSegment, KeyframeData, MediaReference
+import asyncio
+import json
+from typing import List, Dict, Any, Optional
+from ..models import (
+    Ingredient, TranscriptSegment, KeyframeData,
+    BatchQuantityResolution, QuantityResolutionStats
+)
 from ..config import settings, GEMINI_PROMPTS
+from ..evidence import EvidenceIndex
+from ..reference.densities import get_density_table, canonical_unit
+from ..reference.canonical import get_canonicalizer, canonical_id
+from ..llm.gateway import LLMGateway, get_default_gateway
+from ..llm.structured import StructuredResponder
 
 class QuantityResolver:
-    def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.gemini_model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    def __init__(self, gateway: Optional[LLMGateway] = None):
+        self.gateway = gateway or get_default_gateway()
+        self.llm = self.gateway.client("quantity_resolver")
+        self.responder = StructuredResponder(self.llm)
         
-        # Common unit conversions to grams
-        self.unit_conversions = {
-            # Volume to weight (approximate for common ingredients)
-            'cup': {'flour': 120, 'sugar': 200, 'rice': 185, 'water': 240, 'oil': 220},
-            'tbsp': {'flour': 8, 'sugar': 12, 'oil': 14, 'water': 15},
-            'tsp': {'salt': 6, 'sugar': 4, 'oil': 5, 'water': 5},
-            # Weight units
-            'g': 1, 'gram': 1, 'grams': 1,
-            'kg': 1000, 'kilogram': 1000,
-            'oz': 28.35, 'ounce': 28.35,
-            'lb': 453.59, 'pound': 453.59,
-            # Pieces/counts
-            'piece': 1, 'pieces': 1, 'whole': 1,
-            'clove': 3, 'cloves': 3,  # garlic clove ~3g
-        }
+        self.densities = get_density_table()
+        self.canonicalizer = get_canonicalizer()
     
     async def resolve_quantities(self, 
                                ingredients: List[Ingredient],
                                transcript: List[TranscriptSegment],
-                               keyframes: List[KeyframeData]) -> List[Ingredient]:
+                               keyframes: List[KeyframeData],
+                               evidence_index: Optional[EvidenceIndex] = None,
+                               stats: Optional[QuantityResolutionStats] = None) -> List[Ingredient]:
         """
-        Resolve ingredient quantities by merging evidence from multiple sources
+        Resolve ingredient quantities by merging evidence from multiple sources.
+        Ingredients with conclusive explicit evidence are resolved locally; the
+        rest go to Gemini in batched requests, and an ingredient falls back to
+        local evidence only when its own result is unusable. Pass the video's
+        EvidenceIndex to avoid rebuilding it here, and stats to collect how
+        each ingredient was resolved.
         """
-        resolved_ingredients = []
-        
-        for ingredient in ingredients:
-            try:
-                resolved = await self._resolve_single_ingredient(
-                    ingredient, transcript, keyframes
-                )
-                resolved_ingredients.append(resolved)
-            except Exception as e:
-                print(f"Failed to resolve quantity for {ingredient.name}: {e}")
-                resolved_ingredients.append(ingredient)
-        
-        return resolved_ingredients
-    
-    async def _resolve_single_ingredient(self,
-                                       ingredient: Ingredient,
-                                       transcript: List[TranscriptSegment],
-                                       keyframes: List[KeyframeData]) -> Ingredient:
-        """Resolve quantity for a single ingredient"""
-        
-        # Collect evidence from different sources
-        transcript_evidence = self._extract_transcript_evidence(ingredient, transcript)
-        ocr_evidence = self._extract_ocr_evidence(ingredient, keyframes)
-        visual_evidence = self._extract_visual_evidence(ingredient, keyframes)
-        
-        # Get typical recipe amounts for this ingredient
-        typical_amounts = self._get_typical_amounts(ingredient.name)
-        
-        # Use Gemini to resolve conflicting evidence
-        resolved_quantity = await self._gemini_quantity_resolution(
-            ingredient, transcript_evidence, ocr_evidence, visual_evidence, typical_amounts
-        )
-        
-        # Update ingredient with resolved quantity
-        if resolved_quantity:
-            ingredient.quantity = resolved_quantity.get('quantity')
-            ingredient.unit = resolved_quantity.get('unit')
-            ingredient.estimated = resolved_quantity.get('estimated', False)
-            ingredient.estimation_method = resolved_quantity.get('estimation_method')
-            
-            # Convert to grams if possible
-            ingredient.quantity_in_grams = self._convert_to_grams(
-                ingredient.quantity, ingredient.unit, ingredient.name
-            )
+        if stats is None:
+            stats = QuantityResolutionStats()
         
-        return ingredient
-    
-    def _extract_transcript_evidence(self, 
-                                   ingredient: Ingredient,
-                                   transcript: List[TranscriptSegment]) -> List[Dict[str, Any]]:
-        """Extract quantity mentions from transcript"""
-        evidence = []
-        ingredient_name = ingredient.name.lower()
+        if evidence_index is None:
+            evidence_index = EvidenceIndex(transcript, keyframes)
         
-        for segment in transcript:
-            text = segment.text.lower()
-            
-            # Look for ingredient mentions with quantities
-            if ingredient_name in text:
-                # Extract quantity patterns
-                quantity_matches = self._extract_quantity_patterns(text)
-                
-                for match in quantity_matches:
-                    evidence.append({
-                        'source': 'transcript',
-                        'quantity': match['quantity'],
-                        'unit': match['unit'],
-                        'context': segment.text,
-                        'timestamp': segment.start,
-                        'confidence': segment.confidence
-                    })
+        evidence = [
+            self._collect_evidence(ingredient, evidence_index)
+            for ingredient in ingredients
+        ]
         
-        return evidence
-    
-    def _extract_ocr_evidence(self,
-                            ingredient: Ingredient,
-                            keyframes: List[KeyframeData]) -> List[Dict[str, Any]]:
-        """Extract quantity information from OCR text"""
-        evidence = []
-        ingredient_name = ingredient.name.lower()
+        fast_path = {}
+        if settings.QUANTITY_FAST_PATH_ENABLED:
+            for i, item in enumerate(evidence):
+                resolution = self._fast_path_resolution(item)
+                if resolution:
+                    fast_path[i] = resolution
         
-        for frame in keyframes:
-            for ocr_text in frame.ocr_text:
-                text = ocr_text.lower()
-                
-                # Look for measurements near ingredient mentions
-                if ingredient_name in text or self._contains_measurements(text):
-                    quantity_matches = self._extract_quantity_patterns(text)
-                    
-                    for match in quantity_matches:
-                        evidence.append({
-                            'source': 'ocr',
-                            'quantity': match['quantity'],
-                            'unit': match['unit'],
-                            'context': ocr_text,
-                            'frame_id': frame.frame_id,
-                            'timestamp': frame.timestamp,
-                            'confidence': 75  # OCR has medium confidence
-                        })
+        pending = [i for i in range(len(ingredients)) if i not in fast_path]
+        resolutions = await self._gemini_quantity_resolution(ingredients, evidence, pending)
         
-        return evidence
-    
-    def _extract_visual_evidence(self,
-                               ingredient: Ingredient,
-                               keyframes: List[KeyframeData]) -> List[Dict[str, Any]]:
-        """Extract visual quantity cues from frame descriptions"""
-        evidence = []
-        ingredient_name = ingredient.name.lower()
+        resolved_ingredients = []
+        for i, ingredient in enumerate(ingredients):
+            stats.ingredients += 1
+            try:
+                if i in fast_path:
+                    stats.fast_path += 1
+                    resolved_quantity = fast_path[i]
+                elif i in resolutions:
+                    stats.model += 1
+                    resolved_quantity = resolutions[i]
+                else:
+                    stats.fallback += 1
+                    resolved_quantity = self._heuristic_resolution(
+                        evidence[i]['transcript'], evidence[i]['ocr'], evidence[i]['typical']
+                    )
+                resolved_ingredients.append(self._apply_resolution(ingredient, resolved_quantity))
+            except Exception as e:
+                print(f"Failed to resolve quantity for {ingredient.name}: {e}")
+                resolved_ingredients.append(ingredient)
         
-        for frame in keyframes:
-            description = frame.description.lower()
-            
-            if ingredient_name in description:
-                # Look for visual quantity indicators
-                visual_cues = self._extract_visual_quantity_cues(description)
-                
-                for cue in visual_cues:
-                    evidence.append({
-                        'source': 'visual',
-                        'visual_cue': cue,
-                        'context': frame.description,
-                        'frame_id': frame.frame_id,
-                        'timestamp': frame.timestamp,
-                        'confidence': 60  # Visual estimation has lower confidence
-                    })
+        if stats.ingredients:
+            stats.fast_path_fraction = round(stats.fast_path / stats.ingredients, 3)
         
-        return evidence
+        return resolved_ingredients
     
-    def _extract_quantity_patterns(self, text: str) -> List[Dict[str, Any]]:
-        """Extract quantity and unit patterns from text"""
-        patterns = [
-            r'(\d+(?:\.\d+)?)\s*(cup|cups|tsp|tbsp|tablespoon|teaspoon|oz|lb|pound|gram|g|kg|ml|liter|l|piece|pieces|clove|cloves)',
-            r'(\d+/\d+)\s*(cup|cups|tsp|tbsp)',  # Fractions
-            r'(half|quarter|third)\s*(cup|cups|tsp|tbsp)',  # Word fractions
-            r'(\d+)\s*(medium|large|small)\s*(onion|tomato|potato|carrot)',  # Sized items
+    def _fast_path_resolution(self, evidence: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Resolve locally when explicit evidence is conclusive: every transcript
+        or OCR reading naming the ingredient has its quantity right next to
+        the ingredient, at least one of them is confident enough, and they
+        all agree on the same amount.
+        """
+        readings = list(evidence['transcript']) + [
+            item for item in evidence['ocr'] if item.get('names_ingredient')
         ]
+        if not readings or not all(item.get('adjacent') for item in readings):
+            # "add salt then pour 2 cups water": the amount may belong to something else
+            return None
         
-        matches = []
-        for pattern in patterns:
-            for match in re.finditer(pattern, text, re.IGNORECASE):
-                quantity_str = match.group(1)
-                unit = match.group(2).lower()
-                
-                # Convert quantity to float
-                quantity = self._parse_quantity(quantity_str)
-                
-                if quantity is not None:
-                    matches.append({
-                        'quantity': quantity,
-                        'unit': unit,
-                        'original_text': match.group(0)
-                    })
+        confident = [
+            item for item in readings
+            if item['confidence'] >= settings.QUANTITY_FAST_PATH_MIN_CONFIDENCE
+        ]
+        if not confident:
+            return None
         
-        return matches
-    
-    def _parse_quantity(self, quantity_str: str) -> Optional[float]:
-        """Parse quantity string to float"""
-        try:
-            # Handle fractions
-            if '/' in quantity_str:
-                parts = quantity_str.split('/')
-                return float(parts[0]) / float(parts[1])
-            
-            # Handle word fractions
-            word_fractions = {
-                'half': 0.5, 'quarter': 0.25, 'third': 0.33
-            }
-            if quantity_str.lower() in word_fractions:
-                return word_fractions[quantity_str.lower()]
-            
-            # Handle regular numbers
-            return float(quantity_str)
-            
-        except (ValueError, ZeroDivisionError):
+        amounts = {
+            (round(item['quantity'], 2), canonical_unit(item['unit']))
+            for item in readings
+        }
+        if len(amounts) != 1:
+            # Conflicting or repeated-but-different amounts need the model
             return None
+        
+        best = max(confident, key=lambda x: x['confidence'])
+        return {
+            'quantity': best['quantity'],
+            'unit': best['unit'],
+            'estimated': False,
+            'estimation_method': 'transcript_explicit' if best['source'] == 'transcript' else 'ocr_reading'
+        }
     
-    def _contains_measurements(self, text: str) -> bool:
-        """Check if text contains measurement units"""
-        measurement_units = ['cup', 'tsp', 'tbsp', 'oz', 'lb', 'gram', 'ml', 'liter']
-        return any(unit in text.lower() for unit in measurement_units)
+    def _collect_evidence(self, ingredient: Ingredient, evidence_index: EvidenceIndex) -> Dict[str, Any]:
+        """Look up quantity evidence from different sources for one ingredient"""
+        return {
+            'transcript': evidence_index.transcript_evidence(ingredient.name),
+            'ocr': evidence_index.ocr_evidence(ingredient.name),
+            'visual': evidence_index.visual_evidence(ingredient.name),
+            # Typical recipe amounts for this ingredient
+            'typical': self._get_typical_amounts(ingredient.canonical_id or canonical_id(ingredient.name))
+        }
     
-    def _extract_visual_quantity_cues(self, description: str) -> List[str]:
-        """Extract visual quantity indicators from frame descriptions"""
-        cues = []
-        
-        # Look for visual quantity indicators
-        visual_patterns = [
-            r'(small|medium|large|huge|tiny)\s+(amount|portion|bowl|plate)',
-            r'(handful|pinch|dash|sprinkle)',
-            r'(full|half|quarter)\s+(cup|bowl|spoon)',
-            r'(measuring\s+cup|measuring\s+spoon)',
-        ]
+    def _apply_resolution(self, ingredient: Ingredient, resolved_quantity: Dict[str, Any]) -> Ingredient:
+        """Update ingredient with resolved quantity"""
+        ingredient.quantity = resolved_quantity.get('quantity')
+        ingredient.unit = resolved_quantity.get('unit')
+        ingredient.estimated = resolved_quantity.get('estimated', False)
+        ingredient.estimation_method = resolved_quantity.get('estimation_method')
         
-        for pattern in visual_patterns:
-            matches = re.finditer(pattern, description, re.IGNORECASE)
-            for match in matches:
-                cues.append(match.group(0))
+        # Convert to grams if possible
+        ingredient.quantity_in_grams = self._convert_to_grams(
+            ingredient.quantity, ingredient.unit, self._canonical_name(ingredient)
+        )
         
-        return cues
+        return ingredient
+    
+    def _canonical_name(self, ingredient: Ingredient) -> str:
+        """Canonical name for table lookups, or the extracted name if unknown"""
+        if ingredient.canonical_id:
+            return self.canonicalizer.name_for(ingredient.canonical_id) or ingredient.name
+        return ingredient.name
     
-    def _get_typical_amounts(self, ingredient_name: str) -> Dict[str, Any]:
-        """Get typical recipe amounts for an ingredient"""
+    def _get_typical_amounts(self, ingredient_id: str) -> Dict[str, Any]:
+        """Get typical recipe amounts for a canonical ingredient ID"""
         # Common ingredient amounts in recipes
         typical_amounts = {
             'salt': {'quantity': 1, 'unit': 'tsp', 'range': (0.5, 2)},
-            'pepper': {'quantity': 0.5, 'unit': 'tsp', 'range': (0.25, 1)},
+            'black_pepper': {'quantity': 0.5, 'unit': 'tsp', 'range': (0.25, 1)},
             'garlic': {'quantity': 2, 'unit': 'cloves', 'range': (1, 4)},
             'onion': {'quantity': 1, 'unit': 'medium', 'range': (0.5, 2)},
-            'oil': {'quantity': 2, 'unit': 'tbsp', 'range': (1, 4)},
-            'flour': {'quantity': 1, 'unit': 'cup', 'range': (0.5, 3)},
+            'vegetable_oil': {'quantity': 2, 'unit': 'tbsp', 'range': (1, 4)},
+            'all_purpose_flour': {'quantity': 1, 'unit': 'cup', 'range': (0.5, 3)},
             'sugar': {'quantity': 0.5, 'unit': 'cup', 'range': (0.25, 2)},
             'rice': {'quantity': 1, 'unit': 'cup', 'range': (0.5, 2)},
         }
         
-        return typical_amounts.get(ingredient_name.lower(), {
+        return typical_amounts.get(ingredient_id, {
             'quantity': 1, 'unit': 'portion', 'range': (0.5, 2)
         })
     
     async def _gemini_quantity_resolution(self,
-                                        ingredient: Ingredient,
-                                        transcript_evidence: List[Dict[str, Any]],
-                                        ocr_evidence: List[Dict[str, Any]],
-                                        visual_evidence: List[Dict[str, Any]],
-                                        typical_amounts: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        """Use Gemini to resolve conflicting quantity evidence"""
+                                        ingredients: List[Ingredient],
+                                        evidence: List[Dict[str, Any]],
+                                        indices: List[int]) -> Dict[int, Dict[str, Any]]:
+        """
+        Use Gemini to resolve conflicting quantity evidence for the ingredients
+        at indices. Returns usable resolutions keyed by ingredient index; chunks
+        are sent concurrently and a failed chunk only loses its own ingredients.
+        """
+        batch_size = max(1, settings.QUANTITY_BATCH_SIZE)
+        chunks = [indices[start:start + batch_size] for start in range(0, len(indices), batch_size)]
+        
+        results = await asyncio.gather(
+            *(self._resolve_chunk(chunk, ingredients, evidence) for chunk in chunks),
+            return_exceptions=True
+        )
+        
+        resolutions = {}
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                print(f"Gemini quantity resolution failed for {len(chunk)} ingredients: {result}")
+                continue
+            resolutions.update(result)
+        
+        return resolutions
+    
+    async def _resolve_chunk(self,
+                             chunk: List[int],
+                             ingredients: List[Ingredient],
+                             evidence: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
+        """Resolve one chunk of ingredients in a single structured request"""
+        
+        entries = [{
+            'id': i,
+            'ingredient': ingredients[i].name,
+            'transcript_evidence': evidence[i]['transcript'],
+            'ocr_evidence': evidence[i]['ocr'],
+            'visual_evidence': evidence[i]['visual'],
+            'typical_amounts': evidence[i]['typical']
+        } for i in chunk]
         
         prompt = GEMINI_PROMPTS["quantity_resolution"].format(
-            ingredient=ingredient.name,
-            transcript_evidence=str(transcript_evidence),
-            ocr_evidence=str(ocr_evidence),
-            visual_evidence=str(visual_evidence),
-            typical_amounts=str(typical_amounts)
+            ingredients=json.dumps(entries, indent=2, default=str)
         )
         
-        try:
-            response = self.gemini_model.generate_content(prompt)
-            
-            # Parse Gemini's response
-            # This would need proper JSON parsing in production
-            # For now, return a reasonable estimate
-            
-            if transcript_evidence:
-                # Prefer transcript evidence if available
-                best_evidence = max(transcript_evidence, key=lambda x: x['confidence'])
-                return {
-                    'quantity': best_evidence['quantity'],
-                    'unit': best_evidence['unit'],
-                    'estimated': False,
-                    'estimation_method': 'transcript_explicit'
-                }
-            elif ocr_evidence:
-                # Use OCR evidence as second choice
-                best_evidence = max(ocr_evidence, key=lambda x: x['confidence'])
-                return {
-                    'quantity': best_evidence['quantity'],
-                    'unit': best_evidence['unit'],
-                    'estimated': True,
-                    'estimation_method': 'ocr_reading'
-                }
-            else:
-                # Fall back to typical amounts
-                return {
-                    'quantity': typical_amounts['quantity'],
-                    'unit': typical_amounts['unit'],
-                    'estimated': True,
-                    'estimation_method': 'typical_recipe_amount'
-                }
-                
-        except Exception as e:
-            print(f"Gemini quantity resolution failed: {e}")
-            return None
+        resolutions = {}
+        for resolution in await self.responder.generate_list(prompt, BatchQuantityResolution):
+            if resolution.id not in chunk or resolution.quantity is None or not resolution.unit:
+                continue
+            resolutions[resolution.id] = {
+                'quantity': resolution.quantity,
+                'unit': resolution.unit,
+                'estimated': resolution.estimated,
+                'estimation_method': resolution.estimation_method or (
+                    'model_estimate' if resolution.estimated else 'explicit'
+                )
+            }
+        
+        return resolutions
+    
+    def _heuristic_resolution(self,
+                              transcript_evidence: List[Dict[str, Any]],
+                              ocr_evidence: List[Dict[str, Any]],
+                              typical_amounts: Dict[str, Any]) -> Dict[str, Any]:
+        """Resolve quantity from local evidence when Gemini gives no usable answer"""
+        # Amounts stated elsewhere in a segment may belong to another ingredient
+        transcript_evidence = [item for item in transcript_evidence if item.get('adjacent')]
+        if transcript_evidence:
+            # Prefer transcript evidence if available
+            best_evidence = max(transcript_evidence, key=lambda x: x['confidence'])
+            return {
+                'quantity': best_evidence['quantity'],
+                'unit': best_evidence['unit'],
+                'estimated': False,
+                'estimation_method': 'transcript_explicit'
+            }
+        elif ocr_evidence:
+            # Use OCR evidence as second choice
+            best_evidence = max(ocr_evidence, key=lambda x: (bool(x.get('adjacent')), x['confidence']))
+            return {
+                'quantity': best_evidence['quantity'],
+                'unit': best_evidence['unit'],
+                'estimated': True,
+                'estimation_method': 'ocr_reading'
+            }
+        else:
+            # Fall back to typical amounts
+            return {
+                'quantity': typical_amounts['quantity'],
+                'unit': typical_amounts['unit'],
+                'estimated': True,
+                'estimation_method': 'typical_recipe_amount'
+            }
     
     def _convert_to_grams(self, quantity: Optional[float], unit: Optional[str], ingredient_name: str) -> Optional[float]:
-        """Convert quantity to grams using conversion tables"""
+        """Convert quantity to grams using the ingredient density and portion tables"""
         if not quantity or not unit:
             return None
         
-        unit = unit.lower()
-        ingredient_name = ingredient_name.lower()
-        
-        # Direct weight units
-        if unit in self.unit_conversions:
-            if isinstance(self.unit_conversions[unit], dict):
-                # Volume units - need ingredient-specific conversion
-                if ingredient_name in self.unit_conversions[unit]:
-                    return quantity * self.unit_conversions[unit][ingredient_name]
-                else:
-                    # Use water as default for volume
-                    return quantity * self.unit_conversions[unit].get('water', 240)
-            else:
-                # Direct conversion factor
-                return quantity * self.unit_conversions[unit]
-        
-        return None
\ No newline at end of file
+        return self.densities.to_grams(quantity, unit, ingredient_name)
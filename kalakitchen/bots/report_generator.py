@@ -2,18 +2,22 @@
 ReportGenerator - Creates final analysis report with human-readable summary and learner pack
 """
 import json
-from typing import List, Dict, Any
-import google.generativeai as genai
+from typing import List, Dict, Any, Optional, Tuple
 from ..models import (
     RecipeAnalysisReport, RecipeTitle, CookingStep, Ingredient, 
-    NutritionSummary, LearnerPack, QuizQuestion, Source
+    NutritionSummary, LearnerPack, QuizQuestion, ReportContent, Source
 )
 from ..config import settings, GEMINI_PROMPTS
+from ..llm.gateway import LLMGateway, get_default_gateway
+from ..llm.structured import StructuredResponder
+
+SUMMARY_HEADING = "### Recipe Analysis Summary"
 
 class ReportGenerator:
-    def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.gemini_model = genai.GenerativeModel(settings.GEMINI_MODEL)
+    def __init__(self, gateway: Optional[LLMGateway] = None):
+        self.gateway = gateway or get_default_gateway()
+        self.llm = self.gateway.client("report_generator")
+        self.responder = StructuredResponder(self.llm)
     
     async def generate_report(self,
                             recipe_title: RecipeTitle,
@@ -23,9 +27,12 @@ class ReportGenerator:
                             tools: List[str],
                             nutrition_summary: NutritionSummary,
                             citations: List[Source],
-                            processing_time: float) -> RecipeAnalysisReport:
+                            processing_time: float,
+                            fast: bool = False) -> RecipeAnalysisReport:
         """
-        Generate comprehensive analysis report
+        Generate comprehensive analysis report. In fast mode the learner pack
+        and summary are built from the extracted data with templates only,
+        without any Gemini call (bulk back-catalog ingestion).
         """
         
         # Calculate quality scores
@@ -33,7 +40,7 @@ class ReportGenerator:
             recipe_title, steps, ingredients
         )
         completeness_score = self._calculate_completeness_score(
-            recipe_title, steps, ingredients, nutrition_summary
+            recipe_title, steps, ingredients, tools, nutrition_summary
         )
         
         # Determine status
@@ -44,16 +51,17 @@ class ReportGenerator:
             recipe_title, steps, ingredients, nutrition_summary
         )
         
-        # Generate educational content using Gemini
-        learner_pack = await self._generate_learner_pack(
-            recipe_title, steps, ingredients, nutrition_summary
-        )
-        
-        # Generate human-readable summary
-        human_summary = await self._generate_human_summary(
-            recipe_title, steps, ingredients, nutrition_summary, 
-            authenticity_score, completeness_score
-        )
+        if fast:
+            learner_pack = self._template_learner_pack(recipe_title, steps, ingredients, nutrition_summary)
+            human_summary = f"{SUMMARY_HEADING}\n\n" + self._template_summary(
+                recipe_title, steps, ingredients, nutrition_summary, authenticity_score, completeness_score
+            )
+        else:
+            # Learner pack and human-readable summary from one Gemini request
+            learner_pack, human_summary = await self._generate_content(
+                recipe_title, steps, ingredients, nutrition_summary,
+                authenticity_score, completeness_score
+            )
         
         # Create final report
         report = RecipeAnalysisReport(
@@ -109,6 +117,7 @@ class ReportGenerator:
                                     recipe_title: RecipeTitle,
                                     steps: List[CookingStep],
                                     ingredients: List[Ingredient],
+                                    tools: List[str],
                                     nutrition_summary: NutritionSummary) -> int:
         """Calculate completeness score based on available information"""
         
@@ -206,12 +215,55 @@ class ReportGenerator:
         
         return missing
     
-    async def _generate_learner_pack(self,
-                                   recipe_title: RecipeTitle,
-                                   steps: List[CookingStep],
-                                   ingredients: List[Ingredient],
-                                   nutrition_summary: NutritionSummary) -> LearnerPack:
-        """Generate educational content using Gemini"""
+    async def _generate_content(self,
+                                recipe_title: RecipeTitle,
+                                steps: List[CookingStep],
+                                ingredients: List[Ingredient],
+                                nutrition_summary: NutritionSummary,
+                                authenticity_score: int,
+                                completeness_score: int) -> Tuple[LearnerPack, str]:
+        """
+        Generate the learner pack and markdown summary with Gemini in one
+        structured request; parts that come back unusable are built from
+        templates instead.
+        """
+        
+        prompt = self._content_prompt(
+            recipe_title, steps, ingredients, nutrition_summary, authenticity_score, completeness_score
+        )
+        
+        content = None
+        try:
+            content = await self.responder.generate_model(prompt, ReportContent)
+        except Exception as e:
+            print(f"Failed to generate report content: {e}")
+        
+        learner_pack = None
+        summary = None
+        if content:
+            learner_pack = LearnerPack(
+                bullets=content.bullets[:6],  # Limit to 6 bullets
+                quiz=[q for q in content.quiz if 0 <= q.correct_answer < len(q.options)],
+                difficulty_level=content.difficulty_level
+            )
+            if not (learner_pack.bullets and learner_pack.quiz):
+                learner_pack = None
+            summary = content.summary.strip() or None
+        
+        learner_pack = learner_pack or self._template_learner_pack(recipe_title, steps, ingredients, nutrition_summary)
+        summary = summary or self._template_summary(
+            recipe_title, steps, ingredients, nutrition_summary, authenticity_score, completeness_score
+        )
+        return learner_pack, f"{SUMMARY_HEADING}\n\n{summary}"
+    
+    def _content_prompt(self,
+                        recipe_title: RecipeTitle,
+                        steps: List[CookingStep],
+                        ingredients: List[Ingredient],
+                        nutrition_summary: NutritionSummary,
+                        authenticity_score: int,
+                        completeness_score: int) -> str:
+        """Report generation prompt with the extracted recipe data"""
         
         # Prepare data for Gemini
         recipe_data = {
@@ -221,155 +273,74 @@ class ReportGenerator:
             "nutrition": {
                 "calories": nutrition_summary.total_calories,
                 "servings": nutrition_summary.servings
-            }
-        }
-        
-        prompt = f"""
-        Create educational content for this recipe analysis:
-        
-        RECIPE DATA: {json.dumps(recipe_data, indent=2)}
-        
-        Generate:
-        1. LEARNING BULLETS: 3-6 key learning points about this recipe, focusing on:
-           - Cooking techniques demonstrated
-           - Nutritional benefits of ingredients
-           - Cultural or culinary significance
-           - Tips for success
-        
-        2. QUIZ QUESTIONS: Create 3 multiple choice questions with 4 options each:
-           - Question about cooking technique
-           - Question about ingredient benefits
-           - Question about nutrition or serving size
-        
-        Return as JSON with this structure:
-        {{
-            "bullets": ["learning point 1", "learning point 2", ...],
-            "quiz": [
-                {{
-                    "question": "What is the main cooking technique used?",
-                    "options": ["option1", "option2", "option3", "option4"],
-                    "correct_answer": 0,
-                    "explanation": "Brief explanation of correct answer"
-                }}
-            ]
-        }}
-        """
-        
-        try:
-            response = self.gemini_model.generate_content(prompt)
-            
-            # Parse response (would need proper JSON parsing in production)
-            # For now, create reasonable defaults
-            
-            bullets = [
-                f"This recipe demonstrates {len(steps)} key cooking steps",
-                f"Contains {len(ingredients)} ingredients with various nutritional benefits",
-                f"Provides approximately {nutrition_summary.total_calories or 'unknown'} calories total"
-            ]
-            
-            # Add ingredient-specific learning points
-            for ingredient in ingredients[:3]:  # Top 3 ingredients
-                if ingredient.uses:
-                    bullets.append(f"{ingredient.name.title()} is used for {', '.join(ingredient.uses[:2])}")
-            
-            # Create quiz questions
-            quiz_questions = [
-                QuizQuestion(
-                    question=f"What is the main ingredient in {recipe_title.text}?",
-                    options=[
-                        ingredients[0].name if ingredients else "Unknown",
-                        "Salt", "Water", "Oil"
-                    ],
-                    correct_answer=0,
-                    explanation=f"The recipe features {ingredients[0].name if ingredients else 'various ingredients'} as a key component."
-                ),
-                QuizQuestion(
-                    question="How many cooking steps does this recipe have?",
-                    options=[str(len(steps)), str(len(steps)+1), str(len(steps)-1), str(len(steps)+2)],
-                    correct_answer=0,
-                    explanation=f"The recipe has {len(steps)} distinct cooking steps."
-                ),
-                QuizQuestion(
-                    question="What is the estimated serving size?",
-                    options=[
-                        str(nutrition_summary.servings or 2),
-                        str((nutrition_summary.servings or 2) + 1),
-                        str((nutrition_summary.servings or 2) - 1),
-                        "Unknown"
-                    ],
-                    correct_answer=0,
-                    explanation=f"The recipe serves approximately {nutrition_summary.servings or 2} people."
-                )
-            ]
-            
-            return LearnerPack(
-                bullets=bullets[:6],  # Limit to 6 bullets
-                quiz=quiz_questions,
-                difficulty_level="beginner"
-            )
-            
-        except Exception as e:
-            print(f"Failed to generate learner pack: {e}")
-            
-            # Return basic fallback
-            return LearnerPack(
-                bullets=[
-                    f"Recipe: {recipe_title.text}",
-                    f"Contains {len(ingredients)} ingredients",
-                    f"Has {len(steps)} cooking steps"
-                ],
-                quiz=[
-                    QuizQuestion(
-                        question="What type of content is this?",
-                        options=["Recipe", "Story", "News", "Tutorial"],
-                        correct_answer=0,
-                        explanation="This is a cooking recipe analysis."
-                    )
-                ]
-            )
-    
-    async def _generate_human_summary(self,
-                                    recipe_title: RecipeTitle,
-                                    steps: List[CookingStep],
-                                    ingredients: List[Ingredient],
-                                    nutrition_summary: NutritionSummary,
-                                    authenticity_score: int,
-                                    completeness_score: int) -> str:
-        """Generate human-readable markdown summary"""
-        
-        summary_data = {
-            "title": recipe_title.text,
-            "steps_count": len(steps),
-            "ingredients_count": len(ingredients),
-            "calories": nutrition_summary.total_calories,
-            "servings": nutrition_summary.servings,
+            },
             "authenticity": authenticity_score,
             "completeness": completeness_score
         }
         
-        prompt = f"""
-        Write a concise, engaging paragraph summary of this recipe analysis:
-        
-        DATA: {json.dumps(summary_data, indent=2)}
-        
-        The summary should:
-        - Be 3-4 sentences long
-        - Mention the recipe name and key characteristics
-        - Include authenticity and completeness scores
-        - Be written for a general audience
-        - Sound natural and informative
+        return GEMINI_PROMPTS["report_generation"].format(
+            recipe=json.dumps(recipe_data, indent=2)
+        )
+    
+    def _template_learner_pack(self,
+                               recipe_title: RecipeTitle,
+                               steps: List[CookingStep],
+                               ingredients: List[Ingredient],
+                               nutrition_summary: NutritionSummary) -> LearnerPack:
+        """Build learner pack from extracted data when Gemini gives no valid pack"""
+        bullets = [
+            f"This recipe demonstrates {len(steps)} key cooking steps",
+            f"Contains {len(ingredients)} ingredients with various nutritional benefits",
+            f"Provides approximately {nutrition_summary.total_calories or 'unknown'} calories total"
+        ]
         
-        Return just the paragraph text, no markdown formatting.
-        """
+        # Add ingredient-specific learning points
+        for ingredient in ingredients[:3]:  # Top 3 ingredients
+            if ingredient.uses:
+                bullets.append(f"{ingredient.name.title()} is used for {', '.join(ingredient.uses[:2])}")
+        
+        # Create quiz questions
+        quiz_questions = [
+            QuizQuestion(
+                question=f"What is the main ingredient in {recipe_title.text}?",
+                options=[
+                    ingredients[0].name if ingredients else "Unknown",
+                    "Salt", "Water", "Oil"
+                ],
+                correct_answer=0,
+                explanation=f"The recipe features {ingredients[0].name if ingredients else 'various ingredients'} as a key component."
+            ),
+            QuizQuestion(
+                question="How many cooking steps does this recipe have?",
+                options=[str(len(steps)), str(len(steps)+1), str(len(steps)-1), str(len(steps)+2)],
+                correct_answer=0,
+                explanation=f"The recipe has {len(steps)} distinct cooking steps."
+            ),
+            QuizQuestion(
+                question="What is the estimated serving size?",
+                options=[
+                    str(nutrition_summary.servings or 2),
+                    str((nutrition_summary.servings or 2) + 1),
+                    str((nutrition_summary.servings or 2) - 1),
+                    "Unknown"
+                ],
+                correct_answer=0,
+                explanation=f"The recipe serves approximately {nutrition_summary.servings or 2} people."
+            )
+        ]
         
-        try:
-            response = self.gemini_model.generate_content(prompt)
-            return f"### Recipe Analysis Summary\n\n{response.text.strip()}"
-            
-        except Exception as e:
-            print(f"Failed to generate human summary: {e}")
-            
-            # Return basic fallback
-            return f"""### Recipe Analysis Summary
-
-This cooking video analysis identified "{recipe_title.text}" with {len(steps)} cooking steps and {len(ingredients)} ingredients. The recipe achieved an authenticity score of {authenticity_score}% and completeness score of {completeness_score}%, providing {nutrition_summary.total_calories or 'estimated'} total calories for {nutrition_summary.servings or 2} servings. The analysis includes detailed ingredient information, cooking techniques, and nutritional data to help preserve and share this culinary knowledge."""
\ No newline at end of file
+        return LearnerPack(
+            bullets=bullets[:6],  # Limit to 6 bullets
+            quiz=quiz_questions,
+            difficulty_level="beginner"
+        )
+    
+    def _template_summary(self,
+                          recipe_title: RecipeTitle,
+                          steps: List[CookingStep],
+                          ingredients: List[Ingredient],
+                          nutrition_summary: NutritionSummary,
+                          authenticity_score: int,
+                          completeness_score: int) -> str:
+        """Summary paragraph from extracted data when Gemini gives no usable summary"""
+        return f"""This cooking video analysis identified "{recipe_title.text}" with {len(steps)} cooking steps and {len(ingredients)} ingredients. The recipe achieved an authenticity score of {authenticity_score}% and completeness score of {completeness_score}%, providing {nutrition_summary.total_calories or 'estimated'} total calories for {nutrition_summary.servings or 2} servings. The analysis includes detailed ingredient information, cooking techniques, and nutritional data to help preserve and share this culinary knowledge."""
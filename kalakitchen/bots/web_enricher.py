@@ -2,274 +2,372 @@
 WebEnricher - Uses Gemini and web search to enrich ingredient data with nutrition and medicinal info
 """
 import asyncio
+import json
 import aiohttp
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from urllib.parse import quote_plus
-import google.generativeai as genai
 from bs4 import BeautifulSoup
-from ..models import Ingredient, Source, MedicinalNote, NutritionPer100g
+from ..models import Ingredient, Source, MedicinalNote, NutritionPer100g, IngredientEnrichment
 from ..config import settings, GEMINI_PROMPTS
+from ..llm.gateway import LLMGateway, get_default_gateway
+from ..llm.structured import StructuredResponder
+from ..reference.usda import get_usda_snapshot
+from ..reference.canonical import Canonicalizer, get_canonicalizer, canonical_id
+from ..enrichment_store import EnrichmentStore, get_enrichment_store, NUTRITION, MEDICINAL, CULINARY
+from ..circuit import CircuitBreaker, NegativeCache
+from ..http_pool import get_http_pool
+from ..ratelimit import HostLimiter
+from ..singleflight import SingleFlight
+
+USDA_HOST = "api.nal.usda.gov"
+
+# USDA lookups in flight, shared by all enricher instances
+USDA_FLIGHTS = SingleFlight("usda")
+
+# Outbound HTTP limits per host, shared by all enricher instances
+HOST_LIMITER = HostLimiter(
+    settings.HTTP_MAX_CONCURRENT_PER_HOST,
+    settings.HTTP_REQUESTS_PER_MINUTE_PER_HOST,
+    overrides={USDA_HOST: (settings.HTTP_MAX_CONCURRENT_PER_HOST, settings.USDA_REQUESTS_PER_MINUTE)}
+)
+
+# Per-source breakers and recent "not found" answers, shared by all enricher instances
+USDA_BREAKER = CircuitBreaker("usda", settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+GEMINI_BREAKER = CircuitBreaker("gemini_enrichment", settings.CIRCUIT_FAILURE_THRESHOLD, settings.CIRCUIT_RESET_SECONDS)
+ENRICHMENT_MISSES = NegativeCache(settings.ENRICHMENT_NEGATIVE_TTL_SECONDS)
+
+# Ingredient fields set by enrichment; everything else comes from extraction and quantity resolution
+ENRICHED_FIELDS = ('nutrition_per_100g', 'medicinal_notes', 'uses', 'substitutions', 'cultural_notes')
 
 class WebEnricher:
-    def __init__(self):
-        genai.configure(api_key=settings.GEMINI_API_KEY)
-        self.gemini_model = genai.GenerativeModel(settings.GEMINI_MODEL)
-        self.session = None
+    def __init__(self,
+                 gateway: Optional[LLMGateway] = None,
+                 store: Optional[EnrichmentStore] = None,
+                 canonicalizer: Optional[Canonicalizer] = None,
+                 session: Optional[aiohttp.ClientSession] = None):
+        self.gateway = gateway or get_default_gateway()
+        self.llm = self.gateway.client("web_enricher")
+        self.responder = StructuredResponder(self.llm)
+        self.store = store or (get_enrichment_store() if settings.ENRICHMENT_STORE_ENABLED else None)
+        self.canonicalizer = canonicalizer or get_canonicalizer()
+        # Shared application session unless one is injected; never closed here
+        self.session = session
     
     async def __aenter__(self):
-        self.session = aiohttp.ClientSession()
+        if self.session is None:
+            self.session = get_http_pool().session()
         return self
     
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        pass
     
     async def enrich_ingredients(self, ingredients: List[Ingredient]) -> List[Ingredient]:
         """
-        Enrich ingredient list with nutrition and medicinal data from web sources
+        Enrich ingredient list with nutrition and medicinal data from web sources.
+        Lookups are keyed by canonical ingredient ID, so synonyms ("haldi",
+        "turmeric") share one lookup and one store entry, and searches and
+        prompts use the canonical name. Stored results and USDA nutrition are
+        looked up concurrently, paced by the per-host limiter; whatever is
+        still missing is requested from Gemini for many ingredients per call,
+        in chunks of ENRICHMENT_BATCH_SIZE.
         """
-        enriched_ingredients = []
+        names: Dict[str, str] = {}
+        for ingredient in ingredients:
+            names.setdefault(self._lookup_key(ingredient), self._lookup_name(ingredient))
+        semaphore = asyncio.Semaphore(settings.ENRICHMENT_MAX_CONCURRENT_INGREDIENTS)
+        
+        async def lookup(key: str) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return await self._local_enrichment(key, names[key])
+                except Exception as e:
+                    print(f"Local enrichment lookup failed for {names[key]}: {e}")
+                    return {NUTRITION: None, MEDICINAL: None, CULINARY: None}
+        
+        enrichment = dict(zip(names, await asyncio.gather(*(lookup(key) for key in names))))
+        
+        # One combined request per chunk of ingredients with anything missing
+        needs = {key: self._needs(key, enrichment[key]) for key in names}
+        await self._gemini_enrichment({key: fields for key, fields in needs.items() if fields}, enrichment, names)
         
+        enriched_ingredients = []
         for ingredient in ingredients:
             try:
-                enriched = await self._enrich_single_ingredient(ingredient)
-                enriched_ingredients.append(enriched)
-                
-                # Rate limiting
-                await asyncio.sleep(0.5)
-                
+                enriched_ingredients.append(
+                    self._apply_enrichment(ingredient, enrichment[self._lookup_key(ingredient)])
+                )
             except Exception as e:
                 print(f"Failed to enrich ingredient {ingredient.name}: {e}")
                 enriched_ingredients.append(ingredient)
         
         return enriched_ingredients
     
+    def _lookup_key(self, ingredient: Ingredient) -> str:
+        """Canonical ID that stored results and cached misses are kept under"""
+        return ingredient.canonical_id or canonical_id(ingredient.name)
+    
+    def _lookup_name(self, ingredient: Ingredient) -> str:
+        """Canonical name to look an ingredient up by, or its extracted name if unknown"""
+        if ingredient.canonical_id:
+            return self.canonicalizer.name_for(ingredient.canonical_id) or ingredient.name
+        return ingredient.name
+    
+    def _needs(self, ingredient_id: str, enrichment: Dict[str, Any]) -> List[str]:
+        """Missing fields, except those Gemini recently could not find"""
+        return [
+            field for field, value in enrichment.items()
+            if value is None and (ingredient_id, field) not in ENRICHMENT_MISSES
+        ]
+    
     async def _enrich_single_ingredient(self, ingredient: Ingredient) -> Ingredient:
         """Enrich a single ingredient with web data"""
+        return (await self.enrich_ingredients([ingredient]))[0]
+    
+    async def _local_enrichment(self, ingredient_id: str, ingredient_name: str) -> Dict[str, Any]:
+        """
+        Enrichment available without Gemini: stored fields and USDA nutrition.
+        Fields that are still missing are None.
+        """
+        medicinal, culinary = await asyncio.gather(
+            self._store_get(ingredient_id, MEDICINAL), self._store_get(ingredient_id, CULINARY)
+        )
         
-        # Search for nutrition data
-        nutrition_data = await self._get_nutrition_data(ingredient.name)
-        
-        # Search for medicinal properties
-        medicinal_notes = await self._get_medicinal_properties(ingredient.name)
-        
-        # Get culinary uses and substitutions
-        culinary_info = await self._get_culinary_information(ingredient.name)
+        return {
+            NUTRITION: await self._get_nutrition_data(ingredient_id, ingredient_name),
+            MEDICINAL: [MedicinalNote(**note) for note in medicinal] if medicinal is not None else None,
+            CULINARY: culinary,
+        }
+    
+    def _apply_enrichment(self, ingredient: Ingredient, enrichment: Dict[str, Any]) -> Ingredient:
+        culinary_info = enrichment[CULINARY] or {}
         
         # Update ingredient with enriched data
-        ingredient.nutrition_per_100g = nutrition_data
-        ingredient.medicinal_notes = medicinal_notes
+        ingredient.nutrition_per_100g = enrichment[NUTRITION]
+        # Synonymous ingredients share one lookup result; give each its own lists
+        ingredient.medicinal_notes = list(enrichment[MEDICINAL] or [])
         ingredient.uses.extend(culinary_info.get("uses", []))
-        ingredient.substitutions = culinary_info.get("substitutions", [])
+        ingredient.substitutions = list(culinary_info.get("substitutions", []))
         ingredient.cultural_notes = culinary_info.get("cultural_notes")
         
         return ingredient
     
-    async def _get_nutrition_data(self, ingredient_name: str) -> Optional[NutritionPer100g]:
-        """Get nutrition data from USDA and other trusted sources"""
+    async def _get_nutrition_data(self, ingredient_id: str, ingredient_name: str) -> Optional[NutritionPer100g]:
+        """Get nutrition data from the store or USDA"""
         
-        # Search USDA FoodData Central
-        usda_data = await self._search_usda_nutrition(ingredient_name)
-        if usda_data:
-            return usda_data
+        stored = await self._store_get(ingredient_id, NUTRITION)
+        if stored is not None:
+            return NutritionPer100g(**stored)
         
-        # Fallback to Gemini web search
-        return await self._gemini_nutrition_search(ingredient_name)
+        nutrition = await self._fetch_nutrition_data(ingredient_id, ingredient_name)
+        if nutrition is not None:
+            await self._store_set(ingredient_id, NUTRITION, nutrition.dict())
+        return nutrition
     
-    async def _search_usda_nutrition(self, ingredient_name: str) -> Optional[NutritionPer100g]:
-        """Search USDA FoodData Central API"""
+    async def _store_get(self, ingredient_id: str, field: str) -> Optional[Any]:
+        """Stored enrichment field, or None; SQLite reads run off the event loop"""
+        if not self.store:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(None, self.store.get, ingredient_id, field)
+    
+    async def _store_set(self, ingredient_id: str, field: str, value: Any):
+        if self.store:
+            await asyncio.get_running_loop().run_in_executor(None, self.store.set, ingredient_id, field, value)
+    
+    async def _fetch_nutrition_data(self, ingredient_id: str, ingredient_name: str) -> Optional[NutritionPer100g]:
+        # Local FoodData Central snapshot, when one has been imported
+        snapshot = get_usda_snapshot()
+        if snapshot:
+            # SQLite full-text search; keep it off the event loop
+            nutrition = await asyncio.get_running_loop().run_in_executor(None, snapshot.lookup, ingredient_name)
+            if nutrition:
+                return nutrition
+        
+        # Live USDA FoodData Central (concurrent jobs share one lookup per name),
+        # unless it recently had no match or is failing
+        miss_key = ("usda", ingredient_id)
+        if settings.USDA_LIVE_FALLBACK and miss_key not in ENRICHMENT_MISSES and USDA_BREAKER.allow():
+            usda_data = await USDA_FLIGHTS.do(
+                ingredient_id,
+                lambda: self._guarded_usda_search(ingredient_name, miss_key)
+            )
+            if usda_data:
+                return usda_data.copy()
+        
+        # Otherwise nutrition is requested with the batched Gemini enrichment
+        return None
+    
+    async def _guarded_usda_search(self, ingredient_name: str, miss_key: Tuple[str, str]) -> Optional[NutritionPer100g]:
+        """Live USDA search with breaker accounting; errors open the breaker, empty results are cached as misses"""
         try:
-            # USDA FoodData Central API endpoint
-            search_url = f"https://api.nal.usda.gov/fdc/v1/foods/search"
-            params = {
-                "query": ingredient_name,
-                "dataType": ["Foundation", "SR Legacy"],
-                "pageSize": 1,
-                "api_key": "DEMO_KEY"  # Replace with actual API key
-            }
-            
-            async with self.session.get(search_url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    if data.get("foods"):
-                        food = data["foods"][0]
-                        nutrients = food.get("foodNutrients", [])
-                        
-                        # Map USDA nutrients to our model
-                        nutrition = NutritionPer100g()
-                        
-                        for nutrient in nutrients:
-                            nutrient_id = nutrient.get("nutrientId")
-                            value = nutrient.get("value", 0)
-                            
-                            # Map common nutrients (USDA nutrient IDs)
-                            if nutrient_id == 1008:  # Energy
-                                nutrition.calories = value
-                            elif nutrient_id == 1003:  # Protein
-                                nutrition.protein_g = value
-                            elif nutrient_id == 1004:  # Total lipid (fat)
-                                nutrition.fat_g = value
-                            elif nutrient_id == 1005:  # Carbohydrate
-                                nutrition.carbs_g = value
-                            elif nutrient_id == 1079:  # Fiber
-                                nutrition.fiber_g = value
-                            elif nutrient_id == 1093:  # Sodium
-                                nutrition.sodium_mg = value
-                            elif nutrient_id == 1087:  # Calcium
-                                nutrition.calcium_mg = value
-                            elif nutrient_id == 1089:  # Iron
-                                nutrition.iron_mg = value
-                            elif nutrient_id == 1162:  # Vitamin C
-                                nutrition.vitamin_c_mg = value
-                        
-                        return nutrition
-                        
+            nutrition = await self._search_usda_nutrition(ingredient_name)
         except Exception as e:
+            USDA_BREAKER.record_failure()
             print(f"USDA search failed for {ingredient_name}: {e}")
+            return None
         
-        return None
+        USDA_BREAKER.record_success()
+        if nutrition is None:
+            ENRICHMENT_MISSES.add(miss_key)
+        return nutrition
     
-    async def _gemini_nutrition_search(self, ingredient_name: str) -> Optional[NutritionPer100g]:
-        """Use Gemini to search for nutrition information"""
-        
-        prompt = GEMINI_PROMPTS["web_enrichment"].format(ingredient=ingredient_name)
-        
-        # Add specific nutrition search instructions
-        nutrition_prompt = f"""
-        {prompt}
-        
-        Search specifically for nutritional information per 100g for "{ingredient_name}".
-        
-        Find and return:
-        - Calories per 100g
-        - Protein (g) per 100g
-        - Fat (g) per 100g
-        - Carbohydrates (g) per 100g
-        - Fiber (g) per 100g
-        - Sugar (g) per 100g
-        - Sodium (mg) per 100g
-        - Potassium (mg) per 100g
-        - Vitamin C (mg) per 100g
-        - Iron (mg) per 100g
-        - Calcium (mg) per 100g
-        
-        Prioritize USDA FoodData Central, nutrition databases, and government sources.
-        Return data in JSON format with source citations.
-        """
+    async def _search_usda_nutrition(self, ingredient_name: str) -> Optional[NutritionPer100g]:
+        """Search USDA FoodData Central API; raises on request errors, returns None when nothing matches"""
+        # USDA FoodData Central API endpoint
+        search_url = f"https://{USDA_HOST}/fdc/v1/foods/search"
+        params = {
+            "query": ingredient_name,
+            "dataType": ["Foundation", "SR Legacy"],
+            "pageSize": 1,
+            "api_key": settings.USDA_API_KEY
+        }
         
-        try:
-            response = self.gemini_model.generate_content(nutrition_prompt)
-            
-            # Parse nutrition data from response
-            # This would need proper JSON parsing in production
-            return NutritionPer100g(
-                calories=100,  # Placeholder - parse from Gemini response
-                protein_g=5.0,
-                fat_g=2.0,
-                carbs_g=15.0,
-                fiber_g=3.0
-            )
+        async with HOST_LIMITER.limit(search_url), self.session.get(search_url, params=params) as response:
+            response.raise_for_status()
+            data = await response.json()
             
-        except Exception as e:
-            print(f"Gemini nutrition search failed for {ingredient_name}: {e}")
-            return None
+            if data.get("foods"):
+                food = data["foods"][0]
+                nutrients = food.get("foodNutrients", [])
+                
+                # Map USDA nutrients to our model
+                nutrition = NutritionPer100g()
+                
+                for nutrient in nutrients:
+                    nutrient_id = nutrient.get("nutrientId")
+                    value = nutrient.get("value", 0)
+                    
+                    # Map common nutrients (USDA nutrient IDs)
+                    if nutrient_id == 1008:  # Energy
+                        nutrition.calories = value
+                    elif nutrient_id == 1003:  # Protein
+                        nutrition.protein_g = value
+                    elif nutrient_id == 1004:  # Total lipid (fat)
+                        nutrition.fat_g = value
+                    elif nutrient_id == 1005:  # Carbohydrate
+                        nutrition.carbs_g = value
+                    elif nutrient_id == 1079:  # Fiber
+                        nutrition.fiber_g = value
+                    elif nutrient_id == 1093:  # Sodium
+                        nutrition.sodium_mg = value
+                    elif nutrient_id == 1087:  # Calcium
+                        nutrition.calcium_mg = value
+                    elif nutrient_id == 1089:  # Iron
+                        nutrition.iron_mg = value
+                    elif nutrient_id == 1162:  # Vitamin C
+                        nutrition.vitamin_c_mg = value
+                
+                return nutrition
+        
+        return None
     
-    async def _get_medicinal_properties(self, ingredient_name: str) -> List[MedicinalNote]:
-        """Get medicinal properties from PubMed and other medical sources"""
+    async def _gemini_enrichment(self,
+                                 needs: Dict[str, List[str]],
+                                 enrichment: Dict[str, Dict[str, Any]],
+                                 names: Dict[str, str]):
+        """
+        Fill the needed enrichment fields in place; all three are keyed by
+        canonical ID. Chunks are sent concurrently and a failed chunk only
+        loses its own ingredients.
+        """
+        keys = list(needs)
+        batch_size = max(1, settings.ENRICHMENT_BATCH_SIZE)
+        chunks = [keys[start:start + batch_size] for start in range(0, len(keys), batch_size)]
         
-        medicinal_prompt = f"""
-        Search for scientific evidence of medicinal or functional properties of "{ingredient_name}".
+        results = await asyncio.gather(
+            *(self._enrich_chunk(chunk, needs, enrichment, names) for chunk in chunks),
+            return_exceptions=True
+        )
         
-        Focus on:
-        1. Anti-inflammatory properties
-        2. Antioxidant effects
-        3. Digestive benefits
-        4. Cardiovascular effects
-        5. Immune system support
-        6. Traditional medicinal uses
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                print(f"Gemini enrichment failed for {len(chunk)} ingredients: {result}")
+    
+    async def _enrich_chunk(self,
+                            chunk: List[str],
+                            needs: Dict[str, List[str]],
+                            enrichment: Dict[str, Dict[str, Any]],
+                            names: Dict[str, str]):
+        """Request nutrition, medicinal notes and culinary info for one chunk in a single structured call"""
         
-        Use only high-quality sources:
-        - PubMed/NCBI research papers
-        - NIH/WHO publications
-        - Peer-reviewed medical journals
-        - Government health databases
+        # While Gemini is failing, skip straight to the fallbacks
+        if not GEMINI_BREAKER.allow():
+            return
         
-        For each claim, provide:
-        - The specific health benefit
-        - Source citation (URL, title, snippet)
-        - Confidence level based on evidence quality
+        entries = [{
+            'id': i,
+            'ingredient': names[key],
+            'needs': needs[key]
+        } for i, key in enumerate(chunk)]
         
-        Return as JSON array of medicinal notes with sources.
-        """
+        prompt = GEMINI_PROMPTS["web_enrichment"].format(
+            ingredients=json.dumps(entries, indent=2)
+        )
         
         try:
-            response = self.gemini_model.generate_content(medicinal_prompt)
-            
-            # Parse medicinal notes from response
-            # Placeholder implementation - would parse actual JSON response
-            medicinal_notes = [
-                MedicinalNote(
-                    claim="Anti-inflammatory properties",
-                    sources=[
-                        Source(
-                            url="https://pubmed.ncbi.nlm.nih.gov/example",
-                            title="Anti-inflammatory effects of common spices",
-                            snippet="Research shows significant anti-inflammatory activity...",
-                            domain="pubmed.ncbi.nlm.nih.gov",
-                            confidence=85
-                        )
-                    ],
-                    confidence=85
-                )
-            ]
-            
-            return medicinal_notes
-            
-        except Exception as e:
-            print(f"Medicinal properties search failed for {ingredient_name}: {e}")
-            return []
-    
-    async def _get_culinary_information(self, ingredient_name: str) -> Dict[str, Any]:
-        """Get culinary uses, substitutions, and cultural information"""
+            results = await self.responder.generate_list(prompt, IngredientEnrichment)
+        except Exception:
+            GEMINI_BREAKER.record_failure()
+            raise
+        GEMINI_BREAKER.record_success()
         
-        culinary_prompt = f"""
-        Search for culinary information about "{ingredient_name}":
+        answered = set()
+        for result in results:
+            if not 0 <= result.id < len(chunk) or result.id in answered:
+                continue
+            answered.add(result.id)
+            key = chunk[result.id]
+            await self._merge_enrichment(key, needs[key], enrichment[key], result)
         
-        1. CULINARY USES:
-        - Common cooking applications
-        - Flavor profile and characteristics
-        - Best cooking methods
-        - Pairing suggestions
-        
-        2. SUBSTITUTIONS:
-        - What can substitute for this ingredient
-        - Conversion ratios if applicable
-        - When substitutions work best
+        # Ingredients left out of the answer are not asked for again until the miss expires
+        for i, key in enumerate(chunk):
+            if i not in answered:
+                for field in needs[key]:
+                    ENRICHMENT_MISSES.add((key, field))
+    
+    async def _merge_enrichment(self,
+                                ingredient_id: str,
+                                fields: List[str],
+                                enrichment: Dict[str, Any],
+                                result: IngredientEnrichment):
+        """Fill the requested fields for one ingredient, storing non-empty ones and caching misses"""
+        found = set()
         
-        3. CULTURAL SIGNIFICANCE:
-        - Traditional uses in different cuisines
-        - Cultural or religious significance
-        - Regional variations
+        nutrition = result.nutrition_per_100g
+        if NUTRITION in fields and nutrition is not None and any(v is not None for v in nutrition.dict().values()):
+            enrichment[NUTRITION] = nutrition
+            found.add(NUTRITION)
+            await self._store_set(ingredient_id, NUTRITION, nutrition.dict())
         
-        Use reliable culinary sources, cultural databases, and cooking references.
-        Return as JSON with uses, substitutions, and cultural_notes.
-        """
+        if MEDICINAL in fields:
+            notes = self._filter_trusted_notes(result.medicinal_notes)
+            enrichment[MEDICINAL] = notes
+            if notes:
+                found.add(MEDICINAL)
+                await self._store_set(ingredient_id, MEDICINAL, [note.dict() for note in notes])
         
-        try:
-            response = self.gemini_model.generate_content(culinary_prompt)
-            
-            # Parse culinary information
-            # Placeholder - would parse actual JSON response
-            return {
-                "uses": ["flavoring", "coloring", "preservation"],
-                "substitutions": ["paprika (for color)", "ginger (for warmth)"],
-                "cultural_notes": "Sacred spice in Indian cuisine, used in traditional ceremonies"
+        if CULINARY in fields:
+            culinary = {
+                "uses": result.uses,
+                "substitutions": result.substitutions,
+                "cultural_notes": result.cultural_notes,
             }
-            
-        except Exception as e:
-            print(f"Culinary information search failed for {ingredient_name}: {e}")
-            return {"uses": [], "substitutions": [], "cultural_notes": None}
+            enrichment[CULINARY] = culinary
+            if result.uses or result.substitutions or result.cultural_notes:
+                found.add(CULINARY)
+                await self._store_set(ingredient_id, CULINARY, culinary)
+        
+        for field in fields:
+            if field not in found:
+                ENRICHMENT_MISSES.add((ingredient_id, field))
+    
+    def _filter_trusted_notes(self, notes: List[MedicinalNote]) -> List[MedicinalNote]:
+        """Keep only sources from trusted domains and drop notes left without any"""
+        trusted_notes = []
+        for note in notes:
+            note.sources = [source for source in note.sources if self._is_trusted_domain(source.url)]
+            if note.sources:
+                trusted_notes.append(note)
+        return trusted_notes
     
     def _is_trusted_domain(self, url: str) -> bool:
         """Check if URL is from a trusted domain"""
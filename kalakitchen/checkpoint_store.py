@@ -0,0 +1,80 @@
+"""
+CheckpointStore - Stage outputs of analysis jobs kept as JSON files, so failed or interrupted jobs can resume
+"""
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Any, Optional, Tuple, Type, Union
+from pydantic import BaseModel
+from .config import settings
+from .models import VideoMetadata
+from .llm.structured import validate_model
+
+class CheckpointStore:
+    """
+    One directory per video holding the job parameters (job.json) and one
+    JSON file per completed stage. Writes go through a temporary file and
+    an atomic rename, as in ReportStore, so a crash mid-write never leaves
+    a truncated checkpoint behind.
+    """
+    
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    def path_for(self, video_id: str, name: str) -> Path:
+        return self.directory / video_id / f"{name}.json"
+    
+    def save_job(self, video_id: str, metadata: VideoMetadata, fast_report: bool):
+        self._write(self.path_for(video_id, "job"), {"metadata": metadata.dict(), "fast_report": fast_report})
+    
+    def load_job(self, video_id: str) -> Optional[Tuple[VideoMetadata, bool]]:
+        """Metadata and report mode of a checkpointed job, or None if there is none"""
+        data = self._read(self.path_for(video_id, "job"))
+        if data is None:
+            return None
+        return validate_model(VideoMetadata, data["metadata"]), data["fast_report"]
+    
+    def save(self, video_id: str, stage: str, output: Any):
+        """Persist a stage output: a model or a list of models"""
+        if isinstance(output, list):
+            data = [item.dict() for item in output]
+        else:
+            data = output.dict()
+        self._write(self.path_for(video_id, stage), data)
+    
+    def load(self, video_id: str, stage: str, model_cls: Type[BaseModel], many: bool = False) -> Any:
+        """A stage output saved earlier, or None if the stage has no checkpoint"""
+        data = self._read(self.path_for(video_id, stage))
+        if data is None:
+            return None
+        if many:
+            return [validate_model(model_cls, item) for item in data]
+        return validate_model(model_cls, data)
+    
+    def clear(self, video_id: str):
+        """Drop all checkpoints of a job once its report is complete"""
+        shutil.rmtree(self.directory / video_id, ignore_errors=True)
+    
+    def _write(self, path: Path, data: Any):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_suffix(".json.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, default=str)
+        os.replace(temp_path, path)
+    
+    def _read(self, path: Path) -> Any:
+        if not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+_checkpoint_store: Optional[CheckpointStore] = None
+
+def get_checkpoint_store() -> CheckpointStore:
+    """Process-wide checkpoint store"""
+    global _checkpoint_store
+    if _checkpoint_store is None:
+        _checkpoint_store = CheckpointStore(Path(settings.OUTPUT_DIR) / "checkpoints")
+    return _checkpoint_store
@@ -0,0 +1,105 @@
+"""
+KalaKitchen Circuit Breakers - Fail fast on degraded upstream sources and remember "not found" answers briefly
+"""
+import time
+from typing import Dict, Any, Hashable, Optional
+
+class CircuitBreaker:
+    """
+    Per-source breaker. After failure_threshold consecutive failures the
+    circuit opens and calls are skipped without waiting on the source. Once
+    reset_seconds have passed it goes half-open and lets a single probe
+    through: success closes the circuit, failure opens it again.
+    """
+    
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+    
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.skipped = 0
+        self.opened_at: Optional[float] = None
+        self._probe_started: Optional[float] = None
+    
+    def allow(self) -> bool:
+        """Whether a call may go to the source now"""
+        now = time.monotonic()
+        if self.state == self.OPEN and now - self.opened_at >= self.reset_seconds:
+            self.state = self.HALF_OPEN
+        
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.HALF_OPEN:
+            # One probe at a time; a probe that never reported back (cancelled) is replaced
+            if self._probe_started is None or now - self._probe_started >= self.reset_seconds:
+                self._probe_started = now
+                return True
+        
+        self.skipped += 1
+        return False
+    
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probe_started = None
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+        self._probe_started = None
+    
+    def stats(self) -> Dict[str, Any]:
+        """Current state, consecutive failures and calls skipped while open"""
+        stats = {"state": self.state, "failures": self.failures, "skipped": self.skipped}
+        if self.state == self.OPEN:
+            stats["retry_in_seconds"] = round(
+                max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at)), 1
+            )
+        return stats
+
+class NegativeCache:
+    """
+    Short-lived memory of lookups that came back empty, so a source that has
+    just said "not found" is not asked again for the same key until ttl_seconds
+    pass.
+    """
+    
+    def __init__(self, ttl_seconds: float, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self._expires: Dict[Hashable, float] = {}
+    
+    def add(self, key: Hashable):
+        if len(self._expires) >= self.max_entries:
+            self._prune()
+        self._expires[key] = time.monotonic() + self.ttl_seconds
+    
+    def __contains__(self, key: Hashable) -> bool:
+        expires_at = self._expires.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self._expires[key]
+            return False
+        self.hits += 1
+        return True
+    
+    def _prune(self):
+        now = time.monotonic()
+        self._expires = {key: expires_at for key, expires_at in self._expires.items() if expires_at >= now}
+        # Still full of live entries: drop the ones expiring soonest
+        if len(self._expires) >= self.max_entries:
+            keep = sorted(self._expires.items(), key=lambda item: item[1])[len(self._expires) // 2:]
+            self._expires = dict(keep)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._expires), "hits": self.hits}
@@ -13,6 +13,8 @@ async def main():
     parser.add_argument("--language", default="en", help="Video language (default: en)")
     parser.add_argument("--region", default="US", help="Video region (default: US)")
     parser.add_argument("--output", "-o", help="Output JSON file path")
+    parser.add_argument("--fast-report", action="store_true",
+                        help="Build learner pack and summary from templates, without Gemini")
     parser.add_argument("--verbose", "-v", action="store_true", help="Verbose output")
     
     args = parser.parse_args()
@@ -37,7 +39,7 @@ async def main():
     try:
         # Run analysis
         result = await workflow.analyze_video_sync(
-            video_content, video_path.name, args.language, args.region
+            video_content, video_path.name, args.language, args.region, args.fast_report
         )
         
         # Output results
@@ -75,6 +77,8 @@ async def main():
     except Exception as e:
         print(f"Error: {e}")
         return
+    finally:
+        await workflow.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -2,12 +2,13 @@
 KalaKitchen Configuration
 """
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
     # API Keys
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    USDA_API_KEY: str = os.getenv("USDA_API_KEY", "DEMO_KEY")
     
     # Video Processing
     MAX_VIDEO_SIZE_MB: int = 500
@@ -18,6 +19,90 @@ class Settings(BaseSettings):
     GEMINI_MODEL: str = "gemini-1.5-pro"
     WHISPER_MODEL: str = "base"
     
+    # Claim Extraction (map-reduce over time windows for long videos)
+    CLAIM_MAP_REDUCE_MIN_SECONDS: int = 600
+    CLAIM_WINDOW_SECONDS: int = 180
+    CLAIM_WINDOW_OVERLAP_SECONDS: int = 15
+    CLAIM_MAX_CONCURRENT_WINDOWS: int = 4
+    
+    # Quantity Resolution (ingredients resolved per Gemini request)
+    QUANTITY_BATCH_SIZE: int = 20
+    # Explicit evidence at or above this confidence that agrees is resolved without Gemini
+    # (transcript confidence is exp(avg_logprob) * 100, so 70 is avg_logprob >= -0.36;
+    # OCR readings score 75)
+    QUANTITY_FAST_PATH_ENABLED: bool = True
+    QUANTITY_FAST_PATH_MIN_CONFIDENCE: int = 70
+    # Directory with densities.csv and portions.csv replacing the packaged tables
+    DENSITY_TABLE_DIR: Optional[str] = None
+    
+    # Ingredient Canonicalization (names the synonym dictionary misses)
+    CANONICAL_EMBEDDINGS_ENABLED: bool = True
+    CANONICAL_EMBEDDING_MODEL: str = "paraphrase-multilingual-MiniLM-L12-v2"
+    CANONICAL_MATCH_MIN_SIMILARITY: float = 0.75
+    
+    # Structured Output (re-requests for malformed or invalid parts)
+    LLM_STRUCTURED_MAX_REPAIRS: int = 1
+    
+    # LLM Gateway (shared by all bots)
+    LLM_MAX_CONCURRENT_REQUESTS: int = 8
+    LLM_REQUESTS_PER_MINUTE: int = 60
+    LLM_TOKENS_PER_MINUTE: int = 1000000
+    LLM_MAX_RETRIES: int = 4
+    LLM_RETRY_BASE_SECONDS: float = 1.0
+    LLM_RETRY_MAX_SECONDS: float = 30.0
+    LLM_DEFAULT_DEADLINE_SECONDS: float = 120.0
+    
+    # LLM Telemetry (USD per 1K tokens, used for per-job cost estimates)
+    LLM_PRICE_PER_1K_PROMPT_TOKENS: float = 0.00125
+    LLM_PRICE_PER_1K_RESPONSE_TOKENS: float = 0.005
+    
+    # LLM Backend: "live", "record" (live + capture to cassette) or "replay" (offline)
+    LLM_BACKEND: str = "live"
+    LLM_CASSETTE_PATH: str = "cassettes/gemini.jsonl"
+    LLM_REPLAY_LATENCY_SECONDS: float = 0.0
+    LLM_REPLAY_LATENCY_JITTER_SECONDS: float = 0.0
+    LLM_REPLAY_ERROR_RATE: float = 0.0
+    LLM_REPLAY_SEED: Optional[int] = None
+    
+    # LLM Response Cache (bot names: asr, keyframe, claim_extractor,
+    # quantity_resolver, web_enricher, report_generator)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_PATH: str = "cache/llm_responses.sqlite3"
+    LLM_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    LLM_CACHE_MAX_MB: int = 512
+    LLM_CACHE_DISABLED_BOTS: List[str] = []
+    
+    # Web Enrichment (Gemini lookups are limited by the LLM gateway)
+    ENRICHMENT_MAX_CONCURRENT_INGREDIENTS: int = 8
+    ENRICHMENT_BATCH_SIZE: int = 15  # ingredients per combined Gemini enrichment request
+    HTTP_MAX_CONCURRENT_PER_HOST: int = 4
+    HTTP_REQUESTS_PER_MINUTE_PER_HOST: int = 60
+    USDA_REQUESTS_PER_MINUTE: int = 16  # 1,000 requests/hour with a registered key
+    # Sources failing this many times in a row are skipped until a probe succeeds
+    CIRCUIT_FAILURE_THRESHOLD: int = 5
+    CIRCUIT_RESET_SECONDS: float = 30.0
+    # "Not found" answers from USDA or Gemini are not re-requested for this long
+    ENRICHMENT_NEGATIVE_TTL_SECONDS: float = 600.0
+    
+    # HTTP Client Pool (one keep-alive session per process)
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_KEEPALIVE_SECONDS: float = 30.0
+    HTTP_DNS_CACHE_TTL_SECONDS: int = 300
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_TOTAL_TIMEOUT_SECONDS: float = 30.0
+    
+    # USDA FoodData Central snapshot (see kalakitchen/reference/usda.py); the live API is a fallback
+    USDA_SNAPSHOT_PATH: str = "data/usda_fdc.sqlite3"
+    USDA_LIVE_FALLBACK: bool = True
+    
+    # Enrichment Store (per-ingredient results reused across videos)
+    ENRICHMENT_STORE_ENABLED: bool = True
+    ENRICHMENT_STORE_PATH: str = "cache/enrichment.sqlite3"
+    ENRICHMENT_STORE_WARM_ENTRIES: int = 5000
+    ENRICHMENT_NUTRITION_TTL_DAYS: int = 90
+    ENRICHMENT_MEDICINAL_TTL_DAYS: int = 30
+    ENRICHMENT_CULINARY_TTL_DAYS: int = 180
+    
     # Trusted Sources for Web Enrichment
     TRUSTED_DOMAINS: List[str] = [
         "fdc.nal.usda.gov",  # USDA FoodData Central
@@ -40,6 +125,14 @@ class Settings(BaseSettings):
     UPLOAD_DIR: str = "uploads"
     TEMP_DIR: str = "temp"
     OUTPUT_DIR: str = "outputs"
+    # Completed reports are kept in OUTPUT_DIR/reports for serving and recomputation
+    REPORT_STORE_ENABLED: bool = True
+    # Stage outputs of unfinished jobs are kept in OUTPUT_DIR/checkpoints so they can be resumed
+    CHECKPOINTS_ENABLED: bool = True
+    
+    # Monte Carlo confidence intervals on nutrition totals (0 draws disables them)
+    NUTRITION_UNCERTAINTY_DRAWS: int = 2000
+    NUTRITION_CONFIDENCE_LEVEL: float = 0.9
     
     class Config:
         env_file = ".env"
@@ -76,28 +169,28 @@ Return structured JSON with confidence scores for each claim.
 """,
 
     "web_enrichment": """
-You are a nutrition and culinary research expert. For the ingredient "{ingredient}", search for and compile:
+You are a nutrition and culinary research expert. For each ingredient below, compile only the fields listed in its "needs":
+
+{ingredients}
 
-1. Nutritional information per 100g (calories, protein, fat, carbs, fiber, vitamins, minerals)
-2. Medicinal/functional properties with scientific backing
-3. Culinary uses and substitution suggestions
-4. Cultural significance if applicable
+- nutrition: nutrition_per_100g (calories, protein, fat, carbs, fiber, sugar, sodium, potassium, vitamin C, iron, calcium)
+- medicinal_notes: medicinal/functional properties with scientific backing (anti-inflammatory, antioxidant, digestive, cardiovascular, immune, traditional uses)
+- culinary: uses (applications, flavor, cooking methods, pairings), substitutions (with conversion ratios where applicable) and cultural_notes (traditional and regional uses)
 
 Use only trusted sources: USDA FoodData Central, PubMed, NIH, WHO, academic journals, government nutrition databases.
 
-Provide citations for all claims with URL, title, and relevant snippet.
+Provide citations for all medicinal claims with URL, title, and relevant snippet.
 Rate confidence of each claim 0-100 based on source quality and consensus.
+Return one result per ingredient, with the same id.
 """,
 
     "quantity_resolution": """
-Analyze the following evidence to determine the most accurate quantity for ingredient "{ingredient}":
+Analyze the following evidence to determine the most accurate quantity for each ingredient.
+Each entry has an id, the ingredient name, transcript, OCR and visual evidence, and typical recipe amounts:
 
-TRANSCRIPT EVIDENCE: {transcript_evidence}
-OCR EVIDENCE: {ocr_evidence}
-VISUAL EVIDENCE: {visual_evidence}
-TYPICAL RECIPE AMOUNTS: {typical_amounts}
+{ingredients}
 
-Provide:
+Return one result per ingredient, with the same id, providing:
 1. Best estimate quantity with unit
 2. Confidence level (0-100)
 3. Whether this is estimated or explicit
@@ -108,22 +201,28 @@ Consider cultural cooking practices and typical recipe proportions.
 """,
 
     "report_generation": """
-Generate a comprehensive cooking video analysis report based on the following data:
+Write the educational content and summary for this cooking video analysis.
 
-EXTRACTED CLAIMS: {claims}
-ENRICHMENT DATA: {enrichment}
-NUTRITION DATA: {nutrition}
-CONFIDENCE SCORES: {confidence}
+RECIPE DATA:
+{recipe}
 
-Create:
-1. Human-readable markdown summary (1 paragraph)
-2. Learner pack with 3-6 key learning points
-3. Quiz with 3 multiple choice questions
-4. Overall authenticity and completeness scores
-5. List of missing fields
-6. Status recommendation (Verified/Review/Not Verified)
+Return JSON with:
+- "summary": one paragraph of 3-4 sentences for a general audience that names the recipe, describes its key characteristics and states the authenticity and completeness scores. Plain text, no markdown.
+- "bullets": 3-6 key learning points about cooking techniques demonstrated, nutritional benefits of ingredients, cultural or culinary significance and tips for success.
+- "quiz": 3 multiple choice questions with 4 options each: one about a cooking technique, one about ingredient benefits and one about nutrition or serving size. "correct_answer" is the index of the correct option; add a brief "explanation".
+- "difficulty_level": "beginner", "intermediate" or "advanced".
 
 Include proper medical disclaimer for any health claims.
 Maintain cultural sensitivity and preserve original terminology.
+""",
+
+    "structured_repair": """
+Part of your previous JSON response was malformed or failed validation.
+The problems are listed below as JSON, with the error and the value you returned:
+
+{problems}
+
+Return corrected JSON for ONLY these parts, following the response schema exactly.
+Do not repeat parts that were not listed.
 """
 }
\ No newline at end of file
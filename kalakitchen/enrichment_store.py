@@ -0,0 +1,159 @@
+"""
+EnrichmentStore - Persistent per-ingredient enrichment data with per-field TTLs
+"""
+import copy
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple, Union
+from .config import settings
+
+# Enrichment fields stored per ingredient
+NUTRITION = "nutrition"
+MEDICINAL = "medicinal_notes"
+CULINARY = "culinary"
+
+def field_ttls() -> Dict[str, float]:
+    day = 24 * 3600
+    return {
+        NUTRITION: settings.ENRICHMENT_NUTRITION_TTL_DAYS * day,
+        MEDICINAL: settings.ENRICHMENT_MEDICINAL_TTL_DAYS * day,
+        CULINARY: settings.ENRICHMENT_CULINARY_TTL_DAYS * day,
+    }
+
+class EnrichmentStore:
+    """
+    SQLite store of enrichment results (nutrition, medicinal notes, culinary
+    info) keyed by canonical ingredient ID (the name column) and field, so
+    entries survive a change of an ingredient's display name. Each field
+    expires on its own TTL. warm() preloads the most-used entries into memory
+    so common ingredients are served without touching disk.
+    """
+    
+    # Use counts are written back in batches rather than on every read
+    USE_FLUSH_THRESHOLD = 100
+    
+    def __init__(self,
+                 path: Union[str, Path],
+                 ttls: Optional[Dict[str, float]] = None,
+                 read_only: bool = False):
+        self.path = Path(path)
+        self.ttls = ttls or field_ttls()
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        
+        self._memory: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+        self._pending_uses: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        
+        if read_only:
+            # Readers in other processes (bulk recomputation) leave use counts alone
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+            return
+        
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS enrichment (
+                name TEXT NOT NULL,
+                field TEXT NOT NULL,
+                value TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                uses INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (name, field)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_enrichment_uses ON enrichment (uses)")
+        self._conn.commit()
+    
+    def warm(self, limit: int = 5000) -> int:
+        """Load the most-used unexpired entries into memory; returns the number loaded"""
+        now = time.time()
+        with self._lock:
+            self._flush_uses()
+            rows = self._conn.execute(
+                "SELECT name, field, value, fetched_at FROM enrichment ORDER BY uses DESC LIMIT ?",
+                (limit,)
+            ).fetchall()
+            for name, field, value, fetched_at in rows:
+                if not self._expired(field, fetched_at, now):
+                    self._memory[(name, field)] = (json.loads(value), fetched_at)
+        return len(self._memory)
+    
+    def get(self, ingredient_id: str, field: str) -> Optional[Any]:
+        """Return a stored JSON value, or None if missing or expired"""
+        key = (ingredient_id, field)
+        now = time.time()
+        
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                row = self._conn.execute(
+                    "SELECT value, fetched_at FROM enrichment WHERE name = ? AND field = ?", key
+                ).fetchone()
+                if row is not None:
+                    entry = (json.loads(row[0]), row[1])
+                    self._memory[key] = entry
+            
+            if entry is None or self._expired(field, entry[1], now):
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+            
+            if not self.read_only:
+                self._pending_uses[key] = self._pending_uses.get(key, 0) + 1
+                if len(self._pending_uses) >= self.USE_FLUSH_THRESHOLD:
+                    self._flush_uses()
+            self.hits += 1
+            # Callers may mutate what they get back
+            return copy.deepcopy(entry[0])
+    
+    def set(self, ingredient_id: str, field: str, value: Any):
+        """Store a JSON-serializable value for an ingredient field"""
+        key = (ingredient_id, field)
+        now = time.time()
+        
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO enrichment (name, field, value, fetched_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (name, field) DO UPDATE SET value = excluded.value, fetched_at = excluded.fetched_at
+                """,
+                (key[0], field, json.dumps(value, default=str), now)
+            )
+            self._conn.commit()
+            self._memory[key] = (copy.deepcopy(value), now)
+    
+    def flush(self):
+        """Write pending use counts to disk"""
+        with self._lock:
+            self._flush_uses()
+    
+    def _flush_uses(self):
+        self._conn.executemany(
+            "UPDATE enrichment SET uses = uses + ? WHERE name = ? AND field = ?",
+            [(count, name, field) for (name, field), count in self._pending_uses.items()]
+        )
+        self._conn.commit()
+        self._pending_uses.clear()
+    
+    def _expired(self, field: str, fetched_at: float, now: float) -> bool:
+        ttl = self.ttls.get(field)
+        return ttl is not None and now - fetched_at > ttl
+    
+    def stats(self) -> Dict[str, Any]:
+        """Lookups served from the store and lookups that had to be fetched"""
+        return {"hits": self.hits, "misses": self.misses, "in_memory": len(self._memory)}
+
+_enrichment_store: Optional[EnrichmentStore] = None
+
+def get_enrichment_store() -> EnrichmentStore:
+    """Process-wide enrichment store shared by all enrichers"""
+    global _enrichment_store
+    if _enrichment_store is None:
+        _enrichment_store = EnrichmentStore(settings.ENRICHMENT_STORE_PATH)
+    return _enrichment_store
@@ -0,0 +1,281 @@
+"""
+KalaKitchen Evidence Index - Per-video inverted index over transcript and keyframe text
+"""
+import re
+from typing import List, Dict, Any, Optional, Set, Tuple
+from .models import TranscriptSegment, KeyframeData
+
+# Units end at a word boundary (optionally pluralized), so "2 lemons" is
+# not read as 2 l and "4 garlic cloves" not as 4 g
+QUANTITY_PATTERNS = [
+    re.compile(r'(\d+(?:\.\d+)?)\s*(cup|tsp|tbsp|tablespoon|teaspoon|oz|ounce|lb|pound|gram|g|kg|ml|liter|litre|l|piece|clove)s?\b', re.IGNORECASE),
+    re.compile(r'(\d+/\d+)\s*(cup|tsp|tbsp)s?\b', re.IGNORECASE),  # Fractions
+    re.compile(r'(half|quarter|third)\s*(cup|tsp|tbsp)s?\b', re.IGNORECASE),  # Word fractions
+    re.compile(r'(\d+)\s*(medium|large|small)\s*(onion|tomato|potato|carrot)', re.IGNORECASE),  # Sized items
+]
+
+VISUAL_PATTERNS = [
+    re.compile(r'(small|medium|large|huge|tiny)\s+(amount|portion|bowl|plate)', re.IGNORECASE),
+    re.compile(r'(handful|pinch|dash|sprinkle)', re.IGNORECASE),
+    re.compile(r'(full|half|quarter)\s+(cup|bowl|spoon)', re.IGNORECASE),
+    re.compile(r'(measuring\s+cup|measuring\s+spoon)', re.IGNORECASE),
+]
+
+MEASUREMENT_UNITS = ['cup', 'tsp', 'tbsp', 'oz', 'lb', 'gram', 'ml', 'liter']
+
+WORD_FRACTIONS = {'half': 0.5, 'quarter': 0.25, 'third': 0.33}
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+# Reading confidences on the 0-100 scale of transcript segments (exp(avg_logprob) * 100)
+OCR_CONFIDENCE = 75
+VISUAL_CONFIDENCE = 60
+
+# A quantity belongs to an ingredient when at most this many tokens separate
+# it from the ingredient it precedes ("2 cups of water"), or when it directly
+# follows the ingredient ("salt, 1 tsp")
+QUANTITY_LEAD_GAP_TOKENS = 1
+
+def parse_quantity(quantity_str: str) -> Optional[float]:
+    """Parse quantity string to float"""
+    try:
+        # Handle fractions
+        if '/' in quantity_str:
+            parts = quantity_str.split('/')
+            return float(parts[0]) / float(parts[1])
+        
+        # Handle word fractions
+        if quantity_str.lower() in WORD_FRACTIONS:
+            return WORD_FRACTIONS[quantity_str.lower()]
+        
+        # Handle regular numbers
+        return float(quantity_str)
+    
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def extract_quantity_patterns(text: str) -> List[Dict[str, Any]]:
+    """
+    Extract quantity and unit patterns from text, in text order. Where
+    patterns overlap ("1/2 cup" also contains "2 cup") the longest match
+    starting first wins.
+    """
+    found = sorted(
+        (match for pattern in QUANTITY_PATTERNS for match in pattern.finditer(text)),
+        key=lambda match: (match.start(), -match.end())
+    )
+    matches = []
+    covered_until = 0
+    for match in found:
+        if match.start() < covered_until:
+            continue
+        quantity = parse_quantity(match.group(1))
+        if quantity is not None:
+            matches.append({
+                'quantity': quantity,
+                'unit': match.group(2).lower(),
+                'original_text': match.group(0),
+                'span': match.span()
+            })
+            covered_until = match.end()
+    return matches
+
+def extract_visual_quantity_cues(description: str) -> List[str]:
+    """Extract visual quantity indicators from frame descriptions"""
+    return [match.group(0) for pattern in VISUAL_PATTERNS for match in pattern.finditer(description)]
+
+def contains_measurements(text: str) -> bool:
+    """Check if text contains measurement units"""
+    text = text.lower()
+    return any(unit in text for unit in MEASUREMENT_UNITS)
+
+# Plurals the suffix rules below would fold wrongly ("leaves" -> "leave")
+IRREGULAR_PLURALS = {'leaves': 'leaf', 'halves': 'half', 'loaves': 'loaf', 'knives': 'knife'}
+
+def _stem(token: str) -> str:
+    """
+    Fold simple plurals so "onions" and "tomatoes" match "onion" and "tomato".
+    An "-ies" plural may come from "-y" (berries), "-i" (chillies) or "-ie"
+    (cookies), so all of those fold to a final "i" in singular and plural.
+    """
+    if token in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[token]
+    if len(token) > 4 and token.endswith("oes"):
+        return token[:-2]
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-2]
+    if len(token) > 3 and token.endswith("ie"):
+        return token[:-1]
+    if len(token) > 2 and token.endswith("y") and token[-2] not in "aeiouy":
+        return token[:-1] + "i"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, plural-folded word tokens"""
+    return [_stem(token) for token in TOKEN_PATTERN.findall(text.lower())]
+
+def token_span(text: str, span: Tuple[int, int]) -> Tuple[int, int]:
+    """Token positions [start, end) covering a character span of text"""
+    positions = [
+        i for i, match in enumerate(TOKEN_PATTERN.finditer(text.lower()))
+        if match.start() < span[1] and match.end() > span[0]
+    ]
+    if not positions:
+        return span[0], span[0]
+    return positions[0], positions[-1] + 1
+
+def is_adjacent(quantity: Tuple[int, int], phrase_starts: List[int], phrase_length: int) -> bool:
+    """
+    Whether a quantity's tokens are next to (or include) an occurrence of the
+    ingredient phrase. A phrase starting right after the number is the unit
+    running into the ingredient word ("2 lemons" read as "2 l"), not a reading.
+    """
+    for start in phrase_starts:
+        end = start + phrase_length
+        if quantity[0] + 1 < start and end <= quantity[1]:
+            # Sized items: "2 medium onions"
+            return True
+        if 0 <= start - quantity[1] <= QUANTITY_LEAD_GAP_TOKENS or quantity[0] == end:
+            return True
+    return False
+
+class _Postings:
+    """Token n-gram -> document positions for one evidence source"""
+    
+    def __init__(self, max_ngram: int):
+        self.max_ngram = max_ngram
+        self.index: Dict[Tuple[str, ...], Set[int]] = {}
+        self.normalized: List[str] = []
+        self.tokens: List[List[str]] = []
+    
+    def add(self, text: str) -> int:
+        position = len(self.normalized)
+        tokens = tokenize(text)
+        self.normalized.append(f" {' '.join(tokens)} ")
+        self.tokens.append(tokens)
+        
+        for n in range(1, self.max_ngram + 1):
+            for start in range(len(tokens) - n + 1):
+                self.index.setdefault(tuple(tokens[start:start + n]), set()).add(position)
+        return position
+    
+    def find(self, tokens: List[str]) -> List[int]:
+        """Positions whose text contains the token phrase"""
+        if not tokens:
+            return []
+        if len(tokens) <= self.max_ngram:
+            return sorted(self.index.get(tuple(tokens), ()))
+        
+        # Longer phrases: intersect the unigram postings, then verify adjacency
+        candidates = set.intersection(*(self.index.get((token,), set()) for token in tokens))
+        phrase = f" {' '.join(tokens)} "
+        return sorted(p for p in candidates if phrase in self.normalized[p])
+    
+    def phrase_starts(self, position: int, tokens: List[str]) -> List[int]:
+        """Token offsets where the phrase occurs in the text at position"""
+        text = self.tokens[position]
+        n = len(tokens)
+        return [i for i in range(len(text) - n + 1) if text[i:i + n] == tokens] if n else []
+
+class EvidenceIndex:
+    """
+    Built once per video after ASR and keyframe analysis. Transcript segments,
+    OCR lines and frame descriptions are tokenized, indexed by n-gram and have
+    their quantity patterns and visual cues extracted up front, so evidence for
+    an ingredient is a dictionary lookup rather than a scan of the whole video.
+    """
+    
+    MAX_NGRAM = 3
+    
+    def __init__(self, transcript: List[TranscriptSegment], keyframes: List[KeyframeData]):
+        self.transcript = _Postings(self.MAX_NGRAM)
+        self.ocr = _Postings(self.MAX_NGRAM)
+        self.visual = _Postings(self.MAX_NGRAM)
+        
+        self._transcript_evidence: List[List[Dict[str, Any]]] = []
+        self._ocr_evidence: List[List[Dict[str, Any]]] = []
+        self._visual_evidence: List[List[Dict[str, Any]]] = []
+        
+        # Token span of each quantity reading, parallel to the evidence lists
+        self._transcript_spans: List[List[Tuple[int, int]]] = []
+        self._ocr_spans: List[List[Tuple[int, int]]] = []
+        
+        # OCR lines with measurements count as evidence for every ingredient
+        self._measurement_ocr: List[int] = []
+        
+        for segment in transcript:
+            self.transcript.add(segment.text)
+            matches = extract_quantity_patterns(segment.text)
+            self._transcript_evidence.append([{
+                'source': 'transcript',
+                'quantity': match['quantity'],
+                'unit': match['unit'],
+                'context': segment.text,
+                'timestamp': segment.start,
+                'confidence': segment.confidence
+            } for match in matches])
+            self._transcript_spans.append([token_span(segment.text, match['span']) for match in matches])
+        
+        for frame in keyframes:
+            for ocr_text in frame.ocr_text:
+                position = self.ocr.add(ocr_text)
+                if contains_measurements(ocr_text):
+                    self._measurement_ocr.append(position)
+                matches = extract_quantity_patterns(ocr_text)
+                self._ocr_evidence.append([{
+                    'source': 'ocr',
+                    'quantity': match['quantity'],
+                    'unit': match['unit'],
+                    'context': ocr_text,
+                    'frame_id': frame.frame_id,
+                    'timestamp': frame.timestamp,
+                    'confidence': OCR_CONFIDENCE
+                } for match in matches])
+                self._ocr_spans.append([token_span(ocr_text, match['span']) for match in matches])
+            
+            self.visual.add(frame.description)
+            self._visual_evidence.append([{
+                'source': 'visual',
+                'visual_cue': cue,
+                'context': frame.description,
+                'frame_id': frame.frame_id,
+                'timestamp': frame.timestamp,
+                'confidence': VISUAL_CONFIDENCE
+            } for cue in extract_visual_quantity_cues(frame.description)])
+    
+    def transcript_evidence(self, ingredient_name: str) -> List[Dict[str, Any]]:
+        """
+        Quantity mentions in transcript segments that name the ingredient.
+        adjacent marks readings whose quantity sits next to the ingredient's
+        tokens rather than elsewhere in the segment.
+        """
+        tokens = tokenize(ingredient_name)
+        evidence = []
+        for position in self.transcript.find(tokens):
+            starts = self.transcript.phrase_starts(position, tokens)
+            for item, span in zip(self._transcript_evidence[position], self._transcript_spans[position]):
+                evidence.append(dict(item, adjacent=is_adjacent(span, starts, len(tokens))))
+        return evidence
+    
+    def ocr_evidence(self, ingredient_name: str) -> List[Dict[str, Any]]:
+        """Quantities in OCR lines that name the ingredient or contain measurements"""
+        tokens = tokenize(ingredient_name)
+        named = set(self.ocr.find(tokens))
+        evidence = []
+        for position in sorted(named | set(self._measurement_ocr)):
+            starts = self.ocr.phrase_starts(position, tokens) if position in named else []
+            for item, span in zip(self._ocr_evidence[position], self._ocr_spans[position]):
+                evidence.append(dict(
+                    item, names_ingredient=position in named, adjacent=is_adjacent(span, starts, len(tokens))
+                ))
+        return evidence
+    
+    def visual_evidence(self, ingredient_name: str) -> List[Dict[str, Any]]:
+        """Visual quantity cues in frame descriptions that name the ingredient"""
+        return self._collect(self._visual_evidence, self.visual.find(tokenize(ingredient_name)))
+    
+    def _collect(self, evidence: List[List[Dict[str, Any]]], positions: List[int]) -> List[Dict[str, Any]]:
+        # Copies, so callers can annotate evidence without touching the index
+        return [dict(item) for position in positions for item in evidence[position]]
@@ -0,0 +1,52 @@
+"""
+HTTPClientPool - Long-lived aiohttp session shared by every HTTP consumer in the process
+"""
+import aiohttp
+from typing import Optional
+from .config import settings
+
+class HTTPClientPool:
+    """
+    One aiohttp session reused across pipeline runs, so jobs share keep-alive
+    connections, cached DNS answers and TLS sessions instead of paying new
+    handshakes per video. Connections are capped in total and per host, and
+    every request gets default connect/total timeouts.
+    """
+    
+    def __init__(self):
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    def session(self) -> aiohttp.ClientSession:
+        """The shared session, opened on first use (must be called inside the event loop)"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=settings.HTTP_POOL_MAX_CONNECTIONS,
+                limit_per_host=settings.HTTP_MAX_CONCURRENT_PER_HOST,
+                ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL_SECONDS,
+                keepalive_timeout=settings.HTTP_KEEPALIVE_SECONDS,
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=settings.HTTP_TOTAL_TIMEOUT_SECONDS,
+                sock_connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+        return self._session
+    
+    async def start(self):
+        """Open the session ahead of the first request"""
+        self.session()
+    
+    async def close(self):
+        """Close pooled connections; a later session() call opens a new pool"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+_http_pool: Optional[HTTPClientPool] = None
+
+def get_http_pool() -> HTTPClientPool:
+    """Process-wide HTTP client pool"""
+    global _http_pool
+    if _http_pool is None:
+        _http_pool = HTTPClientPool()
+    return _http_pool
@@ -0,0 +1,3 @@
+"""
+KalaKitchen LLM layer - Shared plumbing for Gemini requests and responses
+"""
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""
+LLM Backends - Live Gemini API plus record/replay stand-ins for offline benchmarking
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Dict, Any, Optional, Union
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+from ..config import settings
+from .cache import file_hash
+
+class GeminiBackend:
+    """Live Gemini API backend; the SDK shares one async channel across models"""
+    
+    def __init__(self, api_key: Optional[str] = None):
+        genai.configure(api_key=api_key or settings.GEMINI_API_KEY)
+        self._models: Dict[str, Any] = {}
+    
+    def model(self, model_name: str):
+        if model_name not in self._models:
+            self._models[model_name] = genai.GenerativeModel(model_name)
+        return self._models[model_name]
+    
+    async def generate(self, model_name: str, contents: Union[str, List[Any]], **kwargs):
+        return await self.model(model_name).generate_content_async(contents, **kwargs)
+    
+    def upload(self, path: Path):
+        return genai.upload_file(str(path))
+
+class CassetteMissError(KeyError):
+    """Replay found no recorded response for a request"""
+
+class ReplayResponse:
+    """Recorded response or stream chunk with the attributes the pipeline reads"""
+    
+    def __init__(self, text: str, usage: Optional[Dict[str, int]] = None):
+        self.text = text
+        self.usage_metadata = SimpleNamespace(**usage) if usage else None
+
+def _usage_dict(response) -> Optional[Dict[str, int]]:
+    """Extract token counts from an SDK response or chunk"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return None
+    return {
+        "prompt_token_count": getattr(usage, "prompt_token_count", 0) or 0,
+        "candidates_token_count": getattr(usage, "candidates_token_count", 0) or 0,
+        "total_token_count": getattr(usage, "total_token_count", 0) or 0,
+    }
+
+def _response_text(response) -> str:
+    try:
+        return response.text
+    except ValueError:
+        return ""
+
+class Cassette:
+    """Append-only JSONL file of request keys and their recorded responses"""
+    
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.records: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        
+        if self.path.exists():
+            with open(self.path) as f:
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.records[record["key"]] = record
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.records.get(key)
+    
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            self.records[record["key"]] = record
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+def request_key(model_name: str,
+                contents: Union[str, List[Any]],
+                file_hashes: Dict[str, str],
+                kwargs: Dict[str, Any]) -> str:
+    """
+    Key a request by model, exact prompt text, local file hashes and
+    generation options, so recordings replay regardless of upload IDs.
+    """
+    if not isinstance(contents, list):
+        contents = [contents]
+    
+    parts = []
+    for item in contents:
+        if isinstance(item, str):
+            parts.append(["text", item])
+        elif isinstance(item, Path):
+            parts.append(["file", file_hash(item)])
+        else:
+            name = getattr(item, "name", repr(item))
+            parts.append(["file", file_hashes.get(name, name)])
+    
+    options = {name: value for name, value in kwargs.items() if name != "stream"}
+    payload = json.dumps(
+        {"model": model_name, "contents": parts, "options": options},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class RecordingBackend:
+    """Passes requests to a live backend and records every response into a cassette"""
+    
+    def __init__(self, inner, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+        self._file_hashes: Dict[str, str] = {}
+    
+    def upload(self, path: Path):
+        uploaded = self.inner.upload(path)
+        # Remember the local content hash so replays match without uploading
+        self._file_hashes[getattr(uploaded, "name", repr(uploaded))] = file_hash(path)
+        return uploaded
+    
+    async def generate(self, model_name: str, contents: Union[str, List[Any]], stream: bool = False, **kwargs):
+        key = request_key(model_name, contents, self._file_hashes, kwargs)
+        response = await self.inner.generate(model_name, contents, stream=stream, **kwargs)
+        
+        if stream:
+            return self._record_stream(key, model_name, response)
+        
+        self.cassette.add({
+            "key": key,
+            "model": model_name,
+            "chunks": [_response_text(response)],
+            "usage": _usage_dict(response)
+        })
+        return response
+    
+    async def _record_stream(self, key: str, model_name: str, response):
+        chunks = []
+        usage = None
+        async for chunk in response:
+            chunks.append(_response_text(chunk))
+            usage = _usage_dict(chunk) or usage
+            yield chunk
+        
+        self.cassette.add({"key": key, "model": model_name, "chunks": chunks, "usage": usage})
+
+class ReplayBackend:
+    """
+    Serves recorded responses without network access. Latency and transient
+    errors can be injected to load-test the pipeline deterministically.
+    """
+    
+    def __init__(self,
+                 cassette: Cassette,
+                 latency_seconds: float = 0.0,
+                 latency_jitter_seconds: float = 0.0,
+                 error_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.cassette = cassette
+        self.latency_seconds = latency_seconds
+        self.latency_jitter_seconds = latency_jitter_seconds
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.misses = 0
+    
+    def upload(self, path: Path):
+        # Nothing to upload: the request key uses the local file hash
+        return path
+    
+    async def generate(self, model_name: str, contents: Union[str, List[Any]], stream: bool = False, **kwargs):
+        key = request_key(model_name, contents, {}, kwargs)
+        record = self.cassette.get(key)
+        if record is None:
+            self.misses += 1
+            raise CassetteMissError(f"No recorded response for request {key[:12]}")
+        
+        latency = self._latency()
+        if self.random.random() < self.error_rate:
+            await asyncio.sleep(latency)
+            raise google_exceptions.ServiceUnavailable("Injected replay failure")
+        
+        chunks = record["chunks"] or [""]
+        usage = record.get("usage")
+        
+        if not stream:
+            await asyncio.sleep(latency)
+            return ReplayResponse("".join(chunks), usage)
+        
+        return self._replay_stream(chunks, usage, latency)
+    
+    async def _replay_stream(self, chunks: List[str], usage: Optional[Dict[str, int]], latency: float):
+        # Spread the total latency across chunks like a real stream
+        delay = latency / len(chunks)
+        for i, text in enumerate(chunks):
+            await asyncio.sleep(delay)
+            yield ReplayResponse(text, usage if i == len(chunks) - 1 else None)
+    
+    def _latency(self) -> float:
+        jitter = self.random.uniform(-self.latency_jitter_seconds, self.latency_jitter_seconds)
+        return max(0.0, self.latency_seconds + jitter)
+
+def create_backend():
+    """Build the backend selected by LLM_BACKEND: live, record or replay"""
+    mode = settings.LLM_BACKEND
+    
+    if mode == "live":
+        return GeminiBackend()
+    if mode == "record":
+        return RecordingBackend(GeminiBackend(), Cassette(settings.LLM_CASSETTE_PATH))
+    if mode == "replay":
+        return ReplayBackend(
+            Cassette(settings.LLM_CASSETTE_PATH),
+            latency_seconds=settings.LLM_REPLAY_LATENCY_SECONDS,
+            latency_jitter_seconds=settings.LLM_REPLAY_LATENCY_JITTER_SECONDS,
+            error_rate=settings.LLM_REPLAY_ERROR_RATE,
+            seed=settings.LLM_REPLAY_SEED
+        )
+    
+    raise ValueError(f"Unknown LLM_BACKEND: {mode}")
@@ -0,0 +1,200 @@
+"""
+ResponseCache - Disk-backed Gemini response cache keyed by model, prompt and attached files
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Any, Optional, Tuple, Union
+from ..config import settings
+
+# Content hashes of recently seen files, keyed by (path, mtime, size)
+FILE_HASH_MEMO_SIZE = 1024
+_file_hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_file_hashes_lock = threading.Lock()
+
+class ResponseCache:
+    """
+    SQLite store of Gemini response texts with TTL expiry and
+    size-bounded least-recently-used eviction.
+    """
+    
+    def __init__(self,
+                 path: Union[str, Path],
+                 ttl_seconds: int = 7 * 24 * 3600,
+                 max_bytes: int = 512 * 1024 * 1024):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                bot TEXT NOT NULL,
+                model TEXT NOT NULL,
+                text TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+    
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response text, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, size, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            
+            text, size, created_at = row
+            if now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self._total_bytes -= size
+                return None
+            
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return text
+    
+    def set(self, key: str, text: str, bot: str = "", model: str = ""):
+        """Store a response text and evict least-recently-used entries over the size bound"""
+        now = time.time()
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        
+        with self._lock:
+            previous = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, bot, model, text, size, now, now)
+            )
+            self._total_bytes += size - (previous[0] if previous else 0)
+            self._evict()
+            self._conn.commit()
+    
+    def _evict(self):
+        """Drop expired entries, then least-recently-used ones until under max_bytes"""
+        if self._total_bytes <= self.max_bytes:
+            return
+        
+        self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+        )
+        self._total_bytes = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        
+        cursor = self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at")
+        evicted = []
+        for key, size in cursor:
+            if self._total_bytes <= self.max_bytes:
+                break
+            evicted.append((key,))
+            self._total_bytes -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+    
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._total_bytes = 0
+
+_response_cache: Optional[ResponseCache] = None
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide response cache shared by all bots"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            settings.LLM_CACHE_PATH,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+            max_bytes=settings.LLM_CACHE_MAX_MB * 1024 * 1024
+        )
+    return _response_cache
+
+def cache_enabled_for(bot_name: str) -> bool:
+    """Check the global and per-bot cache switches"""
+    return settings.LLM_CACHE_ENABLED and bot_name not in settings.LLM_CACHE_DISABLED_BOTS
+
+def file_hash(path: Path) -> str:
+    """
+    SHA-256 of a local file's content. Hashes are memoized by path,
+    modification time and size, so a file attached to many requests is
+    read only once until it changes.
+    """
+    stat = Path(path).stat()
+    memo_key = (str(Path(path).resolve()), stat.st_mtime_ns, stat.st_size)
+    with _file_hashes_lock:
+        if memo_key in _file_hashes:
+            _file_hashes.move_to_end(memo_key)
+            return _file_hashes[memo_key]
+    
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    
+    with _file_hashes_lock:
+        _file_hashes[memo_key] = digest.hexdigest()
+        while len(_file_hashes) > FILE_HASH_MEMO_SIZE:
+            _file_hashes.popitem(last=False)
+    return digest.hexdigest()
+
+def cache_key(model_name: str, contents: Union[str, List[Any]], **kwargs) -> str:
+    """
+    Build a cache key from the model name, the whitespace-normalized prompt
+    text, hashes of attached files and any generation options.
+    """
+    if not isinstance(contents, list):
+        contents = [contents]
+    
+    parts = []
+    for item in contents:
+        if isinstance(item, str):
+            parts.append(["text", " ".join(item.split())])
+        elif isinstance(item, Path):
+            parts.append(["file", file_hash(item)])
+        else:
+            # Already-uploaded files: prefer the content hash Gemini reports
+            parts.append(["file", getattr(item, "sha256_hash", None) or getattr(item, "name", repr(item))])
+    
+    options = {name: value for name, value in kwargs.items() if name != "stream"}
+    payload = json.dumps(
+        {"model": model_name, "contents": parts, "options": options},
+        sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class CachedResponse:
+    """Stand-in for a Gemini response served from the cache"""
+    
+    def __init__(self, text: str):
+        self.text = text
+    
+    def __aiter__(self):
+        return self._chunks()
+    
+    async def _chunks(self):
+        # A cached response streams as a single chunk
+        yield self
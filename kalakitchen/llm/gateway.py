@@ -0,0 +1,362 @@
+"""
+LLMGateway - Shared async Gemini client with caching, rate limiting, retries and deadlines
+"""
+import asyncio
+import random
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Optional, Tuple, Union
+from google.api_core import exceptions as google_exceptions
+from ..config import settings
+from ..ratelimit import TokenBucket
+from ..singleflight import SingleFlight
+from .backends import create_backend
+from .cache import ResponseCache, CachedResponse, get_response_cache, cache_enabled_for, cache_key
+from .telemetry import CallRecord, LLMTelemetry
+
+# Failures worth retrying with backoff
+TRANSIENT_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.Aborted,
+    ConnectionError,
+)
+
+# Rough token cost of an attached image/audio file, used before the real count is known
+FILE_TOKEN_ESTIMATE = 1000
+
+def estimate_tokens(contents: Union[str, List[Any]]) -> int:
+    """Estimate prompt tokens (~4 characters per token) for rate limiting"""
+    if not isinstance(contents, list):
+        contents = [contents]
+    total = 0
+    for item in contents:
+        if isinstance(item, str):
+            total += len(item) // 4 + 1
+        else:
+            total += FILE_TOKEN_ESTIMATE
+    return total
+
+def usage_counts(response, estimated_tokens: int) -> Tuple[int, int]:
+    """Prompt and response token counts, estimated when the API reports none"""
+    usage = getattr(response, "usage_metadata", None)
+    prompt = getattr(usage, "prompt_token_count", None) if usage else None
+    completion = getattr(usage, "candidates_token_count", None) if usage else None
+    if prompt or completion:
+        return prompt or 0, completion or 0
+    
+    try:
+        text = response.text if response is not None else ""
+    except ValueError:
+        text = ""
+    return estimated_tokens, len(text) // 4
+
+class LLMClient:
+    """Per-bot view of the gateway with the GenerativeModel call signature"""
+    
+    def __init__(self, gateway: "LLMGateway", bot_name: str, model_name: Optional[str] = None):
+        self.gateway = gateway
+        self.bot_name = bot_name
+        self.model_name = model_name or settings.GEMINI_MODEL
+    
+    async def generate_content_async(self,
+                                     contents: Union[str, List[Any]],
+                                     stream: bool = False,
+                                     deadline: Optional[float] = None,
+                                     **kwargs):
+        return await self.gateway.generate(
+            contents, bot=self.bot_name, model_name=self.model_name,
+            stream=stream, deadline=deadline, **kwargs
+        )
+
+class LLMStream:
+    """
+    Streamed gateway response: an async iterator of chunks. Closing it
+    early, or dropping it without reading it to the end, abandons its
+    single-flight entry so coalesced callers are not left waiting for a
+    response that will never complete.
+    """
+    
+    def __init__(self, chunks, abandon: Callable[[], None]):
+        self._chunks = chunks
+        self._abandon = abandon
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        return await self._chunks.__anext__()
+    
+    async def aclose(self):
+        await self._chunks.aclose()
+        self._abandon()
+    
+    def __del__(self):
+        try:
+            self._abandon()
+        except RuntimeError:
+            # Event loop already closed: nobody is left waiting
+            pass
+
+class LLMGateway:
+    """
+    Single entry point for every Gemini call made by the bots.
+    
+    Serves cached responses, coalesces identical concurrent requests,
+    enforces a global request/token-per-minute budget and concurrency limit,
+    uploads local files only when a request is actually sent, retries
+    transient failures with jittered exponential backoff and bounds every
+    call (including retries) by a deadline. Every call is recorded in
+    telemetry with its tokens, latency, retries and cache status.
+    """
+    
+    def __init__(self,
+                 backend=None,
+                 cache: Optional[ResponseCache] = None,
+                 telemetry: Optional[LLMTelemetry] = None):
+        self.backend = backend or create_backend()
+        self.cache = cache
+        self.telemetry = telemetry or LLMTelemetry()
+        self.request_bucket = TokenBucket(settings.LLM_REQUESTS_PER_MINUTE)
+        self.token_bucket = TokenBucket(settings.LLM_TOKENS_PER_MINUTE)
+        self.concurrency = asyncio.Semaphore(settings.LLM_MAX_CONCURRENT_REQUESTS)
+        self.flights = SingleFlight("llm")
+    
+    def client(self, bot_name: str, model_name: Optional[str] = None) -> LLMClient:
+        """Get a client that tags calls with the bot name"""
+        return LLMClient(self, bot_name, model_name)
+    
+    async def generate(self,
+                       contents: Union[str, List[Any]],
+                       bot: str,
+                       model_name: Optional[str] = None,
+                       stream: bool = False,
+                       deadline: Optional[float] = None,
+                       **kwargs):
+        """
+        Generate content through the gateway. Streaming responses are async
+        iterators of chunks; other responses expose .text.
+        """
+        model_name = model_name or settings.GEMINI_MODEL
+        record = CallRecord(bot, model_name, latency_seconds=0.0)
+        started_at = time.monotonic()
+        expires_at = started_at + (deadline or settings.LLM_DEFAULT_DEADLINE_SECONDS)
+        key = await self._cache_key(model_name, contents, kwargs)
+        use_cache = cache_enabled_for(bot)
+        
+        if use_cache:
+            cached = await self._cache_get(key)
+            if cached is not None:
+                record.cache_hit = True
+                self._record(record, started_at)
+                return CachedResponse(cached)
+        
+        # Identical concurrent requests share the leader's response
+        while True:
+            waiting = self.flights.join(key)
+            if waiting is None:
+                break
+            record.coalesced = True
+            try:
+                response = await self._within(asyncio.shield(waiting), expires_at)
+            except asyncio.CancelledError:
+                # The leader abandoned its stream, not us: send the request ourselves
+                if waiting.cancelled():
+                    record.coalesced = False
+                    continue
+                raise
+            except Exception as e:
+                self._record(record, started_at, e)
+                raise
+            self._record(record, started_at)
+            return CachedResponse(response.text) if stream else response
+        
+        flight = self.flights.lead(key)
+        estimated_tokens = estimate_tokens(contents)
+        try:
+            result = await self._send(model_name, contents, stream, kwargs, estimated_tokens, expires_at, record)
+        except BaseException as e:
+            self.flights.fail(key, e)
+            if isinstance(e, Exception):
+                self._record(record, started_at, e)
+            raise
+        
+        if stream:
+            first, iterator = result
+            return LLMStream(
+                self._stream(first, iterator, key, use_cache, bot, model_name,
+                             estimated_tokens, expires_at, record, started_at),
+                lambda: self.flights.abandon(key, flight)
+            )
+        
+        self.flights.finish(key, result)
+        self._settle_tokens(estimated_tokens, result)
+        record.prompt_tokens, record.response_tokens = usage_counts(result, estimated_tokens)
+        self._record(record, started_at)
+        if use_cache:
+            await self._store(key, result, bot, model_name)
+        return result
+    
+    async def _send(self, model_name: str, contents: Union[str, List[Any]], stream: bool,
+                    kwargs: Dict[str, Any], estimated_tokens: int, expires_at: float,
+                    record: CallRecord):
+        """Wait for rate limits and a concurrency slot, then call the backend with retries"""
+        await self._within(self.request_bucket.acquire(1), expires_at)
+        await self._within(self.token_bucket.acquire(estimated_tokens), expires_at)
+        await self._within(self.concurrency.acquire(), expires_at)
+        
+        try:
+            resolved = await self._resolve_files(contents)
+            return await self._with_retries(
+                lambda: self._call(model_name, resolved, stream, kwargs), expires_at, record
+            )
+        finally:
+            # Streams hold a slot only until their first chunk arrives
+            self.concurrency.release()
+    
+    async def _call(self, model_name: str, contents: Union[str, List[Any]],
+                    stream: bool, kwargs: Dict[str, Any]):
+        """One attempt; for streams, wait for the first chunk so early failures are retried"""
+        response = await self.backend.generate(model_name, contents, stream=stream, **kwargs)
+        if not stream:
+            return response
+        
+        iterator = response.__aiter__()
+        try:
+            first = await iterator.__anext__()
+        except StopAsyncIteration:
+            first = None
+        return first, iterator
+    
+    async def _with_retries(self, attempt_fn, expires_at: float, record: Optional[CallRecord] = None):
+        """Run attempt_fn with jittered exponential backoff until success or deadline"""
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            try:
+                return await self._within(attempt_fn(), expires_at)
+            except TRANSIENT_ERRORS as e:
+                remaining = expires_at - time.monotonic()
+                if attempt == settings.LLM_MAX_RETRIES or remaining <= 0:
+                    raise
+                # Full jitter keeps concurrent retries from synchronizing
+                backoff = min(settings.LLM_RETRY_MAX_SECONDS, settings.LLM_RETRY_BASE_SECONDS * 2 ** attempt)
+                delay = min(random.uniform(0, backoff), remaining)
+                print(f"Transient Gemini error ({type(e).__name__}), retrying in {delay:.1f}s")
+                if record is not None:
+                    record.retries += 1
+                await asyncio.sleep(delay)
+    
+    async def _stream(self, first, iterator, key: str, use_cache: bool, bot: str, model_name: str,
+                      estimated_tokens: int, expires_at: float, record: CallRecord, started_at: float):
+        """Yield streamed chunks; the full text is cached and handed to coalesced callers"""
+        parts = []
+        last_chunk = None
+        chunk = first
+        
+        try:
+            while chunk is not None:
+                last_chunk = chunk
+                try:
+                    parts.append(chunk.text)
+                except ValueError:
+                    pass
+                yield chunk
+                
+                try:
+                    chunk = await self._within(iterator.__anext__(), expires_at)
+                except StopAsyncIteration:
+                    chunk = None
+            
+            text = "".join(parts)
+            self.flights.finish(key, CachedResponse(text))
+        except GeneratorExit:
+            # Closed before the end: coalesced callers send the request themselves
+            self.flights.fail(key, asyncio.CancelledError())
+            raise
+        except BaseException as e:
+            self.flights.fail(key, e)
+            if isinstance(e, Exception):
+                self._record(record, started_at, e)
+            raise
+        
+        # Usage metadata arrives on the final chunk
+        self._settle_tokens(estimated_tokens, last_chunk)
+        usage = getattr(last_chunk, "usage_metadata", None)
+        record.prompt_tokens, record.response_tokens = usage_counts(
+            last_chunk if usage else CachedResponse(text), estimated_tokens
+        )
+        self._record(record, started_at)
+        if use_cache:
+            await self._cache_set(key, text, bot, model_name)
+    
+    async def _within(self, awaitable, expires_at: float):
+        """Await with whatever is left of the call deadline"""
+        return await asyncio.wait_for(awaitable, timeout=max(0.0, expires_at - time.monotonic()))
+    
+    async def _resolve_files(self, contents: Union[str, List[Any]]) -> Union[str, List[Any]]:
+        """Upload local files referenced by Path without blocking the event loop"""
+        if not isinstance(contents, list):
+            return contents
+        
+        loop = asyncio.get_running_loop()
+        resolved = []
+        for item in contents:
+            if isinstance(item, Path):
+                item = await loop.run_in_executor(None, self.backend.upload, item)
+            resolved.append(item)
+        return resolved
+    
+    def _settle_tokens(self, estimated_tokens: int, response):
+        """Replace the token estimate with the real count once it is known"""
+        usage = getattr(response, "usage_metadata", None)
+        total = getattr(usage, "total_token_count", None) if usage else None
+        if total:
+            self.token_bucket.adjust(total - estimated_tokens)
+    
+    def _record(self, record: CallRecord, started_at: float, error: Optional[BaseException] = None):
+        record.latency_seconds = time.monotonic() - started_at
+        if error is not None:
+            record.error = type(error).__name__
+        self.telemetry.record(record)
+    
+    async def _cache_key(self, model_name: str, contents: Union[str, List[Any]], kwargs: Dict[str, Any]) -> str:
+        """Cache key; attached local files are hashed off the event loop"""
+        if isinstance(contents, list) and any(isinstance(item, Path) for item in contents):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, lambda: cache_key(model_name, contents, **kwargs))
+        return cache_key(model_name, contents, **kwargs)
+    
+    async def _cache_get(self, key: str) -> Optional[str]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: self._response_cache().get(key))
+    
+    async def _cache_set(self, key: str, text: str, bot: str, model_name: str):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, lambda: self._response_cache().set(key, text, bot=bot, model=model_name)
+        )
+    
+    async def _store(self, key: Optional[str], response, bot: str, model_name: str):
+        if not key:
+            return
+        try:
+            text = response.text
+        except ValueError:
+            # Blocked or empty responses have no text to cache
+            return
+        await self._cache_set(key, text, bot, model_name)
+    
+    def _response_cache(self) -> ResponseCache:
+        if self.cache is None:
+            self.cache = get_response_cache()
+        return self.cache
+
+_default_gateway: Optional[LLMGateway] = None
+
+def get_default_gateway() -> LLMGateway:
+    """Process-wide gateway used by bots that are not given one explicitly"""
+    global _default_gateway
+    if _default_gateway is None:
+        _default_gateway = LLMGateway()
+    return _default_gateway
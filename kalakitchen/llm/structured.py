@@ -0,0 +1,417 @@
+"""
+StructuredResponder - Schema-constrained Gemini output, parsed incrementally and validated into models
+"""
+import json
+from typing import List, Dict, Any, Optional, Set, Tuple, Type, Union
+from pydantic import BaseModel, ValidationError
+from ..config import settings, GEMINI_PROMPTS
+
+# JSON schema types as understood by Gemini's response_schema
+SCHEMA_TYPES = {
+    "string": "STRING",
+    "number": "NUMBER",
+    "integer": "INTEGER",
+    "boolean": "BOOLEAN",
+    "array": "ARRAY",
+    "object": "OBJECT",
+}
+
+def gemini_schema(model_cls: Type[BaseModel],
+                  many: bool = False,
+                  exclude: Optional[Dict[str, Set[str]]] = None) -> Dict[str, Any]:
+    """
+    Derive a Gemini response_schema from a pydantic model.
+    
+    exclude maps model class names to fields that should not be requested
+    (they must have defaults on the model). Free-form mappings cannot be
+    expressed in Gemini schemas and are left out.
+    """
+    if hasattr(model_cls, "model_json_schema"):
+        raw = model_cls.model_json_schema()
+    else:
+        raw = model_cls.schema()
+    
+    # pydantic v1 uses "definitions", v2 uses "$defs"
+    definitions = {**raw.get("definitions", {}), **raw.get("$defs", {})}
+    schema = _convert_schema(raw, definitions, exclude or {}, model_cls.__name__)
+    
+    if many:
+        return {"type": "ARRAY", "items": schema}
+    return schema
+
+def _convert_schema(node: Dict[str, Any],
+                    definitions: Dict[str, Any],
+                    exclude: Dict[str, Set[str]],
+                    name: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Convert one JSON schema node into the OpenAPI subset Gemini accepts"""
+    
+    # Inline references - Gemini does not resolve $ref
+    if "$ref" in node:
+        ref_name = node["$ref"].split("/")[-1]
+        return _convert_schema(definitions[ref_name], definitions, exclude, ref_name)
+    
+    if "allOf" in node and len(node["allOf"]) == 1:
+        return _convert_schema(node["allOf"][0], definitions, exclude, name)
+    
+    # Optional[X] becomes a nullable X
+    if "anyOf" in node:
+        options = [option for option in node["anyOf"] if option.get("type") != "null"]
+        if not options:
+            return None
+        converted = _convert_schema(options[0], definitions, exclude, name)
+        if converted is not None and len(options) < len(node["anyOf"]):
+            converted["nullable"] = True
+        return converted
+    
+    node_type = node.get("type")
+    
+    if node_type == "object":
+        skipped = exclude.get(name or node.get("title", ""), set())
+        properties = {}
+        for field_name, field_schema in node.get("properties", {}).items():
+            if field_name in skipped:
+                continue
+            converted = _convert_schema(field_schema, definitions, exclude)
+            if converted is not None:
+                properties[field_name] = converted
+        
+        if not properties:
+            return None
+        
+        schema = {"type": "OBJECT", "properties": properties}
+        required = [field for field in node.get("required", []) if field in properties]
+        if required:
+            schema["required"] = required
+    
+    elif node_type == "array":
+        items = _convert_schema(node.get("items", {}), definitions, exclude)
+        if items is None:
+            return None
+        schema = {"type": "ARRAY", "items": items}
+    
+    elif node_type in SCHEMA_TYPES:
+        schema = {"type": SCHEMA_TYPES[node_type]}
+        if "enum" in node:
+            schema["enum"] = [str(value) for value in node["enum"]]
+    
+    else:
+        return None
+    
+    if node.get("description"):
+        schema["description"] = node["description"]
+    
+    return schema
+
+def validate_model(model_cls: Type[BaseModel], data: Any) -> BaseModel:
+    """Validate raw data into a model (pydantic v1 and v2)"""
+    if hasattr(model_cls, "model_validate"):
+        return model_cls.model_validate(data)
+    return model_cls.parse_obj(data)
+
+class MalformedFragment:
+    """A streamed JSON value that could not be decoded"""
+    
+    def __init__(self, key: Union[str, int, None], text: str, error: str):
+        self.key = key
+        self.text = text
+        self.error = error
+    
+    def __repr__(self) -> str:
+        return f"MalformedFragment(key={self.key!r}, error={self.error!r})"
+
+class IncrementalJSONParser:
+    """
+    Parse a streamed JSON document chunk by chunk.
+    
+    Every direct child of the root container is decoded as soon as it is
+    complete and reported as (key, value) - the field name for an object root,
+    the position for an array root. Children that fail to decode are reported
+    as MalformedFragment so callers can re-request just those parts. Prose or
+    code fences around the root value are ignored.
+    """
+    
+    def __init__(self):
+        self.buffer = ""
+        self.items: List[Tuple[Union[str, int, None], Any]] = []
+        self.done = False
+        self.root: Optional[str] = None
+        
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._expecting_key = False
+        self._key_start: Optional[int] = None
+        self._pending_key: Optional[str] = None
+        self._item_start: Optional[int] = None
+        self._item_index = 0
+    
+    def feed(self, chunk: str) -> List[Tuple[Union[str, int, None], Any]]:
+        """Consume a chunk of text and return the children completed by it"""
+        completed_before = len(self.items)
+        self.buffer += chunk
+        
+        while self._pos < len(self.buffer) and not self.done:
+            self._scan(self._pos, self.buffer[self._pos])
+            self._pos += 1
+        
+        return self.items[completed_before:]
+    
+    def close(self) -> List[Tuple[Union[str, int, None], Any]]:
+        """Finish parsing; a truncated trailing child is reported as malformed"""
+        if not self.done and self._item_start is not None:
+            self.items.append((
+                self._current_key(),
+                MalformedFragment(self._current_key(), self.buffer[self._item_start:].strip(), "truncated")
+            ))
+            self._item_start = None
+        return self.items
+    
+    def _scan(self, i: int, c: str):
+        """Advance the state machine by one character"""
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif c == '\\':
+                self._escape = True
+            elif c == '"':
+                self._in_string = False
+                if self._key_start is not None:
+                    self._pending_key = json.loads(self.buffer[self._key_start:i + 1])
+                    self._key_start = None
+            return
+        
+        # Skip anything before the root container (prose, code fences)
+        if not self._stack:
+            if c in '{[':
+                self.root = c
+                self._stack.append(c)
+                self._expecting_key = c == '{'
+            return
+        
+        depth = len(self._stack)
+        
+        if c == '"':
+            self._in_string = True
+            if depth == 1:
+                if self.root == '{' and self._expecting_key:
+                    self._key_start = i
+                elif self._item_start is None:
+                    self._item_start = i
+            return
+        
+        if c in '{[':
+            if depth == 1 and self._item_start is None:
+                self._item_start = i
+            self._stack.append(c)
+            return
+        
+        if c in '}]':
+            self._stack.pop()
+            if not self._stack:
+                # Root closed - flush a trailing scalar child
+                if self._item_start is not None:
+                    self._emit(self._item_start, i)
+                self.done = True
+            elif len(self._stack) == 1 and self._item_start is not None:
+                self._emit(self._item_start, i + 1)
+            return
+        
+        if depth == 1:
+            if c == ':' and self.root == '{':
+                self._expecting_key = False
+            elif c == ',':
+                if self._item_start is not None:
+                    self._emit(self._item_start, i)
+                self._expecting_key = self.root == '{'
+            elif not c.isspace() and self._item_start is None and not self._expecting_key:
+                self._item_start = i
+    
+    def _current_key(self) -> Union[str, int, None]:
+        return self._pending_key if self.root == '{' else self._item_index
+    
+    def _emit(self, start: int, end: int):
+        """Decode one completed child of the root container"""
+        key = self._current_key()
+        text = self.buffer[start:end].strip()
+        
+        try:
+            self.items.append((key, json.loads(text)))
+        except json.JSONDecodeError as e:
+            self.items.append((key, MalformedFragment(key, text, str(e))))
+        
+        self._item_start = None
+        self._pending_key = None
+        self._item_index += 1
+
+class StructuredResponder:
+    """
+    Requests JSON-schema constrained output from Gemini, parses it as it
+    streams, validates it into pydantic models and re-requests only the
+    fields or items that came back malformed or invalid.
+    """
+    
+    def __init__(self, client, max_repairs: Optional[int] = None):
+        self.client = client
+        self.max_repairs = (
+            settings.LLM_STRUCTURED_MAX_REPAIRS if max_repairs is None else max_repairs
+        )
+    
+    async def generate_model(self,
+                             contents: Union[str, List[Any]],
+                             model_cls: Type[BaseModel],
+                             exclude: Optional[Dict[str, Set[str]]] = None) -> Optional[BaseModel]:
+        """Generate a single model instance, or None if it cannot be validated"""
+        
+        schema = gemini_schema(model_cls, exclude=exclude)
+        data, malformed = self._split_fields(await self._stream(contents, schema))
+        
+        for attempt in range(self.max_repairs + 1):
+            # Malformed optional fields do not fail validation but are still repaired
+            problems = dict(malformed)
+            result = None
+            try:
+                result = validate_model(model_cls, data)
+            except ValidationError as e:
+                for error in e.errors():
+                    field_name = str(error["loc"][0]) if error.get("loc") else None
+                    if field_name:
+                        problems.setdefault(field_name, error["msg"])
+            
+            if not problems:
+                return result
+            
+            repairable = {name: msg for name, msg in problems.items() if name in schema["properties"]}
+            if attempt == self.max_repairs or not repairable or len(repairable) < len(problems):
+                if result is not None:
+                    print(f"Structured output for {model_cls.__name__} kept defaults for: {problems}")
+                    return result
+                print(f"Structured output for {model_cls.__name__} failed validation: {problems}")
+                return None
+            
+            # Re-request only the failed fields
+            repair_schema = {
+                "type": "OBJECT",
+                "properties": {name: schema["properties"][name] for name in repairable},
+                "required": [name for name in repairable if name in schema.get("required", [])]
+            }
+            if not repair_schema["required"]:
+                del repair_schema["required"]
+            
+            repair_prompt = GEMINI_PROMPTS["structured_repair"].format(
+                problems=json.dumps(
+                    {name: {"error": msg, "value": data.get(name, malformed.get(name))}
+                     for name, msg in repairable.items()},
+                    indent=2, default=str
+                )
+            )
+            repaired, malformed = self._split_fields(
+                await self._stream(self._with_prompt(contents, repair_prompt), repair_schema)
+            )
+            data.update(repaired)
+        
+        return None
+    
+    async def generate_list(self,
+                            contents: Union[str, List[Any]],
+                            item_cls: Type[BaseModel],
+                            exclude: Optional[Dict[str, Set[str]]] = None) -> List[BaseModel]:
+        """Generate a list of model instances; invalid items are re-requested individually"""
+        
+        schema = gemini_schema(item_cls, many=True, exclude=exclude)
+        valid, invalid = self._validate_items(item_cls, await self._stream(contents, schema))
+        
+        for _ in range(self.max_repairs):
+            if not invalid:
+                break
+            
+            # Re-request only the invalid items, keyed by their position in the list
+            repair_schema = {
+                "type": "OBJECT",
+                "properties": {str(index): schema["items"] for index in invalid},
+                "required": [str(index) for index in invalid]
+            }
+            repair_prompt = GEMINI_PROMPTS["structured_repair"].format(
+                problems=json.dumps({str(index): problem for index, problem in invalid.items()},
+                                    indent=2, default=str)
+            )
+            repaired, still_invalid = self._validate_items(
+                item_cls, await self._stream(self._with_prompt(contents, repair_prompt), repair_schema)
+            )
+            for index, item in repaired.items():
+                if index in invalid:
+                    valid[index] = item
+                    del invalid[index]
+            for index, problem in still_invalid.items():
+                if index in invalid:
+                    invalid[index] = problem
+        
+        if invalid:
+            print(f"Dropped {len(invalid)} invalid {item_cls.__name__} items")
+        
+        return [valid[index] for index in sorted(valid)]
+    
+    async def _stream(self,
+                      contents: Union[str, List[Any]],
+                      schema: Dict[str, Any]) -> List[Tuple[Union[str, int, None], Any]]:
+        """Issue a schema-constrained streaming request and parse it incrementally"""
+        
+        parser = IncrementalJSONParser()
+        response = await self.client.generate_content_async(
+            contents,
+            generation_config={
+                "response_mime_type": "application/json",
+                "response_schema": schema
+            },
+            stream=True
+        )
+        
+        async for chunk in response:
+            try:
+                parser.feed(chunk.text)
+            except ValueError:
+                # Chunks without text parts (e.g. finish/safety metadata)
+                continue
+        
+        return parser.close()
+    
+    def _split_fields(self, items: List[Tuple[Any, Any]]) -> Tuple[Dict[str, Any], Dict[str, str]]:
+        """Separate decoded object fields from malformed ones"""
+        data, malformed = {}, {}
+        for key, value in items:
+            if key is None:
+                continue
+            if isinstance(value, MalformedFragment):
+                malformed[key] = f"malformed JSON: {value.error}: {value.text[:200]}"
+            else:
+                data[key] = value
+        return data, malformed
+    
+    def _validate_items(self,
+                        item_cls: Type[BaseModel],
+                        items: List[Tuple[Any, Any]]) -> Tuple[Dict[int, BaseModel], Dict[int, Dict[str, Any]]]:
+        """
+        Validate streamed list items by position, collecting the ones that
+        need a repair. Keys are list positions, or their string form in a
+        repair response.
+        """
+        valid, invalid = {}, {}
+        for key, value in items:
+            try:
+                index = int(key)
+            except (TypeError, ValueError):
+                continue
+            if isinstance(value, MalformedFragment):
+                invalid[index] = {"error": f"malformed JSON: {value.error}", "value": value.text[:500]}
+                continue
+            try:
+                valid[index] = validate_model(item_cls, value)
+            except ValidationError as e:
+                invalid[index] = {"error": str(e), "value": value}
+        return valid, invalid
+    
+    def _with_prompt(self, contents: Union[str, List[Any]], prompt: str) -> List[Any]:
+        """Append a follow-up instruction to the original request contents"""
+        if isinstance(contents, list):
+            return contents + [prompt]
+        return [contents, prompt]
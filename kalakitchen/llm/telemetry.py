@@ -0,0 +1,173 @@
+"""
+LLMTelemetry - Per-call Gemini metrics: tokens, latency, retries, cache status and cost
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import List, Dict, Optional, Tuple
+from ..config import settings
+from ..models import LLMCallStats, LLMUsage
+
+# Job the current task is working for; set by the workflow for each pipeline run
+current_job: ContextVar[Optional[str]] = ContextVar("kalakitchen_current_job", default=None)
+
+LATENCY_BUCKETS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 40, 80, 160]
+TOKEN_BUCKETS = [100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000]
+
+class CallRecord:
+    """Outcome of one gateway call"""
+
+    def __init__(self,
+                 bot: str,
+                 model: str,
+                 latency_seconds: float,
+                 prompt_tokens: int = 0,
+                 response_tokens: int = 0,
+                 retries: int = 0,
+                 cache_hit: bool = False,
+                 coalesced: bool = False,
+                 error: Optional[str] = None):
+        self.bot = bot
+        self.model = model
+        self.latency_seconds = latency_seconds
+        self.prompt_tokens = prompt_tokens
+        self.response_tokens = response_tokens
+        self.retries = retries
+        self.cache_hit = cache_hit
+        self.coalesced = coalesced
+        self.error = error
+
+    @property
+    def outcome(self) -> str:
+        if self.error:
+            return "error"
+        if self.cache_hit:
+            return "cache_hit"
+        if self.coalesced:
+            return "coalesced"
+        return "miss"
+
+    @property
+    def cost_usd(self) -> float:
+        """Billed cost; cache hits and coalesced calls are free"""
+        return (
+            self.prompt_tokens / 1000 * settings.LLM_PRICE_PER_1K_PROMPT_TOKENS +
+            self.response_tokens / 1000 * settings.LLM_PRICE_PER_1K_RESPONSE_TOKENS
+        )
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style"""
+
+    def __init__(self, buckets: List[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ["+Inf"], self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+def _add_call(stats: LLMCallStats, call: CallRecord):
+    """Fold one call into an aggregate"""
+    stats.calls += 1
+    stats.cache_hits += int(call.cache_hit)
+    stats.coalesced += int(call.coalesced)
+    stats.errors += int(call.error is not None)
+    stats.retries += call.retries
+    stats.prompt_tokens += call.prompt_tokens
+    stats.response_tokens += call.response_tokens
+    stats.latency_seconds += call.latency_seconds
+    stats.max_latency_seconds = max(stats.max_latency_seconds, call.latency_seconds)
+    stats.cost_usd += call.cost_usd
+
+class LLMTelemetry:
+    """
+    Collects every gateway call into process-wide histograms and counters
+    (exposed in Prometheus text format) and into per-job usage aggregates.
+    """
+
+    def __init__(self):
+        self.latency: Dict[str, Histogram] = {}
+        self.prompt_tokens: Dict[str, Histogram] = {}
+        self.response_tokens: Dict[str, Histogram] = {}
+        self.calls: Dict[Tuple[str, str], int] = {}
+        self.retries: Dict[str, int] = {}
+        self.cost_usd: Dict[str, float] = {}
+        self.jobs: Dict[str, LLMUsage] = {}
+
+    def start_job(self, job_id: str) -> LLMUsage:
+        """Begin aggregating calls made while current_job is job_id"""
+        return self.jobs.setdefault(job_id, LLMUsage())
+
+    def finish_job(self, job_id: str) -> Optional[LLMUsage]:
+        """Stop aggregating for a job and return its final usage"""
+        return self.jobs.pop(job_id, None)
+
+    def record(self, call: CallRecord):
+        """Record one gateway call"""
+        bot = call.bot
+
+        if bot not in self.latency:
+            self.latency[bot] = Histogram(LATENCY_BUCKETS)
+            self.prompt_tokens[bot] = Histogram(TOKEN_BUCKETS)
+            self.response_tokens[bot] = Histogram(TOKEN_BUCKETS)
+
+        self.latency[bot].observe(call.latency_seconds)
+        if call.outcome == "miss":
+            self.prompt_tokens[bot].observe(call.prompt_tokens)
+            self.response_tokens[bot].observe(call.response_tokens)
+
+        self.calls[(bot, call.outcome)] = self.calls.get((bot, call.outcome), 0) + 1
+        self.retries[bot] = self.retries.get(bot, 0) + call.retries
+        self.cost_usd[bot] = self.cost_usd.get(bot, 0.0) + call.cost_usd
+
+        job_id = current_job.get()
+        usage = self.jobs.get(job_id) if job_id else None
+        if usage is not None:
+            _add_call(usage, call)
+            _add_call(usage.by_bot.setdefault(bot, LLMCallStats()), call)
+
+    def render_prometheus(self) -> str:
+        """Process-wide metrics in the Prometheus text exposition format"""
+        lines = [
+            "# HELP kalakitchen_llm_calls_total Gemini calls by bot and outcome",
+            "# TYPE kalakitchen_llm_calls_total counter",
+        ]
+        for (bot, outcome), count in sorted(self.calls.items()):
+            lines.append(f'kalakitchen_llm_calls_total{{bot="{bot}",outcome="{outcome}"}} {count}')
+
+        lines += [
+            "# HELP kalakitchen_llm_retries_total Transient-error retries by bot",
+            "# TYPE kalakitchen_llm_retries_total counter",
+        ]
+        for bot, count in sorted(self.retries.items()):
+            lines.append(f'kalakitchen_llm_retries_total{{bot="{bot}"}} {count}')
+
+        lines += [
+            "# HELP kalakitchen_llm_cost_usd_total Estimated Gemini spend by bot",
+            "# TYPE kalakitchen_llm_cost_usd_total counter",
+        ]
+        for bot, cost in sorted(self.cost_usd.items()):
+            lines.append(f'kalakitchen_llm_cost_usd_total{{bot="{bot}"}} {cost:.6f}')
+
+        for name, help_text, histograms in (
+            ("kalakitchen_llm_latency_seconds", "Gemini call latency by bot", self.latency),
+            ("kalakitchen_llm_prompt_tokens", "Prompt tokens per billed call by bot", self.prompt_tokens),
+            ("kalakitchen_llm_response_tokens", "Response tokens per billed call by bot", self.response_tokens),
+        ):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+            for bot, histogram in sorted(histograms.items()):
+                lines += histogram.render(name, f'bot="{bot}"')
+
+        return "\n".join(lines) + "\n"
@@ -60,6 +60,7 @@ class NutritionPer100g(BaseModel):
 
 class Ingredient(BaseModel):
     name: str
+    canonical_id: Optional[str] = None
     original_text: str
     quantity: Optional[float] = None
     unit: Optional[str] = None
@@ -88,6 +89,10 @@ class RecipeTitle(BaseModel):
     confidence: int = Field(ge=0, le=100)
     source: str  # "transcript", "ocr", "inferred"
 
+class NutrientInterval(BaseModel):
+    low: float
+    high: float
+
 class NutritionSummary(BaseModel):
     total_calories: Optional[float] = None
     total_protein_g: Optional[float] = None
@@ -95,6 +100,42 @@ class NutritionSummary(BaseModel):
     total_carbs_g: Optional[float] = None
     servings: Optional[int] = None
     per_serving: Optional[Dict[str, float]] = None
+    # Intervals at confidence_level reflecting quantity and density uncertainty
+    confidence_level: Optional[float] = None
+    total_intervals: Optional[Dict[str, NutrientInterval]] = None
+    per_serving_intervals: Optional[Dict[str, NutrientInterval]] = None
+
+class ExtractedClaims(BaseModel):
+    """Structured claim extraction output requested from Gemini"""
+    recipe_title: RecipeTitle
+    steps: List[CookingStep] = []
+    ingredients: List[Ingredient] = []
+    tools: List[str] = []
+
+class QuantityResolution(BaseModel):
+    """Structured quantity resolution output requested from Gemini"""
+    quantity: Optional[float] = None
+    unit: Optional[str] = None
+    confidence: int = Field(ge=0, le=100)
+    estimated: bool = True
+    estimation_method: Optional[str] = None
+    error_margin: Optional[float] = None
+
+class BatchQuantityResolution(QuantityResolution):
+    """One entry of a batched quantity resolution, matched to its ingredient by id"""
+    id: int
+
+class CulinaryInfo(BaseModel):
+    """Structured culinary enrichment output requested from Gemini"""
+    uses: List[str] = []
+    substitutions: List[str] = []
+    cultural_notes: Optional[str] = None
+
+class IngredientEnrichment(CulinaryInfo):
+    """One entry of a batched enrichment request, matched to its ingredient by id"""
+    id: int
+    nutrition_per_100g: Optional[NutritionPer100g] = None
+    medicinal_notes: List[MedicinalNote] = []
 
 class QuizQuestion(BaseModel):
     question: str
@@ -107,6 +148,10 @@ class LearnerPack(BaseModel):
     quiz: List[QuizQuestion]
     difficulty_level: str = "beginner"  # beginner, intermediate, advanced
 
+class ReportContent(LearnerPack):
+    """Learner pack and human summary requested from Gemini in one structured call"""
+    summary: str
+
 class RecipeAnalysisReport(BaseModel):
     # Core Recipe Data
     recipe_title: RecipeTitle
@@ -140,6 +185,28 @@ class RecipeAnalysisReport(BaseModel):
     raw_transcript: Optional[List[TranscriptSegment]] = None
     raw_keyframes: Optional[List[KeyframeData]] = None
 
+class QuantityResolutionStats(BaseModel):
+    ingredients: int = 0
+    fast_path: int = 0  # resolved from conclusive explicit evidence, no LLM call
+    model: int = 0
+    fallback: int = 0
+    fast_path_fraction: float = 0.0
+
+class LLMCallStats(BaseModel):
+    calls: int = 0
+    cache_hits: int = 0
+    coalesced: int = 0
+    errors: int = 0
+    retries: int = 0
+    prompt_tokens: int = 0
+    response_tokens: int = 0
+    latency_seconds: float = 0.0  # summed over calls
+    max_latency_seconds: float = 0.0
+    cost_usd: float = 0.0
+
+class LLMUsage(LLMCallStats):
+    by_bot: Dict[str, LLMCallStats] = {}
+
 class ProcessingStatus(BaseModel):
     video_id: str
     status: str  # "processing", "completed", "failed"
@@ -148,4 +215,7 @@ class ProcessingStatus(BaseModel):
     error_message: Optional[str] = None
     started_at: datetime
     completed_at: Optional[datetime] = None
-    result: Optional[RecipeAnalysisReport] = None
\ No newline at end of file
+    result: Optional[RecipeAnalysisReport] = None
+    llm_usage: Optional[LLMUsage] = None
+    quantity_resolution: Optional[QuantityResolutionStats] = None
+    completed_stages: List[str] = []
\ No newline at end of file
@@ -0,0 +1,171 @@
+"""
+NutrientMatrix - Vectorized nutrition totals for one recipe or thousands at once
+"""
+import math
+import numpy as np
+from operator import attrgetter
+from typing import Dict, List, Optional, Sequence, Tuple
+from .models import Ingredient, NutritionPer100g
+from .reference.densities import canonical_unit, WEIGHT_UNITS, VOLUME_UNITS
+
+# Matrix columns, in NutritionPer100g field order
+NUTRIENTS: List[str] = list(NutritionPer100g.__fields__)
+
+_nutrient_values = attrgetter(*NUTRIENTS)
+_EMPTY_ROW = (None,) * len(NUTRIENTS)
+
+# Log-scale spread of a gram amount by how its quantity was found; an
+# amount read off the transcript is close, a typical recipe amount is a guess
+QUANTITY_SPREAD = {
+    'explicit': 0.05,
+    'transcript_explicit': 0.05,
+    'ocr_reading': 0.15,
+    'model_estimate': 0.3,
+    'typical_recipe_amount': 0.5,
+}
+ESTIMATED_SPREAD = 0.35  # estimated by a method not listed above
+MEASURED_SPREAD = 0.05
+
+# Sampled gram amounts held in memory at once by intervals()
+INTERVAL_BLOCK_SIZE = 2_000_000
+
+# Added spread of the grams conversion: volume units go through an
+# ingredient density, count units ("2 onions") through a portion weight
+VOLUME_SPREAD = 0.1
+COUNT_SPREAD = 0.25
+
+def quantity_spread(ingredient: Ingredient) -> float:
+    """Log-scale standard deviation of an ingredient's gram amount"""
+    if ingredient.estimation_method in QUANTITY_SPREAD:
+        spread = QUANTITY_SPREAD[ingredient.estimation_method]
+    else:
+        spread = ESTIMATED_SPREAD if ingredient.estimated else MEASURED_SPREAD
+    
+    unit = canonical_unit(ingredient.unit) if ingredient.unit else None
+    if unit is None or unit in WEIGHT_UNITS:
+        return spread
+    return math.hypot(spread, VOLUME_SPREAD if unit in VOLUME_UNITS else COUNT_SPREAD)
+
+class NutrientMatrix:
+    """
+    Many recipes packed into one ingredient table. Ingredients point into a
+    matrix of distinct nutrition rows (foods x nutrients, per 100 g), so
+    recipes sharing an ingredient share its row; recipe r owns ingredient
+    rows offsets[r]:offsets[r + 1]. Totals for every recipe come from one
+    scaled gather and a segmented sum. spread holds each ingredient's gram
+    uncertainty (see quantity_spread) for confidence intervals.
+    """
+    
+    def __init__(self,
+                 foods: np.ndarray,
+                 food_index: np.ndarray,
+                 grams: np.ndarray,
+                 offsets: np.ndarray,
+                 spread: Optional[np.ndarray] = None):
+        self.foods = foods
+        self.food_index = food_index
+        self.grams = grams
+        self.offsets = offsets
+        self.spread = spread if spread is not None else np.zeros_like(grams)
+    
+    @classmethod
+    def from_recipes(cls, recipes: Sequence[Sequence[Ingredient]]) -> "NutrientMatrix":
+        """
+        Pack ingredient lists. Missing nutrient values count as 0; ingredients
+        without nutrition data or a gram amount get weight 0, so they add
+        nothing to totals.
+        """
+        rows: Dict[Tuple[Optional[float], ...], int] = {_EMPTY_ROW: 0}
+        food_index = []
+        grams = []
+        spread = []
+        for recipe in recipes:
+            for ingredient in recipe:
+                nutrition = ingredient.nutrition_per_100g
+                if nutrition is None or not ingredient.quantity_in_grams:
+                    food_index.append(0)
+                    grams.append(0.0)
+                    spread.append(0.0)
+                else:
+                    food_index.append(rows.setdefault(_nutrient_values(nutrition), len(rows)))
+                    grams.append(ingredient.quantity_in_grams)
+                    spread.append(quantity_spread(ingredient))
+        
+        counts = [len(recipe) for recipe in recipes]
+        return cls(
+            food_matrix(rows),
+            np.array(food_index, dtype=np.intp),
+            np.array(grams, dtype=float),
+            np.concatenate(([0], np.cumsum(counts, dtype=np.intp))),
+            np.array(spread, dtype=float)
+        )
+    
+    @property
+    def recipes(self) -> int:
+        return len(self.offsets) - 1
+    
+    def totals(self) -> np.ndarray:
+        """Recipes x nutrients totals"""
+        totals = np.zeros((self.recipes, len(NUTRIENTS)))
+        
+        starts = self.offsets[:-1]
+        nonempty = self.offsets[1:] > starts
+        if nonempty.any():
+            weighted = self.foods[self.food_index] * (self.grams[:, None] / 100.0)
+            # Empty recipes own no rows, so summing from each non-empty start
+            # to the next one covers exactly that recipe's ingredients
+            totals[nonempty] = np.add.reduceat(weighted, starts[nonempty], axis=0)
+        return totals
+    
+    def intervals(self, draws: int, level: float, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Monte Carlo confidence intervals of recipe totals: recipes x nutrients
+        lower and upper bounds. Each draw scales every gram amount by a
+        median-1 lognormal factor with the ingredient's spread; the bounds are
+        percentiles of the sampled totals. One block of standard normals is
+        shared by all recipes, so a recipe gets the same interval whether it
+        is summarized alone or in a batch.
+        """
+        low = np.zeros((self.recipes, len(NUTRIENTS)))
+        high = np.zeros((self.recipes, len(NUTRIENTS)))
+        lengths = np.diff(self.offsets)
+        if not len(self.grams) or draws <= 0:
+            return low, high
+        
+        # Sampled per ingredient position, so a recipe's normals do not depend on the batch
+        normals = np.random.default_rng(seed).standard_normal((int(lengths.max()), draws))
+        weights = self.foods[self.food_index] / 100.0
+        tail = (1 - level) / 2
+        
+        # Recipes go in blocks padded to their longest ingredient list, with
+        # padding at 0 grams, so each block is one batched product
+        recipes = np.flatnonzero(lengths)
+        block_size = max(1, INTERVAL_BLOCK_SIZE // (draws * max(int(lengths.max()), len(NUTRIENTS))))
+        for first in range(0, len(recipes), block_size):
+            block = recipes[first:first + block_size]
+            width = int(lengths[block].max())
+            rows = self.offsets[block, None] + np.arange(width)
+            present = np.arange(width) < lengths[block, None]
+            rows[~present] = 0
+            grams = np.where(present, self.grams[rows], 0.0)
+            # recipes x ingredients x draws gram factors; the grams themselves
+            # scale the much smaller weights, giving recipes x nutrients x draws totals
+            factors = normals[:width] * self.spread[rows][:, :, None]
+            np.exp(factors, out=factors)
+            totals = np.matmul((weights[rows] * grams[:, :, None]).transpose(0, 2, 1), factors)
+            # A full sort beats np.percentile's multi-point partition here
+            totals.sort(axis=2)
+            low[block], high[block] = sorted_quantile(totals, tail), sorted_quantile(totals, 1 - tail)
+        return low, high
+
+def sorted_quantile(values: np.ndarray, q: float) -> np.ndarray:
+    """Quantile along the last axis of sorted values, interpolated as np.quantile does"""
+    position = q * (values.shape[-1] - 1)
+    below = int(math.floor(position))
+    above = min(below + 1, values.shape[-1] - 1)
+    return values[..., below] + (values[..., above] - values[..., below]) * (position - below)
+
+def food_matrix(rows: Sequence[Sequence[Optional[float]]]) -> np.ndarray:
+    """Nutrient rows as a float matrix, with missing values as 0"""
+    matrix = np.array(list(rows), dtype=float).reshape(len(rows), len(NUTRIENTS))
+    return np.nan_to_num(matrix, copy=False)
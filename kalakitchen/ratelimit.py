@@ -0,0 +1,77 @@
+"""
+KalaKitchen Rate Limiting - Async token buckets and per-host limits shared by LLM and HTTP clients
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at rate_per_minute.
+    
+    Waiters are served in arrival order. Requests larger than the bucket
+    capacity are clamped so they can still pass once the bucket is full.
+    """
+    
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    async def acquire(self, amount: float = 1.0):
+        """Wait until amount tokens are available and take them"""
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+    
+    def adjust(self, amount: float):
+        """Correct an earlier estimate: positive takes more tokens, negative returns them"""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+class HostLimiter:
+    """
+    Per-host concurrency and request-rate limits for outbound HTTP calls.
+    
+    Each host gets its own semaphore and TokenBucket on first use; hosts in
+    overrides use their own (max_concurrent, requests_per_minute) pair.
+    """
+    
+    def __init__(self,
+                 max_concurrent: int,
+                 requests_per_minute: float,
+                 overrides: Optional[Dict[str, Tuple[int, float]]] = None):
+        self.max_concurrent = max_concurrent
+        self.requests_per_minute = requests_per_minute
+        self.overrides = overrides or {}
+        self._hosts: Dict[str, Tuple[asyncio.Semaphore, TokenBucket]] = {}
+    
+    def _limits(self, host: str) -> Tuple[asyncio.Semaphore, TokenBucket]:
+        if host not in self._hosts:
+            max_concurrent, requests_per_minute = self.overrides.get(
+                host, (self.max_concurrent, self.requests_per_minute)
+            )
+            self._hosts[host] = (asyncio.Semaphore(max_concurrent), TokenBucket(requests_per_minute))
+        return self._hosts[host]
+    
+    @asynccontextmanager
+    async def limit(self, url: str):
+        """Hold a slot for the URL's host, waiting for its rate budget first"""
+        semaphore, bucket = self._limits(urlparse(url).netloc or url)
+        await bucket.acquire(1)
+        async with semaphore:
+            yield
@@ -0,0 +1,202 @@
+"""
+Nutrition Recompute - Reapplies current nutrition and density reference data to stored reports
+
+After correcting a nutrient value or density, refresh the nutrition of every
+stored report without re-running the videos:
+
+    python -m kalakitchen.recompute --ingredients turmeric,ghee --workers 8
+
+Reports are processed in chunks across worker processes and written back
+one by one. Finished reports are appended to a progress file, so an
+interrupted run resumes where it stopped when started again with the same
+--job name.
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+from .config import settings
+from .models import Ingredient, NutritionPer100g
+from .bots.nutrition_mapper import NutritionMapper
+from .enrichment_store import EnrichmentStore, NUTRITION
+from .report_store import ReportStore, get_report_store
+from .reference.canonical import Canonicalizer
+from .reference.densities import get_density_table
+from .reference.usda import get_usda_snapshot
+
+class NutritionRecomputer:
+    """
+    Per-process reference data: density table, USDA snapshot and a read-only
+    view of the enrichment store. Only ingredients whose canonical ID is in
+    `affected` are refreshed (all of them when it is None).
+    """
+    
+    def __init__(self, affected: Optional[Set[str]] = None, reports: Optional[ReportStore] = None):
+        self.affected = affected
+        self.reports = reports or get_report_store()
+        self.densities = get_density_table()
+        self.snapshot = get_usda_snapshot()
+        self.store = None
+        if settings.ENRICHMENT_STORE_ENABLED and Path(settings.ENRICHMENT_STORE_PATH).exists():
+            self.store = EnrichmentStore(settings.ENRICHMENT_STORE_PATH, read_only=True)
+        # Dictionary and string matching only; no embedding model per worker
+        self.canonicalizer = Canonicalizer(embeddings=False)
+        self.mapper = NutritionMapper()
+    
+    def recompute(self, video_ids: List[str]) -> List[Tuple[str, Optional[bool]]]:
+        """
+        Refresh a chunk of reports. Returns (video_id, updated) per report;
+        updated is None when the report could not be processed.
+        """
+        loaded = []
+        results = []
+        for video_id in video_ids:
+            try:
+                report = self.reports.load(video_id)
+                changed = [self._refresh_ingredient(ingredient) for ingredient in report.ingredients]
+                loaded.append((video_id, report, any(changed)))
+            except Exception as e:
+                print(f"Could not recompute report {video_id}: {e}")
+                results.append((video_id, None))
+        
+        # Summaries for the whole chunk in one nutrient matrix pass
+        changed_reports = [(video_id, report) for video_id, report, changed in loaded if changed]
+        summaries = self.mapper.calculate_nutrition_summaries(
+            [report.ingredients for _, report in changed_reports]
+        )
+        
+        for (video_id, report), summary in zip(changed_reports, summaries):
+            try:
+                report.nutrition_summary = summary
+                self.reports.save(video_id, report)
+                results.append((video_id, True))
+            except Exception as e:
+                print(f"Could not save recomputed report {video_id}: {e}")
+                results.append((video_id, None))
+        
+        results.extend((video_id, False) for video_id, _, changed in loaded if not changed)
+        return results
+    
+    def _refresh_ingredient(self, ingredient: Ingredient) -> bool:
+        """Reapply current grams and nutrition to an affected ingredient; returns whether it changed"""
+        cid = ingredient.canonical_id or self.canonicalizer.resolve(ingredient.name).canonical_id
+        if self.affected is not None and cid not in self.affected:
+            return False
+        name = self.canonicalizer.name_for(cid) or ingredient.name
+        
+        grams = ingredient.quantity_in_grams
+        if ingredient.quantity and ingredient.unit:
+            grams = self.densities.to_grams(ingredient.quantity, ingredient.unit, name) or grams
+        
+        nutrition = self._nutrition(cid, name) or ingredient.nutrition_per_100g
+        
+        changed = grams != ingredient.quantity_in_grams or nutrition != ingredient.nutrition_per_100g
+        ingredient.canonical_id = cid
+        ingredient.quantity_in_grams = grams
+        ingredient.nutrition_per_100g = nutrition
+        return changed
+    
+    def _nutrition(self, cid: str, name: str) -> Optional[NutritionPer100g]:
+        """Reference nutrition: the USDA snapshot, then stored enrichment results"""
+        if self.snapshot:
+            nutrition = self.snapshot.lookup(name)
+            if nutrition:
+                return nutrition
+        stored = self.store.get(cid, NUTRITION) if self.store else None
+        return NutritionPer100g(**stored) if stored is not None else None
+
+_worker: Optional[NutritionRecomputer] = None
+
+def _init_worker(affected: Optional[Set[str]], reports_directory: str):
+    global _worker
+    _worker = NutritionRecomputer(affected, ReportStore(reports_directory))
+
+def _recompute_chunk(video_ids: List[str]) -> List[Tuple[str, Optional[bool]]]:
+    return _worker.recompute(video_ids)
+
+def _chunks(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def recompute_reports(ingredients: Optional[List[str]] = None,
+                      job: str = "nutrition",
+                      workers: Optional[int] = None,
+                      chunk_size: int = 200,
+                      restart: bool = False,
+                      reports: Optional[ReportStore] = None) -> Tuple[int, int, int]:
+    """
+    Recompute stored reports in parallel, resuming a previous run of the same
+    job. Returns (reports updated, unchanged, failed) for this run. Raises
+    ValueError when an ingredient name does not resolve to a canonical ID.
+    """
+    workers = workers or os.cpu_count() or 1
+    reports = reports or get_report_store()
+    affected = None
+    if ingredients:
+        canonicalizer = Canonicalizer(embeddings=False)
+        matches = canonicalizer.resolve_many(ingredients)
+        # An unresolved name would silently match nothing stored under a real ID
+        unknown = [name for name, match in zip(ingredients, matches) if match.method == "unresolved"]
+        if unknown:
+            raise ValueError(f"Unknown ingredients: {', '.join(unknown)}")
+        affected = {match.canonical_id for match in matches}
+    
+    progress_path = Path(settings.OUTPUT_DIR) / "recompute" / f"{job}.done"
+    progress_path.parent.mkdir(parents=True, exist_ok=True)
+    if restart and progress_path.exists():
+        progress_path.unlink()
+    done = set(progress_path.read_text().split()) if progress_path.exists() else set()
+    
+    pending = (video_id for video_id in reports.video_ids() if video_id not in done)
+    counts = {True: 0, False: 0, None: 0}
+    
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(affected, str(reports.directory))) as pool, \
+            open(progress_path, "a") as progress:
+        
+        def record(futures):
+            for future in futures:
+                for video_id, updated in future.result():
+                    counts[updated] += 1
+                    # Failed reports are retried on the next run
+                    if updated is not None:
+                        progress.write(video_id + "\n")
+            progress.flush()
+        
+        # Stream reports: keep a bounded number of chunks in flight
+        in_flight = set()
+        for chunk in _chunks(pending, chunk_size):
+            in_flight.add(pool.submit(_recompute_chunk, chunk))
+            if len(in_flight) >= workers * 2:
+                finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                record(finished)
+        record(wait(in_flight).done)
+    
+    return counts[True], counts[False], counts[None]
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute nutrition of stored reports")
+    parser.add_argument("--ingredients", help="Comma-separated ingredients whose reference data changed (default: all)")
+    parser.add_argument("--job", default="nutrition", help="Job name used to resume an interrupted run (default: nutrition)")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=200, help="Reports per worker task (default: 200)")
+    parser.add_argument("--restart", action="store_true", help="Ignore progress from a previous run of this job")
+    args = parser.parse_args()
+    
+    ingredients = [name.strip() for name in args.ingredients.split(",") if name.strip()] if args.ingredients else None
+    try:
+        updated, unchanged, failed = recompute_reports(
+            ingredients, args.job, args.workers, args.chunk_size, args.restart
+        )
+    except ValueError as e:
+        print(f"Error: {e}")
+        return
+    print(f"Updated {updated} reports, {unchanged} unchanged, {failed} failed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+"""
+KalaKitchen Reference Data - Packaged ingredient tables loaded once per process
+"""
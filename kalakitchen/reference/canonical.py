@@ -0,0 +1,221 @@
+"""
+Canonicalizer - Maps multilingual ingredient names and synonyms to stable canonical IDs
+"""
+import csv
+import difflib
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, Union
+from ..config import settings
+from ..evidence import TOKEN_PATTERN, tokenize
+from ..models import Ingredient
+
+DATA_DIR = Path(__file__).parent
+
+# Words that may surround a known phrase without changing the ingredient
+# ("finely chopped haldi"); anything else ("garlic powder", "chicken stock")
+# makes the name a different ingredient than the phrase inside it
+MODIFIER_WORDS = set(tokenize(
+    "fresh freshly dried dry raw whole chopped finely roughly coarsely thinly minced "
+    "sliced diced cubed grated shredded crushed peeled deseeded pitted halved quartered "
+    "julienned mashed soaked rinsed washed fried melted softened beaten sifted heaped "
+    "large small medium big organic few some handful of a an the and to taste"
+))
+
+def canonical_id(name: str) -> str:
+    """Stable ID for a canonical name ("All-purpose flour" -> "all_purpose_flour", "Curry leaves" -> "curry_leaves")"""
+    return "_".join(TOKEN_PATTERN.findall(name.lower()))
+
+class CanonicalMatch:
+    """Canonical ingredient a name resolved to, and how"""
+    
+    def __init__(self, canonical_id: str, name: str, method: str, score: float = 1.0):
+        self.canonical_id = canonical_id
+        self.name = name
+        self.method = method  # "synonym", "embedding", "fuzzy" or "unresolved"
+        self.score = score
+
+def _compound_of(tokens: List[str], part: List[str]) -> bool:
+    """Whether tokens name another ingredient made from part ("garlic paste" from "garlic")"""
+    for start in range(len(tokens) - len(part) + 1):
+        if tokens[start:start + len(part)] == part:
+            rest = tokens[:start] + tokens[start + len(part):]
+            return any(token not in MODIFIER_WORDS for token in rest)
+    return False
+
+class SynonymTrie:
+    """
+    Token trie over normalized synonym phrases. Finds an exact phrase, or
+    the longest known phrase inside a longer name ("finely chopped haldi").
+    """
+    
+    def __init__(self):
+        self.root: Dict[Any, Any] = {}
+    
+    def add(self, phrase: List[str], value: str):
+        node = self.root
+        for token in phrase:
+            node = node.setdefault(token, {})
+        # None marks the end of a phrase; the first value added wins
+        node.setdefault(None, value)
+    
+    def exact(self, tokens: List[str]) -> Optional[str]:
+        node = self.root
+        for token in tokens:
+            node = node.get(token)
+            if node is None:
+                return None
+        return node.get(None)
+    
+    def longest(self, tokens: List[str]) -> Optional[Tuple[str, int, int]]:
+        """Value and token range [start, end) of the longest phrase inside tokens"""
+        best, best_length = None, 0
+        for start in range(len(tokens)):
+            node = self.root
+            for end in range(start, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if None in node and end - start + 1 > best_length:
+                    best, best_length = (node[None], start, end + 1), end - start + 1
+        return best
+
+class Canonicalizer:
+    """
+    Resolves ingredient names to canonical IDs: first through the synonym
+    trie (a known phrase inside a longer name counts only when the other
+    words are MODIFIER_WORDS), then - for names the dictionary does not
+    know - through one batched multilingual embedding pass
+    (sentence-transformers), falling back to string similarity when
+    embeddings are unavailable. Results are memoized.
+    """
+    
+    def __init__(self,
+                 synonyms_path: Union[str, Path] = DATA_DIR / "synonyms.csv",
+                 embeddings: Optional[bool] = None):
+        self.trie = SynonymTrie()
+        self.names: Dict[str, str] = {}  # canonical ID -> canonical name
+        self.phrases: List[Tuple[str, str]] = []  # (normalized phrase, canonical ID)
+        self._memo: Dict[str, CanonicalMatch] = {}
+        self._model = None
+        self._phrase_embeddings = None
+        self._embeddings_available = settings.CANONICAL_EMBEDDINGS_ENABLED if embeddings is None else embeddings
+        
+        with open(synonyms_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                self.add(row["canonical"], [s for s in (row.get("synonyms") or "").split("|") if s])
+    
+    def add(self, name: str, synonyms: List[str] = ()):
+        """Register a canonical ingredient and its synonyms"""
+        cid = canonical_id(name)
+        self.names.setdefault(cid, name)
+        for phrase in [name, *synonyms]:
+            tokens = tokenize(phrase)
+            if tokens:
+                self.trie.add(tokens, cid)
+                self.phrases.append((" ".join(tokens), cid))
+        self._phrase_embeddings = None
+    
+    def name_for(self, cid: str) -> Optional[str]:
+        """Canonical (English) name for an ID, if it is a known ingredient"""
+        return self.names.get(cid)
+    
+    def resolve(self, name: str) -> CanonicalMatch:
+        return self.resolve_many([name])[0]
+    
+    def resolve_many(self, names: List[str]) -> List[CanonicalMatch]:
+        """Resolve names; unknown names share one embedding batch"""
+        unknown: Dict[str, str] = {}  # key -> first name seen with it
+        for name in names:
+            key = " ".join(tokenize(name))
+            if key in self._memo:
+                continue
+            cid = self.trie.exact(key.split()) or self._modified_phrase(key.split())
+            if cid:
+                self._memo[key] = CanonicalMatch(cid, self.names[cid], "synonym")
+            else:
+                unknown.setdefault(key, name)
+        
+        if unknown:
+            for key, match in zip(unknown, self._match_unknown(list(unknown), list(unknown.values()))):
+                self._memo[key] = match
+        
+        return [self._memo[" ".join(tokenize(name))] for name in names]
+    
+    def canonicalize_ingredients(self, ingredients: List[Ingredient]) -> List[Ingredient]:
+        """Set canonical_id on every ingredient in one batch"""
+        for ingredient, match in zip(ingredients, self.resolve_many([i.name for i in ingredients])):
+            ingredient.canonical_id = match.canonical_id
+        return ingredients
+    
+    def _modified_phrase(self, tokens: List[str]) -> Optional[str]:
+        """A known phrase inside the name, if every other word only describes its preparation"""
+        found = self.trie.longest(tokens)
+        if found is None:
+            return None
+        cid, start, end = found
+        if all(token in MODIFIER_WORDS for token in tokens[:start] + tokens[end:]):
+            return cid
+        return None
+    
+    def _match_unknown(self, keys: List[str], names: List[str]) -> List[CanonicalMatch]:
+        matches = self._embedding_matches(keys) if self._embeddings_available else None
+        if matches is None:
+            matches = [self._fuzzy_match(key) for key in keys]
+        
+        # Unknown ingredients still get a stable ID derived from their name
+        return [
+            match or CanonicalMatch(canonical_id(name), name.strip(), "unresolved", 0.0)
+            for name, match in zip(names, matches)
+        ]
+    
+    def _embedding_matches(self, keys: List[str]) -> Optional[List[Optional[CanonicalMatch]]]:
+        """Nearest synonym phrase by cosine similarity, or None if embeddings are unavailable"""
+        try:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(settings.CANONICAL_EMBEDDING_MODEL)
+            if self._phrase_embeddings is None:
+                self._phrase_embeddings = self._model.encode(
+                    [phrase for phrase, _ in self.phrases], normalize_embeddings=True, batch_size=256
+                )
+            embeddings = self._model.encode(keys, normalize_embeddings=True, batch_size=256)
+        except Exception as e:
+            print(f"Embedding matcher unavailable, using string similarity: {e}")
+            self._embeddings_available = False
+            return None
+        
+        similarities = embeddings @ self._phrase_embeddings.T
+        matches = []
+        for key, row in zip(keys, similarities):
+            match = None
+            for best in row.argsort()[::-1]:
+                score = float(row[best])
+                if score < settings.CANONICAL_MATCH_MIN_SIMILARITY:
+                    break
+                phrase, cid = self.phrases[best]
+                # "garlic paste" embeds close to "garlic" but is another ingredient
+                if _compound_of(key.split(), phrase.split()) or _compound_of(phrase.split(), key.split()):
+                    continue
+                match = CanonicalMatch(cid, self.names[cid], "embedding", score)
+                break
+            matches.append(match)
+        return matches
+    
+    def _fuzzy_match(self, key: str) -> Optional[CanonicalMatch]:
+        """Closest synonym phrase by edit similarity (handles misspellings like "tumeric")"""
+        phrases = [phrase for phrase, _ in self.phrases]
+        close = difflib.get_close_matches(key, phrases, n=1, cutoff=0.85)
+        if not close:
+            return None
+        cid = self.phrases[phrases.index(close[0])][1]
+        score = difflib.SequenceMatcher(None, key, close[0]).ratio()
+        return CanonicalMatch(cid, self.names[cid], "fuzzy", score)
+
+_canonicalizer: Optional[Canonicalizer] = None
+
+def get_canonicalizer() -> Canonicalizer:
+    """Process-wide canonicalizer, loaded on first use"""
+    global _canonicalizer
+    if _canonicalizer is None:
+        _canonicalizer = Canonicalizer()
+    return _canonicalizer
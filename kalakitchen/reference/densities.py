@@ -0,0 +1,216 @@
+"""
+DensityTable - Ingredient densities and portion weights for converting quantities to grams
+"""
+import csv
+from array import array
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Union
+from ..config import settings
+from ..evidence import tokenize
+
+DATA_DIR = Path(__file__).parent
+
+# Weight units in grams, independent of the ingredient
+WEIGHT_UNITS = {
+    'g': 1.0, 'mg': 0.001, 'kg': 1000.0,
+    'oz': 28.35, 'lb': 453.59,
+    'tola': 11.66, 'chatak': 58.32, 'seer': 933.1,  # South Asian units
+}
+
+# Volume units in US cups (1 cup = 240 ml)
+VOLUME_UNITS = {
+    'cup': 1.0, 'tbsp': 1 / 16, 'tsp': 1 / 48,
+    'ml': 1 / 240, 'l': 1000 / 240, 'fl oz': 1 / 8,
+    'pinch': 1 / 768, 'dash': 1 / 384,
+    'katori': 150 / 240, 'glass': 250 / 240,  # South Asian household measures
+}
+
+# Unit spellings that denote the same measure
+UNIT_ALIASES = {
+    'cups': 'cup', 'c': 'cup',
+    'tablespoon': 'tbsp', 'tablespoons': 'tbsp', 'tbs': 'tbsp', 'tbl': 'tbsp',
+    'teaspoon': 'tsp', 'teaspoons': 'tsp',
+    'gram': 'g', 'grams': 'g', 'gm': 'g', 'gms': 'g',
+    'kilogram': 'kg', 'kilograms': 'kg', 'kgs': 'kg',
+    'milligram': 'mg', 'milligrams': 'mg',
+    'ounce': 'oz', 'ounces': 'oz',
+    'pound': 'lb', 'pounds': 'lb', 'lbs': 'lb',
+    'liter': 'l', 'liters': 'l', 'litre': 'l', 'litres': 'l',
+    'milliliter': 'ml', 'milliliters': 'ml', 'millilitre': 'ml', 'millilitres': 'ml',
+    'fluid ounce': 'fl oz', 'fluid ounces': 'fl oz',
+    'pieces': 'piece', 'pcs': 'piece', 'pc': 'piece', 'whole': 'piece', 'nos': 'piece',
+    'cloves': 'clove', 'sprigs': 'sprig', 'slices': 'slice', 'sticks': 'stick',
+    'pinches': 'pinch', 'dashes': 'dash', 'bunches': 'bunch', 'pods': 'pod',
+    'katoris': 'katori', 'bowl': 'katori', 'bowls': 'katori', 'glasses': 'glass',
+    'inches': 'inch', 'heads': 'head',
+}
+
+WATER_GRAMS_PER_CUP = 240.0
+
+# Count units that mean "one of the ingredient's default size"
+DEFAULT_COUNT_UNITS = ('piece', 'medium')
+
+def canonical_unit(unit: str) -> str:
+    """Normalize a unit spelling ("Tablespoons" -> "tbsp")"""
+    unit = unit.strip().lower().rstrip('.')
+    return UNIT_ALIASES.get(unit, unit)
+
+def normalize_name(name: str) -> str:
+    return ' '.join(tokenize(name))
+
+def _trigrams(text: str) -> List[str]:
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+class DensityTable:
+    """
+    Ingredient densities and portion weights with O(1) exact lookup.
+    
+    Names and aliases map to row ids; densities live in a flat array and
+    portions in a dict keyed by (row id, unit). Unknown names are matched by
+    their trailing words ("finely chopped red onion" -> "red onion") and then
+    fuzzily through a character-trigram index.
+    """
+    
+    FUZZY_MIN_RATIO = 0.85
+    FUZZY_CANDIDATES = 10
+    
+    def __init__(self):
+        self.names: List[str] = []
+        self.grams_per_cup = array('d')
+        self._ids: Dict[str, int] = {}
+        self._portions: Dict[Tuple[int, str], float] = {}
+        self._generic_portions: Dict[str, float] = {}
+        self._trigrams: Dict[str, List[int]] = {}
+        self._keys: List[str] = []
+        self._lookups: Dict[str, Optional[int]] = {}
+    
+    @classmethod
+    def load(cls,
+             densities_path: Union[str, Path] = DATA_DIR / "densities.csv",
+             portions_path: Union[str, Path] = DATA_DIR / "portions.csv") -> "DensityTable":
+        """Load density rows (name, aliases, grams_per_cup) and portion rows (name, unit, grams)"""
+        table = cls()
+        
+        with open(densities_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                aliases = [alias for alias in (row.get('aliases') or '').split('|') if alias]
+                table.add(row['name'], float(row['grams_per_cup']), aliases)
+        
+        with open(portions_path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                table.add_portion(row['name'], row['unit'], float(row['grams']))
+        
+        return table
+    
+    def add(self, name: str, grams_per_cup: float, aliases: List[str] = ()) -> int:
+        """Add an ingredient; returns its row id"""
+        row_id = self._ensure(name)
+        self.grams_per_cup[row_id] = grams_per_cup
+        for alias in aliases:
+            self._index_key(normalize_name(alias), row_id)
+        return row_id
+    
+    def add_portion(self, name: str, unit: str, grams: float):
+        """Add the weight of one unit ("medium", "clove", ...); name "*" applies to every ingredient"""
+        unit = canonical_unit(unit)
+        if name == '*':
+            self._generic_portions[unit] = grams
+        else:
+            self._portions[(self._ensure(name), unit)] = grams
+    
+    def lookup(self, name: str) -> Optional[int]:
+        """Row id for an ingredient name: exact, then trailing words, then fuzzy"""
+        key = normalize_name(name)
+        if key in self._lookups:
+            return self._lookups[key]
+        
+        row_id = self._ids.get(key)
+        if row_id is None:
+            tokens = key.split()
+            for start in range(1, len(tokens)):
+                row_id = self._ids.get(' '.join(tokens[start:]))
+                if row_id is not None:
+                    break
+        if row_id is None and key:
+            row_id = self._fuzzy(key)
+        
+        self._lookups[key] = row_id
+        return row_id
+    
+    def to_grams(self, quantity: float, unit: str, name: str) -> Optional[float]:
+        """Convert a quantity to grams, or None when the unit cannot be converted"""
+        unit = canonical_unit(unit)
+        
+        if unit in WEIGHT_UNITS:
+            return quantity * WEIGHT_UNITS[unit]
+        
+        row_id = self.lookup(name)
+        
+        if row_id is not None and (row_id, unit) in self._portions:
+            return quantity * self._portions[(row_id, unit)]
+        
+        if unit in VOLUME_UNITS:
+            grams_per_cup = self.grams_per_cup[row_id] if row_id is not None else 0.0
+            # Unknown or count-only ingredients are assumed to have water density
+            return quantity * VOLUME_UNITS[unit] * (grams_per_cup or WATER_GRAMS_PER_CUP)
+        
+        if row_id is not None and unit in ('piece', 'small', 'medium', 'large'):
+            for default_unit in DEFAULT_COUNT_UNITS:
+                if (row_id, default_unit) in self._portions:
+                    return quantity * self._portions[(row_id, default_unit)]
+        
+        if unit in self._generic_portions:
+            return quantity * self._generic_portions[unit]
+        
+        return None
+    
+    def _ensure(self, name: str) -> int:
+        key = normalize_name(name)
+        row_id = self._ids.get(key)
+        if row_id is None:
+            row_id = len(self.names)
+            self.names.append(name)
+            self.grams_per_cup.append(0.0)  # 0 = no density, portions only
+            self._index_key(key, row_id)
+        return row_id
+    
+    def _index_key(self, key: str, row_id: int):
+        if key in self._ids:
+            return
+        self._ids[key] = row_id
+        position = len(self._keys)
+        self._keys.append(key)
+        for trigram in set(_trigrams(key)):
+            self._trigrams.setdefault(trigram, []).append(position)
+        self._lookups.clear()
+    
+    def _fuzzy(self, key: str) -> Optional[int]:
+        """Closest indexed name by trigram overlap, confirmed by edit similarity"""
+        overlap: Dict[int, int] = {}
+        for trigram in set(_trigrams(key)):
+            for position in self._trigrams.get(trigram, ()):
+                overlap[position] = overlap.get(position, 0) + 1
+        
+        candidates = sorted(overlap, key=overlap.get, reverse=True)[:self.FUZZY_CANDIDATES]
+        best, best_ratio = None, self.FUZZY_MIN_RATIO
+        for position in candidates:
+            ratio = SequenceMatcher(None, key, self._keys[position]).ratio()
+            if ratio >= best_ratio:
+                best, best_ratio = position, ratio
+        
+        return self._ids[self._keys[best]] if best is not None else None
+
+_density_table: Optional[DensityTable] = None
+
+def get_density_table() -> DensityTable:
+    """Process-wide density table, loaded on first use"""
+    global _density_table
+    if _density_table is None:
+        if settings.DENSITY_TABLE_DIR:
+            data_dir = Path(settings.DENSITY_TABLE_DIR)
+            _density_table = DensityTable.load(data_dir / "densities.csv", data_dir / "portions.csv")
+        else:
+            _density_table = DensityTable.load()
+    return _density_table
@@ -0,0 +1,195 @@
+"""
+USDASnapshot - Local FoodData Central nutrient store with full-text food lookup
+
+Import the Foundation and SR Legacy CSV downloads from
+https://fdc.nal.usda.gov/download-datasets once:
+
+    python -m kalakitchen.reference.usda FoodData_Central_foundation_food_csv FoodData_Central_sr_legacy_food_csv
+"""
+import argparse
+import csv
+import os
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple, Union
+from ..config import settings
+from ..models import NutritionPer100g
+
+DATA_TYPES = ("foundation_food", "sr_legacy_food")
+
+# FDC nutrient ids -> NutritionPer100g fields; later ids only fill gaps
+NUTRIENT_FIELDS = {
+    1008: "calories",       # Energy (kcal)
+    2047: "calories",       # Energy (Atwater General Factors), Foundation foods
+    2048: "calories",       # Energy (Atwater Specific Factors), Foundation foods
+    1003: "protein_g",
+    1004: "fat_g",
+    1005: "carbs_g",
+    1050: "carbs_g",        # Carbohydrate by summation
+    1079: "fiber_g",
+    2000: "sugar_g",        # Sugars, total including NLEA
+    1063: "sugar_g",        # Sugars, Total
+    1093: "sodium_mg",
+    1092: "potassium_mg",
+    1162: "vitamin_c_mg",
+    1089: "iron_mg",
+    1087: "calcium_mg",
+}
+
+NUTRIENT_PRIORITY = {nutrient_id: i for i, nutrient_id in enumerate(NUTRIENT_FIELDS)}
+
+FIELDS = list(NutritionPer100g.__fields__)
+
+def import_snapshot(dataset_dirs: List[Union[str, Path]], output_path: Union[str, Path]) -> int:
+    """
+    Build the local store from extracted FDC CSV downloads (food.csv and
+    food_nutrient.csv per dataset). Returns the number of foods imported.
+    """
+    foods: Dict[int, Tuple[str, str]] = {}
+    values: Dict[int, Dict[str, Tuple[int, float]]] = {}
+    
+    for dataset_dir in map(Path, dataset_dirs):
+        with open(dataset_dir / "food.csv", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row["data_type"] in DATA_TYPES:
+                    foods[int(row["fdc_id"])] = (row["description"], row["data_type"])
+        
+        with open(dataset_dir / "food_nutrient.csv", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                nutrient_id = int(row["nutrient_id"])
+                fdc_id = int(row["fdc_id"])
+                if nutrient_id not in NUTRIENT_FIELDS or fdc_id not in foods or not row["amount"]:
+                    continue
+                field = NUTRIENT_FIELDS[nutrient_id]
+                food_values = values.setdefault(fdc_id, {})
+                # Keep the preferred source nutrient for each field
+                priority = NUTRIENT_PRIORITY[nutrient_id]
+                if field not in food_values or priority < food_values[field][0]:
+                    food_values[field] = (priority, float(row["amount"]))
+    
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    building_path = output_path.with_suffix(output_path.suffix + ".building")
+    if building_path.exists():
+        building_path.unlink()
+    
+    conn = sqlite3.connect(str(building_path))
+    conn.execute(f"""
+        CREATE TABLE foods (
+            fdc_id INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            data_type TEXT NOT NULL,
+            {", ".join(f"{field} REAL" for field in FIELDS)}
+        )
+    """)
+    conn.execute("CREATE VIRTUAL TABLE foods_fts USING fts5(description, content='foods', content_rowid='fdc_id')")
+    conn.executemany(
+        f"INSERT INTO foods VALUES (?, ?, ?, {', '.join('?' for _ in FIELDS)})",
+        (
+            (fdc_id, description, data_type,
+             *(values.get(fdc_id, {}).get(field, (None, None))[1] for field in FIELDS))
+            for fdc_id, (description, data_type) in foods.items()
+        )
+    )
+    conn.execute("INSERT INTO foods_fts (rowid, description) SELECT fdc_id, description FROM foods")
+    conn.commit()
+    conn.close()
+    
+    # Replace any previous snapshot only once the new one is complete
+    os.replace(building_path, output_path)
+    return len(foods)
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+class USDASnapshot:
+    """
+    Read-only lookup over an imported snapshot. Names are matched with FTS5
+    and ranked to prefer descriptions that lead with the ingredient and
+    describe it raw; results are memoized, so repeat lookups are dict hits.
+    """
+    
+    CANDIDATES = 25
+    
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._memo: Dict[str, Optional[Tuple[Optional[float], ...]]] = {}
+    
+    def lookup(self, ingredient_name: str) -> Optional[NutritionPer100g]:
+        """Nutrition per 100 g for the best-matching food, or None"""
+        key = " ".join(_tokens(ingredient_name))
+        if key not in self._memo:
+            self._memo[key] = self._search(key)
+        
+        row = self._memo[key]
+        return NutritionPer100g(**dict(zip(FIELDS, row))) if row else None
+    
+    def _search(self, key: str) -> Optional[Tuple[Optional[float], ...]]:
+        tokens = key.split()
+        if not tokens:
+            return None
+        
+        columns = ", ".join(f"foods.{field}" for field in FIELDS)
+        query = f"""
+            SELECT foods.description, bm25(foods_fts), {columns}
+            FROM foods_fts JOIN foods ON foods.fdc_id = foods_fts.rowid
+            WHERE foods_fts MATCH ? ORDER BY bm25(foods_fts) LIMIT ?
+        """
+        with self._lock:
+            # All words first, then any word
+            for operator in (" AND ", " OR "):
+                match = operator.join(f'"{token}"*' for token in tokens)
+                rows = self._conn.execute(query, (match, self.CANDIDATES)).fetchall()
+                if rows:
+                    break
+        
+        if not rows:
+            return None
+        
+        best = min(rows, key=lambda row: self._score(tokens, row[0], row[1]))
+        return tuple(best[2:])
+    
+    def _score(self, tokens: List[str], description: str, rank: float) -> float:
+        """Lower is better: FTS rank adjusted for how well the description leads with the name"""
+        head = _tokens(description.split(",")[0])
+        words = _tokens(description)
+        score = rank + 0.05 * len(words)
+        if head and all(any(word.startswith(token) for word in head) for token in tokens):
+            score -= 5.0
+        if "raw" in words:
+            score -= 1.0
+        return score
+
+_usda_snapshot: Optional[USDASnapshot] = None
+_usda_snapshot_loaded = False
+
+def get_usda_snapshot() -> Optional[USDASnapshot]:
+    """Process-wide snapshot, or None if none has been imported"""
+    global _usda_snapshot, _usda_snapshot_loaded
+    if not _usda_snapshot_loaded:
+        _usda_snapshot_loaded = True
+        if Path(settings.USDA_SNAPSHOT_PATH).exists():
+            _usda_snapshot = USDASnapshot(settings.USDA_SNAPSHOT_PATH)
+    return _usda_snapshot
+
+def main():
+    parser = argparse.ArgumentParser(description="Import FoodData Central CSV downloads")
+    parser.add_argument("datasets", nargs="+", help="Extracted Foundation / SR Legacy CSV directories")
+    parser.add_argument("--output", "-o", help="Snapshot file (default: USDA_SNAPSHOT_PATH)")
+    args = parser.parse_args()
+    
+    missing = [d for d in args.datasets if not (Path(d) / "food.csv").exists()]
+    if missing:
+        print(f"Error: food.csv not found in: {', '.join(missing)}")
+        return
+    
+    output = args.output or settings.USDA_SNAPSHOT_PATH
+    count = import_snapshot(args.datasets, output)
+    print(f"Imported {count} foods into {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+ReportStore - Completed analysis reports kept as JSON files under OUTPUT_DIR
+"""
+import json
+import os
+from pathlib import Path
+from typing import Iterator, Optional, Union
+from .config import settings
+from .models import RecipeAnalysisReport
+from .llm.structured import validate_model
+
+class ReportStore:
+    """
+    One JSON file per video. Writes go through a temporary file and an atomic
+    rename, so readers (and bulk recomputation) never see a partial report.
+    """
+    
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+    
+    def path_for(self, video_id: str) -> Path:
+        return self.directory / f"{video_id}.json"
+    
+    def save(self, video_id: str, report: RecipeAnalysisReport):
+        path = self.path_for(video_id)
+        temp_path = path.with_suffix(".json.tmp")
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(report.dict(), f, default=str)
+        os.replace(temp_path, path)
+    
+    def load(self, video_id: str) -> Optional[RecipeAnalysisReport]:
+        path = self.path_for(video_id)
+        if not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return validate_model(RecipeAnalysisReport, json.load(f))
+    
+    def video_ids(self) -> Iterator[str]:
+        """Stored video IDs in a stable order"""
+        return iter(sorted(path.stem for path in self.directory.glob("*.json")))
+
+_report_store: Optional[ReportStore] = None
+
+def get_report_store() -> ReportStore:
+    """Process-wide report store"""
+    global _report_store
+    if _report_store is None:
+        _report_store = ReportStore(Path(settings.OUTPUT_DIR) / "reports")
+    return _report_store
@@ -0,0 +1,97 @@
+"""
+KalaKitchen Single-Flight - Coalesces concurrent identical requests into one in-flight call
+"""
+import asyncio
+from typing import Dict, Any, Awaitable, Callable, Optional
+
+class SingleFlight:
+    """
+    Concurrent callers using the same key share one in-flight future: the
+    first caller (the leader) does the work, the others await its result.
+    Keys are forgotten as soon as the call completes, so this only removes
+    duplicate concurrent work - it is not a cache.
+    """
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run fn once for all concurrent callers with the same key"""
+        while True:
+            waiting = self.join(key)
+            if waiting is None:
+                break
+            try:
+                return await asyncio.shield(waiting)
+            except asyncio.CancelledError:
+                # The leader was cancelled, not us: take over the call
+                if waiting.cancelled():
+                    continue
+                raise
+        
+        self.lead(key)
+        try:
+            result = await fn()
+        except BaseException as e:
+            self.fail(key, e)
+            raise
+        self.finish(key, result)
+        return result
+    
+    def join(self, key: str) -> Optional[asyncio.Future]:
+        """Return the in-flight future for key, or None if the caller must lead"""
+        future = self._inflight.get(key)
+        if future is None:
+            return None
+        self.calls += 1
+        self.coalesced += 1
+        return future
+    
+    def lead(self, key: str) -> asyncio.Future:
+        """Register the caller as leader for key"""
+        self.calls += 1
+        self.executed += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        return future
+    
+    def finish(self, key: str, result: Any):
+        """Resolve the in-flight call for key with a result"""
+        future = self._inflight.pop(key, None)
+        if future is not None and not future.done():
+            future.set_result(result)
+    
+    def fail(self, key: str, error: BaseException):
+        """Resolve the in-flight call for key with an error"""
+        future = self._inflight.pop(key, None)
+        if future is None or future.done():
+            return
+        if isinstance(error, asyncio.CancelledError):
+            future.cancel()
+        else:
+            future.set_exception(error)
+            # Avoid "exception was never retrieved" when nobody was waiting
+            future.exception()
+    
+    def abandon(self, key: str, future: asyncio.Future):
+        """
+        Release the callers waiting on a leader that gave up without a
+        result; they see the future cancelled and take over the call.
+        Does nothing once the call has completed.
+        """
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.done():
+            future.cancel()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Calls seen, calls actually executed and calls saved by coalescing"""
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+        }
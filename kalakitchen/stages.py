@@ -0,0 +1,122 @@
+"""
+KalaKitchen Stage Graph - Runs pipeline stages as a dependency graph, overlapping independent stages
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Type
+from pydantic import BaseModel
+
+class Stage:
+    """
+    One pipeline step. run receives the outputs of the stages it depends on,
+    keyed by stage name, and returns its own output. weight is the share of
+    overall progress credited when the stage completes; label describes the
+    stage in status updates while it runs. artifact is the model type of the
+    output (a list of them when many is set) for checkpointing; stages
+    without one are always run.
+    """
+    
+    def __init__(self,
+                 name: str,
+                 run: Callable[[Dict[str, Any]], Awaitable[Any]],
+                 depends_on: Sequence[str] = (),
+                 weight: float = 1.0,
+                 label: Optional[str] = None,
+                 artifact: Optional[Type[BaseModel]] = None,
+                 many: bool = False):
+        self.name = name
+        self.run = run
+        self.depends_on = tuple(depends_on)
+        self.weight = weight
+        self.label = label or name
+        self.artifact = artifact
+        self.many = many
+
+class StageGraph:
+    """
+    Stages and their dependencies. run() starts every stage as soon as all
+    of its dependencies have completed, so independent stages run
+    concurrently. Progress is the completed share of the total stage
+    weight. The first stage to fail cancels the ones still running and its
+    error is raised.
+    """
+    
+    def __init__(self, stages: Sequence[Stage]):
+        self.stages: Dict[str, Stage] = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage: {stage.name}")
+            self.stages[stage.name] = stage
+        self.order = self._topological_order()
+    
+    def _topological_order(self) -> List[str]:
+        """Stage names with every stage after its dependencies"""
+        order: List[str] = []
+        pending = list(self.stages.values())
+        while pending:
+            ready = [stage for stage in pending if all(dep in order for dep in stage.depends_on)]
+            if not ready:
+                raise ValueError(
+                    f"Stages with unknown or circular dependencies: {[stage.name for stage in pending]}"
+                )
+            order.extend(stage.name for stage in ready)
+            pending = [stage for stage in pending if stage.name not in order]
+        return order
+    
+    async def run(self,
+                  on_progress: Optional[Callable[[int, str], None]] = None,
+                  completed: Optional[Dict[str, Any]] = None,
+                  on_complete: Optional[Callable[[Stage, Any], Awaitable[None]]] = None) -> Dict[str, Any]:
+        """
+        Run all stages and return their outputs by stage name. Stages in
+        completed (outputs restored from checkpoints) are not run again and
+        count as done. on_complete is called with each stage and its output
+        as the stage finishes and runs in the background, so dependent stages
+        start without waiting for it; run returns (or raises) only once every
+        on_complete call has finished.
+        """
+        outputs: Dict[str, Any] = {
+            name: output for name, output in (completed or {}).items() if name in self.stages
+        }
+        running: Dict[asyncio.Task, Stage] = {}
+        total_weight = sum(stage.weight for stage in self.stages.values()) or 1.0
+        done_weight = sum(self.stages[name].weight for name in outputs)
+        callbacks: List[asyncio.Future] = []
+        
+        try:
+            while len(outputs) < len(self.stages):
+                started = set(running.values())
+                for name in self.order:
+                    stage = self.stages[name]
+                    if (name not in outputs and stage not in started
+                            and all(dep in outputs for dep in stage.depends_on)):
+                        inputs = {dep: outputs[dep] for dep in stage.depends_on}
+                        running[asyncio.create_task(stage.run(inputs))] = stage
+                
+                if on_progress:
+                    labels = [stage.label for stage in running.values()]
+                    on_progress(int(100 * done_weight / total_weight), ", ".join(labels) + "...")
+                
+                finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                # Record the stages that succeeded before raising a failure
+                failed = [task for task in finished if task.exception() is not None]
+                for task in finished:
+                    stage = running.pop(task)
+                    if task in failed:
+                        continue
+                    outputs[stage.name] = task.result()
+                    done_weight += stage.weight
+                    if on_complete:
+                        callbacks.append(asyncio.ensure_future(on_complete(stage, outputs[stage.name])))
+                if failed:
+                    raise failed[0].exception()
+            await asyncio.gather(*callbacks)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            # Stages that finished before a failure still get their callback
+            if callbacks:
+                await asyncio.gather(*callbacks, return_exceptions=True)
+        
+        return outputs
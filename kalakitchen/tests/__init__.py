@@ -0,0 +1,5 @@
+"""
+KalaKitchen Tests - run offline against the replay backend:
+
+    python -m pytest -q kalakitchen/tests
+"""
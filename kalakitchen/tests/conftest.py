@@ -0,0 +1,42 @@
+"""
+Test settings: replay backend, no response cache and all stores under a
+temporary directory, set before kalakitchen.config is first imported.
+"""
+import os
+import tempfile
+
+_TEST_DIR = tempfile.mkdtemp(prefix="kalakitchen-tests-")
+
+os.environ.setdefault("LLM_BACKEND", "replay")
+os.environ.setdefault("LLM_CASSETTE_PATH", os.path.join(_TEST_DIR, "cassette.jsonl"))
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+os.environ.setdefault("ENRICHMENT_STORE_ENABLED", "false")
+os.environ.setdefault("CANONICAL_EMBEDDINGS_ENABLED", "false")
+os.environ.setdefault("OUTPUT_DIR", os.path.join(_TEST_DIR, "outputs"))
+os.environ.setdefault("USDA_SNAPSHOT_PATH", os.path.join(_TEST_DIR, "usda.sqlite3"))
+
+import pytest
+from kalakitchen.config import settings
+from kalakitchen.llm.backends import Cassette, ReplayBackend, request_key
+from kalakitchen.llm.gateway import LLMGateway
+
+@pytest.fixture
+def cassette(tmp_path):
+    return Cassette(tmp_path / "cassette.jsonl")
+
+@pytest.fixture
+def record(cassette):
+    """Record a response for a request: record(contents, *chunks, **generation_options)"""
+    def add(contents, *chunks, usage=None, **kwargs):
+        cassette.add({
+            "key": request_key(settings.GEMINI_MODEL, contents, {}, kwargs),
+            "model": settings.GEMINI_MODEL,
+            "chunks": list(chunks),
+            "usage": usage
+        })
+    return add
+
+@pytest.fixture
+def replay_gateway(cassette):
+    """Gateway replaying the test cassette, without a response cache"""
+    return LLMGateway(backend=ReplayBackend(cassette))
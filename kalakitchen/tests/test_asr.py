@@ -0,0 +1,40 @@
+"""
+ASR transcription off the event loop
+"""
+import asyncio
+import threading
+import time
+from pathlib import Path
+from kalakitchen.bots.asr import ASRBot
+
+class BlockingWhisper:
+    def __init__(self):
+        self.thread = None
+    
+    def transcribe(self, path, **kwargs):
+        self.thread = threading.current_thread()
+        time.sleep(0.2)
+        return {"segments": [{"start": 0.0, "end": 1.5, "text": " add salt ", "avg_logprob": 0.0}]}
+
+def test_whisper_runs_while_other_stages_progress():
+    # Skip loading a real model
+    bot = ASRBot.__new__(ASRBot)
+    bot.whisper_model = BlockingWhisper()
+    ticks = []
+    
+    async def ticker():
+        while True:
+            ticks.append(time.monotonic())
+            await asyncio.sleep(0.01)
+    
+    async def main():
+        task = asyncio.create_task(ticker())
+        segments = await bot._transcribe_with_whisper(Path("audio.wav"))
+        task.cancel()
+        return segments
+    
+    segments = asyncio.run(main())
+    
+    assert [(s.text, s.confidence) for s in segments] == [("add salt", 100.0)]
+    assert bot.whisper_model.thread is not threading.main_thread()
+    assert len(ticks) > 5
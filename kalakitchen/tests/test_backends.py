@@ -0,0 +1,108 @@
+"""
+Record/replay cassettes standing in for Gemini
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from google.api_core import exceptions as google_exceptions
+from kalakitchen.config import settings
+from kalakitchen.llm.backends import (
+    Cassette, CassetteMissError, RecordingBackend, ReplayBackend, ReplayResponse, create_backend
+)
+
+class LiveStandIn:
+    """Answers like the SDK would, uploading files under random-looking names"""
+    
+    def __init__(self):
+        self.uploads = 0
+    
+    def upload(self, path):
+        self.uploads += 1
+        return SimpleNamespace(name=f"files/upload-{self.uploads}")
+    
+    async def generate(self, model_name, contents, stream=False, **kwargs):
+        usage = {"prompt_token_count": 10, "candidates_token_count": 2, "total_token_count": 12}
+        if not stream:
+            return ReplayResponse("whole answer", usage)
+        
+        async def chunks():
+            yield ReplayResponse("part one, ")
+            yield ReplayResponse("part two", usage)
+        
+        return chunks()
+
+def test_recorded_responses_replay_from_disk(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    recorder = RecordingBackend(LiveStandIn(), Cassette(path))
+    
+    async def record():
+        await recorder.generate("m", "question", temperature=0)
+        stream = await recorder.generate("m", "question", stream=True)
+        return [chunk.text async for chunk in stream]
+    
+    assert asyncio.run(record()) == ["part one, ", "part two"]
+    
+    replay = ReplayBackend(Cassette(path))
+    
+    async def replayed():
+        whole = await replay.generate("m", "question", temperature=0)
+        stream = await replay.generate("m", "question", stream=True)
+        return whole, [chunk async for chunk in stream]
+    
+    whole, chunks = asyncio.run(replayed())
+    
+    assert whole.text == "whole answer"
+    assert whole.usage_metadata.total_token_count == 12
+    assert [chunk.text for chunk in chunks] == ["part one, ", "part two"]
+    assert chunks[-1].usage_metadata.candidates_token_count == 2
+    assert chunks[0].usage_metadata is None
+
+def test_files_replay_by_content_hash_not_upload_name(tmp_path):
+    frame = tmp_path / "frame.jpg"
+    frame.write_bytes(b"jpeg bytes")
+    cassette = Cassette(tmp_path / "cassette.jsonl")
+    recorder = RecordingBackend(LiveStandIn(), cassette)
+    
+    async def record():
+        uploaded = recorder.upload(frame)
+        await recorder.generate("m", ["describe", uploaded])
+    
+    asyncio.run(record())
+    replay = ReplayBackend(cassette)
+    
+    response = asyncio.run(replay.generate("m", ["describe", replay.upload(frame)]))
+    
+    assert response.text == "whole answer"
+
+def test_unrecorded_request_is_a_miss(cassette):
+    replay = ReplayBackend(cassette)
+    
+    with pytest.raises(CassetteMissError):
+        asyncio.run(replay.generate("m", "question"))
+    
+    assert replay.misses == 1
+
+def test_injected_errors_are_deterministic_for_a_seed(cassette, record):
+    record("question", "answer")
+    
+    def outcomes(seed):
+        replay = ReplayBackend(cassette, error_rate=0.5, seed=seed)
+        results = []
+        for _ in range(20):
+            try:
+                asyncio.run(replay.generate(settings.GEMINI_MODEL, "question"))
+                results.append(True)
+            except google_exceptions.ServiceUnavailable:
+                results.append(False)
+        return results
+    
+    assert outcomes(3) == outcomes(3)
+    assert True in outcomes(3) and False in outcomes(3)
+
+def test_backend_is_selected_by_setting(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_BACKEND", "replay")
+    assert isinstance(create_backend(), ReplayBackend)
+    
+    monkeypatch.setattr(settings, "LLM_BACKEND", "unknown")
+    with pytest.raises(ValueError):
+        create_backend()
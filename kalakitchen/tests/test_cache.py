@@ -0,0 +1,67 @@
+"""
+Response cache, file hash memo and cached gateway calls
+"""
+import asyncio
+import os
+from kalakitchen.config import settings
+from kalakitchen.llm import cache as cache_module
+from kalakitchen.llm.backends import ReplayBackend
+from kalakitchen.llm.cache import CachedResponse, ResponseCache, cache_key, file_hash
+from kalakitchen.llm.gateway import LLMGateway
+
+def test_file_hash_is_memoized_until_the_file_changes(tmp_path):
+    path = tmp_path / "frame.jpg"
+    path.write_bytes(b"aaaa")
+    first = file_hash(path)
+    stat = path.stat()
+    
+    # Same size and modification time: the memoized hash is reused
+    path.write_bytes(b"bbbb")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert file_hash(path) == first
+    
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert file_hash(path) != first
+
+def test_file_hash_memo_is_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "FILE_HASH_MEMO_SIZE", 2)
+    for i in range(5):
+        path = tmp_path / f"{i}.bin"
+        path.write_bytes(bytes([i]))
+        file_hash(path)
+    
+    assert len(cache_module._file_hashes) <= 2
+
+def test_cache_key_ignores_whitespace_and_stream_flag():
+    assert cache_key("m", "add  salt\n", stream=True) == cache_key("m", "add salt")
+    assert cache_key("m", "add salt", temperature=0) != cache_key("m", "add salt")
+
+def test_response_cache_expires_and_evicts(tmp_path):
+    cache = ResponseCache(tmp_path / "cache.sqlite3", ttl_seconds=0, max_bytes=10)
+    cache.set("a", "hello")
+    assert cache.get("a") is None
+    
+    cache = ResponseCache(tmp_path / "lru.sqlite3", ttl_seconds=3600, max_bytes=10)
+    cache.set("a", "aaaaa")
+    cache.set("b", "bbbbb")
+    cache.get("a")
+    cache.set("c", "ccccc")
+    assert cache.get("a") == "aaaaa"
+    assert cache.get("b") is None
+
+def test_gateway_serves_repeated_calls_from_cache(tmp_path, cassette, record, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_ENABLED", True)
+    record("what is dal?", "lentils")
+    gateway = LLMGateway(backend=ReplayBackend(cassette), cache=ResponseCache(tmp_path / "cache.sqlite3"))
+    
+    async def run():
+        first = await gateway.generate("what is dal?", bot="test")
+        second = await gateway.generate("what  is dal?", bot="test")
+        return first, second
+    
+    first, second = asyncio.run(run())
+    
+    assert first.text == second.text == "lentils"
+    assert isinstance(second, CachedResponse)
+    assert gateway.backend.misses == 0
+    assert gateway.telemetry.calls == {("test", "miss"): 1, ("test", "cache_hit"): 1}
@@ -0,0 +1,111 @@
+"""
+Ingredient name canonicalization through the synonym trie and string similarity
+"""
+import numpy as np
+import pytest
+from kalakitchen.evidence import tokenize
+from kalakitchen.models import Ingredient
+from kalakitchen.reference.canonical import Canonicalizer, canonical_id
+
+@pytest.fixture(scope="module")
+def canonicalizer():
+    return Canonicalizer(embeddings=False)
+
+def _ids(canonicalizer, names):
+    return [match.canonical_id for match in canonicalizer.resolve_many(names)]
+
+def test_ids_keep_the_canonical_spelling():
+    assert canonical_id("All-purpose flour") == "all_purpose_flour"
+    assert canonical_id("Dried fenugreek leaves") == "dried_fenugreek_leaves"
+
+def test_irregular_plurals_fold_to_the_singular():
+    assert tokenize("curry leaves") == tokenize("curry leaf")
+    assert tokenize("curry leaves")[-1] == "leaf"
+    assert tokenize("cloves") == ["clove"]
+
+def test_synonyms_in_any_language_share_an_id(canonicalizer):
+    assert _ids(canonicalizer, ["haldi", "Turmeric Powder", "manjal"]) == ["turmeric"] * 3
+    assert _ids(canonicalizer, ["kasuri methi", "dried fenugreek leaves"]) == ["dried_fenugreek_leaves"] * 2
+
+def test_preparation_words_around_a_known_name_are_ignored(canonicalizer):
+    names = ["finely chopped haldi", "large onions", "fresh garlic, minced"]
+    
+    assert _ids(canonicalizer, names) == ["turmeric", "onion", "garlic"]
+
+@pytest.mark.parametrize("name,contained", [
+    ("chicken stock", "chicken"),
+    ("garlic powder", "garlic"),
+    ("onion powder", "onion"),
+    ("peanut oil", "peanuts"),
+    ("rice water", "rice"),
+    ("brown sugar", "sugar"),
+    ("sugar syrup", "sugar"),
+    ("salted butter", "butter"),
+])
+def test_compounds_do_not_collapse_onto_a_word_they_contain(canonicalizer, name, contained):
+    match = canonicalizer.resolve(name)
+    
+    assert match.canonical_id != canonical_id(contained)
+
+def test_unknown_names_fall_back_to_fuzzy_then_their_own_id(canonicalizer):
+    tumeric = canonicalizer.resolve("tumeric")
+    unknown = canonicalizer.resolve("Chicken Stock")
+    
+    assert (tumeric.canonical_id, tumeric.method) == ("turmeric", "fuzzy")
+    assert (unknown.canonical_id, unknown.method) == ("chicken_stock", "unresolved")
+
+def test_canonicalize_ingredients_sets_ids(canonicalizer):
+    ingredients = [Ingredient(name="jeera", original_text="1 tsp jeera")]
+    
+    assert canonicalizer.canonicalize_ingredients(ingredients)[0].canonical_id == "cumin_seeds"
+
+class BagOfWordsModel:
+    """
+    Stands in for the sentence-transformers model: word-count vectors, with
+    form words weighted low so "garlic paste" lands near "garlic" as it does
+    with a real multilingual model
+    """
+    
+    WEIGHTS = {"paste": 0.35, "stock": 0.35, "puree": 0.35}
+    SPELLINGS = {"garlik": "garlic", "chiken": "chicken"}
+    
+    def __init__(self):
+        self.vocabulary = {}
+    
+    def encode(self, texts, normalize_embeddings=True, batch_size=32):
+        rows = []
+        for text in texts:
+            weights = {}
+            for word in text.split():
+                word = self.SPELLINGS.get(word, word)
+                weights[word] = weights.get(word, 0.0) + self.WEIGHTS.get(word, 1.0)
+            rows.append(weights)
+        for weights in rows:
+            for word in weights:
+                self.vocabulary.setdefault(word, len(self.vocabulary))
+        
+        # Wide enough for the words of later calls, which share the vocabulary
+        vectors = np.zeros((len(texts), 4096))
+        for vector, weights in zip(vectors, rows):
+            for word, weight in weights.items():
+                vector[self.vocabulary[word]] = weight
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+@pytest.fixture
+def embedding_canonicalizer():
+    canonicalizer = Canonicalizer(embeddings=True)
+    canonicalizer._model = BagOfWordsModel()
+    return canonicalizer
+
+def test_embeddings_match_spellings_the_dictionary_misses(embedding_canonicalizer):
+    match = embedding_canonicalizer.resolve("garlik")
+    
+    assert (match.canonical_id, match.method) == ("garlic", "embedding")
+
+def test_embeddings_do_not_collapse_compounds_onto_a_word_they_contain(embedding_canonicalizer):
+    names = ["garlic", "garlic paste", "chicken stock", "chiken"]
+    
+    matches = embedding_canonicalizer.resolve_many(names)
+    
+    assert [match.canonical_id for match in matches] == ["garlic", "garlic_paste", "chicken_stock", "chicken"]
+    assert [match.method for match in matches] == ["synonym", "unresolved", "unresolved", "embedding"]
@@ -0,0 +1,144 @@
+"""
+Stage checkpoints and resuming a failed job
+"""
+import asyncio
+from types import SimpleNamespace
+import pytest
+from kalakitchen import workflow as workflow_module
+from kalakitchen.checkpoint_store import CheckpointStore
+from kalakitchen.config import settings
+from kalakitchen.models import Ingredient, QuantityResolutionStats, TranscriptSegment, VideoMetadata
+from kalakitchen.stages import Stage, StageGraph
+from kalakitchen.workflow import KalaKitchenWorkflow
+
+METADATA = VideoMetadata(filename="dal.mp4", duration_seconds=120, fps=30, resolution="1280x720")
+TRANSCRIPT = [TranscriptSegment(start=0, end=2, text="add a cup of lentils", confidence=90)]
+INGREDIENTS = [Ingredient(name="lentils", original_text="a cup of lentils", quantity=1, unit="cup")]
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = CheckpointStore(tmp_path)
+    monkeypatch.setattr(workflow_module, "get_checkpoint_store", lambda: store)
+    monkeypatch.setattr(settings, "CHECKPOINTS_ENABLED", True)
+    monkeypatch.setattr(settings, "REPORT_STORE_ENABLED", False)
+    return store
+
+@pytest.fixture
+def workflow(replay_gateway):
+    # Skip the bots (Whisper loads a model); the tests supply their own stages
+    workflow = KalaKitchenWorkflow.__new__(KalaKitchenWorkflow)
+    workflow.gateway = replay_gateway
+    workflow.video_ingest = SimpleNamespace(cleanup_temp_files=lambda video_id: None)
+    workflow.processing_status = {}
+    return workflow
+
+def test_store_round_trip(store):
+    store.save_job("v1", METADATA, True)
+    store.save("v1", "transcript", TRANSCRIPT)
+    store.save("v1", "stats", QuantityResolutionStats(ingredients=3, fast_path=2))
+    
+    assert store.load_job("v1") == (METADATA, True)
+    assert store.load("v1", "transcript", TranscriptSegment, many=True) == TRANSCRIPT
+    assert store.load("v1", "stats", QuantityResolutionStats).fast_path == 2
+    assert store.load("v1", "claims", Ingredient) is None
+    
+    store.clear("v1")
+    assert store.load_job("v1") is None
+
+def test_only_checkpoints_with_restored_dependencies_are_loaded(store, workflow):
+    graph = workflow._analysis_stages("v1", METADATA, 0.0, True)
+    store.save("v1", "transcript", TRANSCRIPT)
+    # Left over without the claims it was resolved from
+    store.save("v1", "quantities", INGREDIENTS)
+    
+    assert workflow._load_checkpoints("v1", graph) == {"transcript": TRANSCRIPT}
+
+def test_resume_skips_checkpointed_stages_and_restores_their_stats(store, workflow, monkeypatch):
+    runs = []
+    
+    def stages(video_id, metadata, start_time, fast_report):
+        async def resolve(inputs):
+            runs.append("quantities")
+            workflow.processing_status[video_id].quantity_resolution = QuantityResolutionStats(
+                ingredients=1, fast_path=1, fast_path_fraction=1.0
+            )
+            return INGREDIENTS
+        
+        async def report(inputs):
+            runs.append("report")
+            if runs.count("report") == 1:
+                raise RuntimeError("report model unavailable")
+            return SimpleNamespace(ingredients=inputs["quantities"])
+        
+        return StageGraph([
+            Stage("quantities", resolve, artifact=Ingredient, many=True),
+            Stage("report", report, ["quantities"]),
+        ])
+    
+    monkeypatch.setattr(workflow, "_analysis_stages", stages)
+    store.save_job("v1", METADATA, False)
+    
+    async def main():
+        workflow.processing_status["v1"] = workflow_module.ProcessingStatus(
+            video_id="v1", status="processing", progress=0, current_stage="", started_at=METADATA.upload_time
+        )
+        await workflow._run_analysis_pipeline("v1", METADATA, 0.0)
+        failed = workflow.get_status("v1")
+        
+        await workflow.resume_analysis("v1")
+        while workflow.get_status("v1").status == "processing":
+            await asyncio.sleep(0.01)
+        return failed
+    
+    failed = asyncio.run(main())
+    
+    assert failed.status == "failed"
+    status = workflow.get_status("v1")
+    assert status.status == "completed"
+    assert runs == ["quantities", "report", "report"]
+    assert status.completed_stages == ["quantities", "report"]
+    assert status.quantity_resolution == QuantityResolutionStats(ingredients=1, fast_path=1, fast_path_fraction=1.0)
+    assert status.result.ingredients == INGREDIENTS
+    # Cleared once the job is done
+    assert store.load_job("v1") is None
+
+def test_concurrent_resumes_start_the_job_once(store, workflow, monkeypatch):
+    runs = []
+    
+    def stages(video_id, metadata, start_time, fast_report):
+        async def report(inputs):
+            runs.append("report")
+            return SimpleNamespace(ingredients=[])
+        
+        return StageGraph([Stage("report", report)])
+    
+    monkeypatch.setattr(workflow, "_analysis_stages", stages)
+    store.save_job("v1", METADATA, False)
+    
+    async def main():
+        results = await asyncio.gather(
+            workflow.resume_analysis("v1"), workflow.resume_analysis("v1"), return_exceptions=True
+        )
+        while workflow.get_status("v1").status == "processing":
+            await asyncio.sleep(0.01)
+        return results
+    
+    first, second = asyncio.run(main())
+    
+    assert first == "v1"
+    assert isinstance(second, ValueError)
+    assert runs == ["report"]
+    assert workflow.get_status("v1").status == "completed"
+
+def test_resume_without_checkpoint_keeps_the_previous_status(store, workflow):
+    failed = workflow_module.ProcessingStatus(
+        video_id="v1", status="failed", progress=40, current_stage="", started_at=METADATA.upload_time
+    )
+    workflow.processing_status["v1"] = failed
+    
+    for video_id in ("v1", "v2"):
+        with pytest.raises(KeyError):
+            asyncio.run(workflow.resume_analysis(video_id))
+    
+    assert workflow.get_status("v1") is failed
+    assert workflow.get_status("v2") is None
@@ -0,0 +1,96 @@
+"""
+Circuit breakers and the negative cache for enrichment sources
+"""
+from types import SimpleNamespace
+import pytest
+from kalakitchen import circuit
+from kalakitchen.circuit import CircuitBreaker, NegativeCache
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock for the circuit module"""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(circuit, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("usda", failure_threshold=3, reset_seconds=30)
+    
+    for _ in range(2):
+        breaker.record_failure()
+    breaker.record_success()
+    for _ in range(3):
+        assert breaker.allow()
+        breaker.record_failure()
+    
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow()
+    assert breaker.stats() == {"state": "open", "failures": 3, "skipped": 1, "retry_in_seconds": 30.0}
+
+def test_half_open_breaker_lets_one_probe_through(clock):
+    breaker = CircuitBreaker("usda", failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.value += 30
+    
+    assert breaker.allow()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow()
+    
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED and breaker.allow()
+
+def test_failed_probe_reopens_the_breaker(clock):
+    breaker = CircuitBreaker("gemini", failure_threshold=5, reset_seconds=30)
+    for _ in range(5):
+        breaker.record_failure()
+    clock.value += 30
+    assert breaker.allow()
+    
+    breaker.record_failure()
+    
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+def test_abandoned_probe_is_replaced(clock):
+    breaker = CircuitBreaker("usda", failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.value += 30
+    assert breaker.allow()
+    
+    clock.value += 30
+    
+    assert breaker.allow()
+
+def test_negative_cache_forgets_misses_after_ttl(clock):
+    misses = NegativeCache(ttl_seconds=600)
+    misses.add(("usda", "kasuri methi"))
+    
+    assert ("usda", "kasuri methi") in misses
+    assert ("gemini", "kasuri methi") not in misses
+    clock.value += 601
+    assert ("usda", "kasuri methi") not in misses
+    assert misses.stats() == {"entries": 0, "hits": 1}
+
+def test_full_negative_cache_drops_entries_expiring_first(clock):
+    misses = NegativeCache(ttl_seconds=600, max_entries=4)
+    for i in range(4):
+        misses.add(i)
+        clock.value += 1
+    
+    misses.add("new")
+    
+    assert 0 not in misses and 1 not in misses
+    assert 3 in misses and "new" in misses
+
+def test_full_negative_cache_prunes_expired_entries_before_live_ones(clock):
+    misses = NegativeCache(ttl_seconds=600, max_entries=4)
+    misses.add("old")
+    clock.value += 601
+    for i in range(3):
+        misses.add(i)
+    
+    misses.add("new")
+    
+    # Only the expired entry made room; no live entry was evicted
+    assert misses.stats()["entries"] == 4
+    assert all(key in misses for key in (0, 1, 2, "new"))
+    assert "old" not in misses
@@ -0,0 +1,71 @@
+"""
+Map-reduce claim merging across overlapping time windows
+"""
+from kalakitchen.bots.claim_extractor import ClaimExtractor
+from kalakitchen.models import TranscriptSegment
+
+def _segment(start: float, text: str) -> TranscriptSegment:
+    return TranscriptSegment(start=start, end=start + 5.0, text=text, confidence=90)
+
+def _window(start: float, end: float, segments):
+    return {"start": start, "end": end, "segments": segments, "keyframes": []}
+
+def _salt(text: str, quantity: float):
+    return {"name": "Salt", "original_text": text, "quantity": quantity, "unit": "tsp", "estimated": False}
+
+def test_mention_in_window_overlap_is_counted_once():
+    extractor = ClaimExtractor()
+    shared = _segment(178.0, "now add 2 tsp salt")
+    windows = [_window(0.0, 180.0, [shared]), _window(180.0, 360.0, [shared])]
+    partials = [
+        {"ingredients": [_salt("add 2 tsp salt", 2)], "steps": []},
+        {"ingredients": [_salt("add 2 tsp salt", 2)], "steps": []},
+    ]
+    
+    merged = extractor._reduce_window_claims(partials, windows)
+    
+    assert len(merged["ingredients"]) == 1
+    assert merged["ingredients"][0]["quantity"] == 2
+
+def test_separate_additions_are_summed():
+    extractor = ClaimExtractor()
+    windows = [
+        _window(0.0, 180.0, [_segment(20.0, "add 2 tsp salt")]),
+        _window(180.0, 360.0, [_segment(300.0, "one more tsp salt at the end")]),
+    ]
+    partials = [
+        {"ingredients": [_salt("add 2 tsp salt", 2)], "steps": []},
+        {"ingredients": [_salt("one more tsp salt", 1)], "steps": []},
+    ]
+    
+    merged = extractor._reduce_window_claims(partials, windows)
+    
+    assert merged["ingredients"][0]["quantity"] == 3
+
+def test_reworded_step_from_neighbouring_window_is_dropped():
+    extractor = ClaimExtractor()
+    windows = [_window(0.0, 180.0, []), _window(180.0, 360.0, [])]
+    partials = [
+        {"steps": [{"start": 176.0, "end": 185.0, "text": "Fry the onions until golden"}]},
+        {"steps": [
+            {"start": 178.0, "end": 186.0, "text": "Saute onions till they turn golden brown"},
+            {"start": 200.0, "end": 220.0, "text": "Add the tomatoes"},
+        ]},
+    ]
+    
+    merged = extractor._reduce_window_claims(partials, windows)
+    
+    assert [step["text"] for step in merged["steps"]] == [
+        "Fry the onions until golden", "Add the tomatoes"
+    ]
+
+def test_close_steps_within_one_window_are_kept():
+    extractor = ClaimExtractor()
+    partials = [{"steps": [
+        {"start": 10.0, "end": 12.0, "text": "Add cumin"},
+        {"start": 12.0, "end": 14.0, "text": "Add mustard seeds"},
+    ]}]
+    
+    merged = extractor._reduce_window_claims(partials, [_window(0.0, 180.0, [])])
+    
+    assert len(merged["steps"]) == 2
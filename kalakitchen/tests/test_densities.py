@@ -0,0 +1,57 @@
+"""
+Density and portion table lookups and gram conversions
+"""
+import pytest
+from kalakitchen.reference import densities
+from kalakitchen.reference.densities import DensityTable, canonical_unit, get_density_table
+
+@pytest.fixture(scope="module")
+def table():
+    return DensityTable.load()
+
+def test_unit_spellings_are_normalized():
+    assert canonical_unit(" Tablespoons ") == "tbsp"
+    assert canonical_unit("tsp.") == "tsp"
+    assert canonical_unit("bowls") == "katori"
+
+def test_names_resolve_by_alias_trailing_words_and_fuzzy_match(table):
+    onion = table.lookup("onion")
+    
+    assert table.lookup("Onions") == onion
+    assert table.lookup("pyaz") == onion
+    assert table.names[table.lookup("finely chopped red onion")] == "red onion"
+    assert table.names[table.lookup("granulatd sugar")] == "sugar"
+    assert table.lookup("xyzzy") is None
+
+def test_weights_convert_without_a_density(table):
+    assert table.to_grams(2, "kg", "anything") == 2000
+    assert table.to_grams(1, "tola", "ghee") == pytest.approx(11.66)
+
+def test_volumes_use_the_ingredient_density(table):
+    assert table.to_grams(1, "cup", "rice") == pytest.approx(185)
+    assert table.to_grams(2, "tsp", "salt") == pytest.approx(2 / 48 * 288)
+    # Unknown ingredients are assumed to weigh like water
+    assert table.to_grams(1, "cup", "xyzzy") == pytest.approx(240)
+
+def test_counts_use_portions(table):
+    assert table.to_grams(2, "medium", "onion") == 220
+    assert table.to_grams(1, "piece", "red onion") == 110
+    assert table.to_grams(3, "cloves", "garlic") == 9
+    assert table.to_grams(2, "sprig", "xyzzy") == 2
+    assert table.to_grams(1, "handful", "xyzzy") is None
+
+def test_added_rows_are_found_after_cached_misses():
+    table = DensityTable()
+    assert table.lookup("jaggery") is None
+    
+    table.add("jaggery", 220, ["gur"])
+    
+    assert table.to_grams(1, "cup", "gur") == 220
+
+def test_table_directory_setting_replaces_the_packaged_tables(tmp_path, monkeypatch):
+    (tmp_path / "densities.csv").write_text("name,aliases,grams_per_cup\nrice,,200\n")
+    (tmp_path / "portions.csv").write_text("name,unit,grams\n")
+    monkeypatch.setattr(densities.settings, "DENSITY_TABLE_DIR", str(tmp_path))
+    monkeypatch.setattr(densities, "_density_table", None)
+    
+    assert get_density_table().to_grams(1, "cup", "rice") == 200
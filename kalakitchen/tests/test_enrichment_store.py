@@ -0,0 +1,150 @@
+"""
+Persistent enrichment store: field TTLs, use counts, read-only access
+"""
+import asyncio
+import sqlite3
+import threading
+from types import SimpleNamespace
+import pytest
+from kalakitchen import enrichment_store
+from kalakitchen.bots import web_enricher
+from kalakitchen.circuit import NegativeCache
+from kalakitchen.bots.web_enricher import WebEnricher
+from kalakitchen.models import Ingredient
+from kalakitchen.reference.canonical import Canonicalizer
+from kalakitchen.enrichment_store import CULINARY, MEDICINAL, NUTRITION, EnrichmentStore
+
+DAY = 24 * 3600
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(enrichment_store, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+@pytest.fixture
+def store(tmp_path, clock):
+    return EnrichmentStore(tmp_path / "enrichment.sqlite3", ttls={NUTRITION: 30 * DAY, MEDICINAL: DAY})
+
+def _uses(store):
+    with sqlite3.connect(str(store.path)) as conn:
+        return dict(conn.execute("SELECT name || '/' || field, uses FROM enrichment"))
+
+def test_values_are_kept_per_ingredient_and_field(store):
+    store.set("onion", NUTRITION, {"calories": 40})
+    
+    assert store.get("onion", NUTRITION) == {"calories": 40}
+    assert store.get("onion", MEDICINAL) is None
+    assert store.stats() == {"hits": 1, "misses": 1, "in_memory": 1}
+
+def test_each_field_expires_on_its_own_ttl(store, clock):
+    store.set("turmeric", NUTRITION, {"calories": 312})
+    store.set("turmeric", MEDICINAL, [{"claim": "anti-inflammatory"}])
+    store.set("turmeric", CULINARY, {"uses": ["curry"]})
+    
+    clock.now += 2 * DAY
+    
+    assert store.get("turmeric", MEDICINAL) is None
+    assert store.get("turmeric", NUTRITION) == {"calories": 312}
+    # No TTL configured for culinary info: it never expires
+    clock.now += 365 * DAY
+    assert store.get("turmeric", CULINARY) == {"uses": ["curry"]}
+    assert store.get("turmeric", NUTRITION) is None
+
+def test_expired_entries_are_not_warmed(tmp_path, store, clock):
+    store.set("ghee", NUTRITION, {"calories": 900})
+    store.set("ghee", MEDICINAL, [])
+    clock.now += 2 * DAY
+    
+    reopened = EnrichmentStore(store.path, ttls=store.ttls)
+    
+    assert reopened.warm() == 1
+    assert reopened.get("ghee", MEDICINAL) is None
+
+def test_use_counts_are_written_in_batches(store, monkeypatch):
+    monkeypatch.setattr(store, "USE_FLUSH_THRESHOLD", 2)
+    store.set("salt", NUTRITION, {"calories": 0})
+    store.set("ghee", NUTRITION, {"calories": 900})
+    
+    store.get("salt", NUTRITION)
+    store.get("salt", NUTRITION)
+    assert _uses(store) == {"salt/nutrition": 0, "ghee/nutrition": 0}
+    
+    # The second distinct key reaches the threshold
+    store.get("ghee", NUTRITION)
+    assert _uses(store) == {"salt/nutrition": 2, "ghee/nutrition": 1}
+    
+    store.get("ghee", NUTRITION)
+    store.flush()
+    assert _uses(store) == {"salt/nutrition": 2, "ghee/nutrition": 2}
+
+def test_warm_loads_the_most_used_entries_first(store):
+    for name in ("salt", "ghee", "cumin"):
+        store.set(name, NUTRITION, {"calories": 1})
+    for _ in range(3):
+        store.get("cumin", NUTRITION)
+    store.get("ghee", NUTRITION)
+    store.flush()
+    
+    reopened = EnrichmentStore(store.path, ttls=store.ttls)
+    
+    assert reopened.warm(limit=2) == 2
+    assert set(reopened._memory) == {("cumin", NUTRITION), ("ghee", NUTRITION)}
+
+def test_read_only_readers_leave_the_store_untouched(store):
+    store.set("cumin", NUTRITION, {"calories": 375})
+    reader = EnrichmentStore(store.path, ttls=store.ttls, read_only=True)
+    
+    assert reader.get("cumin", NUTRITION) == {"calories": 375}
+    reader.flush()
+    
+    assert _uses(store) == {"cumin/nutrition": 0}
+    with pytest.raises(sqlite3.OperationalError):
+        reader.set("cumin", NUTRITION, {"calories": 1})
+
+def test_returned_values_are_copies(store):
+    store.set("onion", CULINARY, {"uses": ["curry"]})
+    
+    store.get("onion", CULINARY)["uses"].append("salad")
+    
+    assert store.get("onion", CULINARY) == {"uses": ["curry"]}
+
+def test_enrichment_reads_and_writes_the_store_off_the_event_loop(replay_gateway, store, monkeypatch):
+    threads = []
+    for method in ("get", "set"):
+        original = getattr(store, method)
+        
+        def recording(*args, original=original):
+            threads.append(threading.current_thread())
+            return original(*args)
+        monkeypatch.setattr(store, method, recording)
+    
+    enricher = WebEnricher(replay_gateway, store=store)
+    store.set("onion", NUTRITION, {"calories": 40})
+    threads.clear()
+    
+    nutrition = asyncio.run(enricher._get_nutrition_data("onion", "onion"))
+    enrichment = asyncio.run(enricher._local_enrichment("onion", "onion"))
+    
+    assert nutrition.calories == 40 and enrichment[NUTRITION].calories == 40
+    assert len(threads) == 4
+    assert threading.main_thread() not in threads
+
+def test_enrichment_is_stored_under_the_canonical_id(replay_gateway, store, monkeypatch):
+    monkeypatch.setattr(web_enricher, "ENRICHMENT_MISSES", NegativeCache(60))
+    canonicalizer = Canonicalizer(embeddings=False)
+    store.set("turmeric", NUTRITION, {"calories": 312})
+    store.set("turmeric", CULINARY, {"uses": ["dal"]})
+    web_enricher.ENRICHMENT_MISSES.add(("turmeric", MEDICINAL))
+    # A later edit of the display name leaves the stored entries in place
+    canonicalizer.names["turmeric"] = "Turmeric root, ground"
+    enricher = WebEnricher(replay_gateway, store=store, canonicalizer=canonicalizer)
+    
+    ingredients = [Ingredient(name=name, original_text=name) for name in ("haldi", "turmeric powder")]
+    canonicalizer.canonicalize_ingredients(ingredients)
+    enriched = asyncio.run(enricher.enrich_ingredients(ingredients))
+    
+    # Everything came from the store or the miss cache: no Gemini request was made
+    assert replay_gateway.backend.misses == 0
+    assert [ingredient.nutrition_per_100g.calories for ingredient in enriched] == [312, 312]
+    assert [ingredient.uses for ingredient in enriched] == [["dal"], ["dal"]]
@@ -0,0 +1,73 @@
+"""
+Evidence index lookups over transcript segments, OCR lines and frame descriptions
+"""
+from kalakitchen.evidence import EvidenceIndex, parse_quantity, tokenize
+from kalakitchen.models import KeyframeData, TranscriptSegment
+
+def _index(texts, ocr=(), description=""):
+    transcript = [
+        TranscriptSegment(start=10.0 * i, end=10.0 * i + 5, text=text, confidence=90)
+        for i, text in enumerate(texts)
+    ]
+    keyframes = [KeyframeData(frame_id="f1", timestamp=30.0, description=description,
+                              ocr_text=list(ocr), objects_detected=[])]
+    return EvidenceIndex(transcript, keyframes)
+
+def test_plurals_fold_to_the_same_token():
+    assert tokenize("Onions and Tomatoes") == ["onion", "and", "tomato"]
+
+def test_ies_plurals_fold_onto_y_i_and_ie_singulars():
+    for plural, singular in [("chillies", "chilli"), ("berries", "berry"), ("curries", "curry"), ("cookies", "cookie")]:
+        assert tokenize(plural) == tokenize(singular)
+    # A vowel before the y is a plain plural
+    assert tokenize("turkeys") == tokenize("turkey") == ["turkey"]
+
+def test_ies_plurals_find_their_evidence():
+    index = _index(["add 2 tbsp green chillies", "1 cup of berries on top"])
+    
+    assert [item["quantity"] for item in index.transcript_evidence("green chilli")] == [2]
+    assert [item["unit"] for item in index.transcript_evidence("berry")] == ["cup"]
+
+def test_parse_quantity_handles_fractions_and_words():
+    assert parse_quantity("1/2") == 0.5
+    assert parse_quantity("half") == 0.5
+    assert parse_quantity("1/0") is None
+
+def test_transcript_evidence_finds_segments_naming_the_ingredient():
+    index = _index(["chop 2 medium onions", "now 1 tsp cumin seeds", "stir well"])
+    
+    cumin = index.transcript_evidence("Cumin Seeds")
+    
+    assert [(item["quantity"], item["unit"], item["timestamp"]) for item in cumin] == [(1.0, "tsp", 10.0)]
+    assert [item["quantity"] for item in index.transcript_evidence("onion")] == [2.0]
+    assert index.transcript_evidence("cardamom") == []
+
+def test_overlapping_patterns_yield_one_reading():
+    index = _index(["add 1/2 cup water"])
+    
+    assert [item["quantity"] for item in index.transcript_evidence("water")] == [0.5]
+
+def test_long_phrases_must_be_contiguous():
+    index = _index(["add 1 tsp kashmiri red chili powder", "red onion, 1 tsp chili and powder"])
+    
+    evidence = index.transcript_evidence("kashmiri red chili powder")
+    
+    assert [item["timestamp"] for item in evidence] == [0.0]
+
+def test_measurement_ocr_lines_count_for_every_ingredient():
+    index = _index([], ocr=["2 cups rice", "1/2 cup water"])
+    
+    rice = index.ocr_evidence("rice")
+    
+    assert [(item["quantity"], item["names_ingredient"]) for item in rice] == [(2.0, True), (0.5, False)]
+
+def test_visual_cues_are_indexed_by_description():
+    index = _index([], description="a handful of coriander leaves over the dal")
+    
+    assert [item["visual_cue"] for item in index.visual_evidence("coriander")] == ["handful"]
+
+def test_lookups_return_copies():
+    index = _index(["add 1 tsp salt"])
+    index.transcript_evidence("salt")[0]["quantity"] = 99
+    
+    assert index.transcript_evidence("salt")[0]["quantity"] == 1.0
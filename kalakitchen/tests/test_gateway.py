@@ -0,0 +1,86 @@
+"""
+Gateway rate limiting, concurrency, retries and deadlines over replayed responses
+"""
+import asyncio
+import time
+import pytest
+from google.api_core import exceptions as google_exceptions
+from kalakitchen.config import settings
+from kalakitchen.llm.backends import CassetteMissError, ReplayBackend
+from kalakitchen.llm.gateway import LLMGateway
+from kalakitchen.ratelimit import TokenBucket
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "LLM_RETRY_BASE_SECONDS", 0.001)
+    monkeypatch.setattr(settings, "LLM_RETRY_MAX_SECONDS", 0.001)
+
+def test_token_bucket_waits_for_refill():
+    bucket = TokenBucket(600, capacity=1)
+    
+    async def run():
+        started = time.monotonic()
+        await bucket.acquire(1)
+        await bucket.acquire(1)
+        return time.monotonic() - started
+    
+    assert 0.08 <= asyncio.run(run()) < 0.5
+
+def test_concurrency_limit_queues_calls(cassette, record, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_CONCURRENT_REQUESTS", 2)
+    for i in range(4):
+        record(f"prompt {i}", f"answer {i}")
+    gateway = LLMGateway(backend=ReplayBackend(cassette, latency_seconds=0.1))
+    
+    async def run():
+        started = time.monotonic()
+        responses = await asyncio.gather(*(gateway.generate(f"prompt {i}", bot="test") for i in range(4)))
+        return [response.text for response in responses], time.monotonic() - started
+    
+    texts, elapsed = asyncio.run(run())
+    
+    assert texts == [f"answer {i}" for i in range(4)]
+    assert elapsed >= 0.2
+
+def test_transient_error_is_retried(cassette, record):
+    record("prompt", "answer")
+    # Seed 9 fails the first attempt and passes the second at a 50% error rate
+    gateway = LLMGateway(backend=ReplayBackend(cassette, error_rate=0.5, seed=9))
+    
+    response = asyncio.run(gateway.generate("prompt", bot="test"))
+    
+    assert response.text == "answer"
+    assert gateway.telemetry.retries == {"test": 1}
+
+def test_retries_give_up_after_max_retries(cassette, record, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MAX_RETRIES", 2)
+    record("prompt", "answer")
+    gateway = LLMGateway(backend=ReplayBackend(cassette, error_rate=1.0))
+    
+    with pytest.raises(google_exceptions.ServiceUnavailable):
+        asyncio.run(gateway.generate("prompt", bot="test"))
+    
+    assert gateway.telemetry.retries == {"test": 2}
+    assert gateway.telemetry.calls == {("test", "error"): 1}
+
+def test_permanent_errors_are_not_retried(replay_gateway):
+    with pytest.raises(CassetteMissError):
+        asyncio.run(replay_gateway.generate("never recorded", bot="test"))
+    
+    assert replay_gateway.backend.misses == 1
+
+def test_deadline_bounds_the_call(cassette, record):
+    record("prompt", "answer")
+    gateway = LLMGateway(backend=ReplayBackend(cassette, latency_seconds=1.0))
+    
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(gateway.generate("prompt", bot="test", deadline=0.05))
+
+def test_streamed_chunks_are_passed_through(record, replay_gateway):
+    record("prompt", '{"a": ', '1}')
+    
+    async def run():
+        response = await replay_gateway.generate("prompt", bot="test", stream=True)
+        return [chunk.text async for chunk in response]
+    
+    assert asyncio.run(run()) == ['{"a": ', '1}']
@@ -0,0 +1,77 @@
+"""
+Shared HTTP session: reuse, limits and reopening after close
+"""
+import asyncio
+from aiohttp import web
+from kalakitchen.config import settings
+from kalakitchen.http_pool import HTTPClientPool
+
+async def _serve():
+    async def ping(request):
+        return web.Response(text="pong")
+    
+    app = web.Application()
+    app.router.add_get("/ping", ping)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/ping"
+
+def test_session_is_shared_and_uses_the_configured_limits(monkeypatch):
+    monkeypatch.setattr(settings, "HTTP_MAX_CONCURRENT_PER_HOST", 3)
+    
+    async def main():
+        pool = HTTPClientPool()
+        session = pool.session()
+        try:
+            return session, pool.session(), session.connector.limit_per_host
+        finally:
+            await pool.close()
+    
+    first, second, limit_per_host = asyncio.run(main())
+    
+    assert first is second
+    assert limit_per_host == 3
+
+def test_session_reopens_lazily_after_close():
+    async def main():
+        runner, url = await _serve()
+        pool = HTTPClientPool()
+        try:
+            first = pool.session()
+            async with first.get(url) as response:
+                assert await response.text() == "pong"
+            
+            await pool.close()
+            # Closing twice is harmless
+            await pool.close()
+            
+            second = pool.session()
+            async with second.get(url) as response:
+                text = await response.text()
+            return first, second, text
+        finally:
+            await pool.close()
+            await runner.cleanup()
+    
+    first, second, text = asyncio.run(main())
+    
+    assert first.closed
+    assert second is not first
+    assert text == "pong"
+
+def test_session_closed_elsewhere_is_replaced():
+    async def main():
+        pool = HTTPClientPool()
+        first = pool.session()
+        await first.close()
+        second = pool.session()
+        await pool.close()
+        return first, second
+    
+    first, second = asyncio.run(main())
+    
+    assert second is not first
+    assert second.closed
@@ -0,0 +1,82 @@
+"""
+Vectorized nutrition totals and Monte Carlo intervals
+"""
+import numpy as np
+import pytest
+from kalakitchen.benchmarks.nutrition_matrix import loop_totals, synthetic_catalog
+from kalakitchen.models import Ingredient, NutritionPer100g
+from kalakitchen.nutrition_matrix import NUTRIENTS, NutrientMatrix
+
+def _ingredient(grams, calories=100.0, **kwargs):
+    return Ingredient(
+        name="x", original_text="x", quantity_in_grams=grams,
+        nutrition_per_100g=NutritionPer100g(calories=calories), **kwargs
+    )
+
+def test_totals_match_the_per_field_loop():
+    catalog = synthetic_catalog(200, 10, seed=7)
+    
+    totals = NutrientMatrix.from_recipes(catalog).totals()
+    
+    expected = [[loop_totals(recipe)[nutrient] for nutrient in NUTRIENTS] for recipe in catalog]
+    np.testing.assert_allclose(totals, expected)
+
+def test_empty_recipes_and_missing_data_total_zero():
+    recipes = [[], [_ingredient(None)], [Ingredient(name="y", original_text="y", quantity_in_grams=50)], [_ingredient(250)]]
+    
+    totals = NutrientMatrix.from_recipes(recipes).totals()
+    
+    calories = NUTRIENTS.index("calories")
+    assert totals[:, calories].tolist() == [0.0, 0.0, 0.0, 250.0]
+
+def test_identical_nutrition_rows_are_shared():
+    matrix = NutrientMatrix.from_recipes([[_ingredient(10)], [_ingredient(20)], [_ingredient(30, calories=50)]])
+    
+    # The empty row plus two distinct foods
+    assert len(matrix.foods) == 3
+
+def test_intervals_match_a_per_recipe_percentile(monkeypatch):
+    catalog = synthetic_catalog(40, 10, seed=3) + [[]]
+    matrix = NutrientMatrix.from_recipes(catalog)
+    # Blocks of a few recipes, so block padding and boundaries are exercised
+    monkeypatch.setattr("kalakitchen.nutrition_matrix.INTERVAL_BLOCK_SIZE", 100 * 15 * 3)
+    
+    low, high = matrix.intervals(100, 0.9, seed=5)
+    
+    normals = np.random.default_rng(5).standard_normal((int(np.diff(matrix.offsets).max()), 100))
+    for r in range(len(catalog)):
+        start, end = matrix.offsets[r], matrix.offsets[r + 1]
+        sampled = np.exp(normals[:end - start] * matrix.spread[start:end, None]) * matrix.grams[start:end, None]
+        totals = (matrix.foods[matrix.food_index[start:end]] / 100.0).T @ sampled
+        expected = np.percentile(totals, [5, 95], axis=1) if end > start else np.zeros((2, len(NUTRIENTS)))
+        np.testing.assert_allclose(low[r], expected[0], atol=1e-9)
+        np.testing.assert_allclose(high[r], expected[1], atol=1e-9)
+
+def test_a_recipe_gets_the_same_interval_alone_or_in_a_batch():
+    catalog = synthetic_catalog(30, 10, seed=11)
+    
+    batch = NutrientMatrix.from_recipes(catalog).intervals(500, 0.9)
+    alone = NutrientMatrix.from_recipes(catalog[17:18]).intervals(500, 0.9)
+    
+    np.testing.assert_allclose(batch[0][17], alone[0][0])
+    np.testing.assert_allclose(batch[1][17], alone[1][0])
+
+def test_intervals_bracket_the_totals():
+    matrix = NutrientMatrix.from_recipes(synthetic_catalog(50, 10, seed=2))
+    
+    low, high = matrix.intervals(1000, 0.9)
+    
+    totals = matrix.totals()
+    assert (low <= totals + 1e-9).all() and (totals <= high + 1e-9).all()
+    assert (high[:, NUTRIENTS.index("calories")] > low[:, NUTRIENTS.index("calories")]).all()
+
+@pytest.mark.parametrize("draws", [0, 200])
+def test_intervals_collapse_without_spread_or_draws(draws):
+    matrix = NutrientMatrix.from_recipes([[_ingredient(100)]])
+    matrix.spread[:] = 0.0
+    
+    low, high = matrix.intervals(draws, 0.9)
+    
+    expected = matrix.totals() if draws else np.zeros_like(low)
+    np.testing.assert_allclose(low, expected)
+    np.testing.assert_allclose(high, expected)
@@ -0,0 +1,109 @@
+"""
+Deterministic quantity fast path: explicit, adjacent and confident readings skip Gemini
+"""
+import asyncio
+import math
+import pytest
+from kalakitchen.bots.asr import whisper_confidence
+from kalakitchen.bots.quantity_resolver import QuantityResolver
+from kalakitchen.config import settings
+from kalakitchen.evidence import OCR_CONFIDENCE, VISUAL_CONFIDENCE, EvidenceIndex, is_adjacent
+from kalakitchen.models import Ingredient, QuantityResolutionStats, TranscriptSegment
+
+def _segment(text: str, avg_logprob: float = -0.2) -> TranscriptSegment:
+    return TranscriptSegment(start=0.0, end=5.0, text=text, confidence=whisper_confidence(avg_logprob))
+
+def _resolve(replay_gateway, names, transcript):
+    stats = QuantityResolutionStats()
+    ingredients = [Ingredient(name=name, original_text=name) for name in names]
+    resolved = asyncio.run(QuantityResolver(replay_gateway).resolve_quantities(
+        ingredients, transcript, [], stats=stats
+    ))
+    return {ingredient.name: ingredient for ingredient in resolved}, stats
+
+def test_whisper_confidence_is_a_clamped_probability():
+    assert whisper_confidence(0.0) == 100.0
+    assert whisper_confidence(-0.2) == pytest.approx(100 * math.exp(-0.2))
+    assert whisper_confidence(-50.0) >= 0.0
+    assert whisper_confidence(0.5) == 100.0
+
+def test_clear_speech_and_ocr_clear_the_fast_path_threshold():
+    assert whisper_confidence(-0.3) >= settings.QUANTITY_FAST_PATH_MIN_CONFIDENCE
+    assert OCR_CONFIDENCE >= settings.QUANTITY_FAST_PATH_MIN_CONFIDENCE > VISUAL_CONFIDENCE
+
+def test_explicit_reading_skips_the_model(replay_gateway):
+    resolved, stats = _resolve(replay_gateway, ["salt"], [_segment("add 2 tsp salt to the pot")])
+    
+    assert replay_gateway.backend.misses == 0
+    assert stats.fast_path == 1 and stats.model == 0
+    assert (resolved["salt"].quantity, resolved["salt"].unit) == (2.0, "tsp")
+    assert resolved["salt"].estimation_method == "transcript_explicit"
+
+def test_quantity_next_to_another_ingredient_goes_to_the_model(replay_gateway):
+    resolved, stats = _resolve(
+        replay_gateway, ["salt", "water"], [_segment("add salt then pour 2 cups water")]
+    )
+    
+    # Water is read directly; salt is sent to Gemini (a cassette miss here)
+    assert stats.fast_path == 1
+    assert replay_gateway.backend.misses == 1
+    assert (resolved["water"].quantity, resolved["water"].unit) == (2.0, "cup")
+    # Without a model answer salt falls back to a typical amount, not the water's
+    assert resolved["salt"].estimation_method == "typical_recipe_amount"
+
+def test_mumbled_reading_goes_to_the_model(replay_gateway):
+    _, stats = _resolve(replay_gateway, ["salt"], [_segment("add 2 tsp salt", avg_logprob=-1.2)])
+    
+    assert stats.fast_path == 0
+    assert replay_gateway.backend.misses == 1
+
+def test_disagreeing_readings_go_to_the_model(replay_gateway):
+    _, stats = _resolve(
+        replay_gateway, ["salt"], [_segment("add 2 tsp salt"), _segment("actually 1 tsp salt is enough")]
+    )
+    
+    assert stats.fast_path == 0
+
+def test_adjacency_of_readings():
+    index = EvidenceIndex([
+        _segment("add salt then pour 2 cups water"),
+        _segment("1 tsp of salt"),
+        _segment("salt, 1 tsp"),
+        _segment("2 medium onions, chopped"),
+    ], [])
+    
+    salt = [(item["context"], item["adjacent"]) for item in index.transcript_evidence("salt")]
+    
+    assert salt == [
+        ("add salt then pour 2 cups water", False),
+        ("1 tsp of salt", True),
+        ("salt, 1 tsp", True),
+    ]
+    assert [item["adjacent"] for item in index.transcript_evidence("water")] == [True]
+    assert [item["adjacent"] for item in index.transcript_evidence("onion")] == [True]
+
+@pytest.mark.parametrize("name, text", [
+    ("lemon", "add 2 lemons"),
+    ("garlic", "crush 4 garlic cloves"),
+])
+def test_a_unit_letter_starting_the_ingredient_is_not_a_reading(replay_gateway, name, text):
+    resolved, stats = _resolve(replay_gateway, [name], [_segment(text)])
+    
+    # Not 2 l of lemons or 4 g of garlic; the count goes to Gemini (a cassette miss here)
+    assert stats.fast_path == 0
+    assert replay_gateway.backend.misses == 1
+    assert resolved[name].estimated
+    assert resolved[name].unit not in ("l", "g")
+
+def test_spelled_out_units_are_read_whole(replay_gateway):
+    resolved, stats = _resolve(replay_gateway, ["water"], [_segment("pour 1 litre water")])
+    
+    assert stats.fast_path == 1
+    assert (resolved["water"].quantity, resolved["water"].unit) == (1.0, "litre")
+    assert resolved["water"].quantity_in_grams == pytest.approx(1000, rel=0.05)
+
+def test_a_unit_running_into_the_ingredient_is_not_adjacent():
+    # "2 l|emons": the reading's last token is the ingredient itself
+    assert not is_adjacent((0, 2), [1], 1)
+    # "2 medium onions": a size word separates number and ingredient
+    assert is_adjacent((0, 3), [2], 1)
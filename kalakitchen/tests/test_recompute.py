@@ -0,0 +1,85 @@
+"""
+Bulk nutrition recompute: affected-only refresh, resume from the progress file
+and retry of reports that failed
+"""
+import pytest
+from kalakitchen.config import settings
+from kalakitchen.models import (
+    Ingredient, LearnerPack, NutritionSummary, RecipeAnalysisReport, RecipeTitle
+)
+from kalakitchen.recompute import recompute_reports
+from kalakitchen.report_store import ReportStore
+
+@pytest.fixture
+def reports(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "OUTPUT_DIR", str(tmp_path))
+    return ReportStore(tmp_path / "reports")
+
+def _ingredient(name, quantity, unit, grams):
+    return Ingredient(name=name, original_text=f"{quantity} {unit} {name}",
+                      quantity=quantity, unit=unit, quantity_in_grams=grams)
+
+def _report(*ingredients):
+    return RecipeAnalysisReport(
+        recipe_title=RecipeTitle(text="Dal", confidence=90, source="transcript"),
+        duration_seconds=60.0,
+        steps=[],
+        ingredients=list(ingredients),
+        tools=[],
+        nutrition_summary=NutritionSummary(),
+        authenticity_score=80,
+        completeness_score=80,
+        status="Review",
+        learner_pack=LearnerPack(bullets=[], quiz=[]),
+        human_summary_markdown="",
+    )
+
+def _grams(reports, video_id):
+    return {ingredient.name: ingredient.quantity_in_grams for ingredient in reports.load(video_id).ingredients}
+
+def _run(reports, **kwargs):
+    return recompute_reports(workers=1, chunk_size=1, reports=reports, **kwargs)
+
+def test_only_affected_ingredients_are_refreshed(reports):
+    # Stale grams: the density table gives 3 g per tsp of turmeric
+    reports.save("dal", _report(_ingredient("turmeric", 1, "tsp", 1.0), _ingredient("ghee", 1, "tbsp", 1.0)))
+    reports.save("halwa", _report(_ingredient("ghee", 1, "tbsp", 1.0)))
+    
+    assert _run(reports, ingredients=["turmeric"]) == (1, 1, 0)
+    assert _grams(reports, "dal") == {"turmeric": 3.0, "ghee": 1.0}
+    assert _grams(reports, "halwa") == {"ghee": 1.0}
+
+def test_rerun_resumes_from_the_progress_file(reports, tmp_path):
+    reports.save("dal", _report(_ingredient("turmeric", 1, "tsp", 1.0)))
+    reports.save("halwa", _report(_ingredient("ghee", 1, "tbsp", 1.0)))
+    
+    assert _run(reports) == (2, 0, 0)
+    assert (tmp_path / "recompute" / "nutrition.done").read_text().split() == ["dal", "halwa"]
+    
+    # Finished reports are skipped; a new report is picked up
+    reports.save("kheer", _report(_ingredient("turmeric", 1, "tsp", 1.0)))
+    assert _run(reports) == (1, 0, 0)
+    assert _run(reports) == (0, 0, 0)
+    
+    # Restarting processes everything again; grams are already current
+    assert _run(reports, restart=True) == (0, 3, 0)
+    # Progress is kept per job
+    assert _run(reports, job="other") == (0, 3, 0)
+
+def test_failed_reports_are_retried_on_the_next_run(reports, tmp_path):
+    reports.save("dal", _report(_ingredient("turmeric", 1, "tsp", 1.0)))
+    reports.path_for("broken").write_text("{not json")
+    
+    assert _run(reports) == (1, 0, 1)
+    assert (tmp_path / "recompute" / "nutrition.done").read_text().split() == ["dal"]
+    
+    reports.save("broken", _report(_ingredient("turmeric", 1, "tsp", 1.0)))
+    assert _run(reports) == (1, 0, 0)
+    assert _grams(reports, "broken") == {"turmeric": 3.0}
+
+def test_unknown_ingredients_are_rejected(reports, tmp_path):
+    reports.save("dal", _report(_ingredient("turmeric", 1, "tsp", 1.0)))
+    
+    with pytest.raises(ValueError, match="zzqxv"):
+        _run(reports, ingredients=["turmeric", "zzqxv"])
+    assert _grams(reports, "dal") == {"turmeric": 1.0}
@@ -0,0 +1,123 @@
+"""
+Report content from one structured Gemini call, with template fallbacks,
+and template-only fast reports
+"""
+import asyncio
+import json
+import pytest
+from kalakitchen.bots.report_generator import SUMMARY_HEADING, ReportGenerator
+from kalakitchen.llm.structured import gemini_schema
+from kalakitchen.models import CookingStep, Ingredient, NutritionSummary, RecipeTitle, ReportContent
+
+TITLE = RecipeTitle(text="Dal Tadka", confidence=90, source="transcript")
+STEPS = [CookingStep(index=0, start=0, end=10, text="Boil the lentils", confidence=90)]
+INGREDIENTS = [Ingredient(name="lentils", original_text="a cup of lentils", quantity=1, unit="cup")]
+NUTRITION = NutritionSummary(total_calories=680, servings=2)
+SCORES = (70, 80)
+
+QUESTION = {"question": "What is tempered?", "options": ["Cumin", "Rice"], "correct_answer": 0}
+
+class RaisingGateway:
+    """Raises on any model call and keeps the calls (callers may catch the error)"""
+    
+    def __init__(self):
+        self.calls = []
+    
+    def client(self, bot_name, model_name=None):
+        return self
+    
+    async def generate(self, *args, **kwargs):
+        self.calls.append(args)
+        raise AssertionError("unexpected gateway call")
+    
+    async def generate_content_async(self, *args, **kwargs):
+        self.calls.append(args)
+        raise AssertionError("unexpected gateway call")
+
+@pytest.fixture
+def generator(replay_gateway):
+    return ReportGenerator(replay_gateway)
+
+@pytest.fixture
+def respond(generator, record):
+    """Record the report content Gemini returns for the test recipe"""
+    def add(**content):
+        prompt = generator._content_prompt(TITLE, STEPS, INGREDIENTS, NUTRITION, *SCORES)
+        record(prompt, json.dumps(content), generation_config={
+            "response_mime_type": "application/json",
+            "response_schema": gemini_schema(ReportContent)
+        })
+    return add
+
+def _generate(generator):
+    return asyncio.run(generator._generate_content(TITLE, STEPS, INGREDIENTS, NUTRITION, *SCORES))
+
+def _template_pack(generator):
+    return generator._template_learner_pack(TITLE, STEPS, INGREDIENTS, NUTRITION)
+
+def _template_summary(generator):
+    return f"{SUMMARY_HEADING}\n\n" + generator._template_summary(TITLE, STEPS, INGREDIENTS, NUTRITION, *SCORES)
+
+def test_pack_and_summary_come_from_one_call(generator, respond, replay_gateway):
+    respond(
+        bullets=[f"point {i}" for i in range(8)],
+        quiz=[QUESTION, {**QUESTION, "question": "Out of range", "correct_answer": 2}],
+        difficulty_level="intermediate",
+        summary="  A comforting lentil dal.  "
+    )
+    
+    learner_pack, summary = _generate(generator)
+    
+    assert replay_gateway.backend.misses == 0
+    assert learner_pack.bullets == [f"point {i}" for i in range(6)]
+    # The question whose answer is not one of its options is dropped
+    assert [q.question for q in learner_pack.quiz] == ["What is tempered?"]
+    assert learner_pack.difficulty_level == "intermediate"
+    assert summary == f"{SUMMARY_HEADING}\n\nA comforting lentil dal."
+
+def test_empty_pack_falls_back_to_the_template(generator, respond):
+    # Every question invalid leaves no quiz, which counts as an empty pack
+    respond(bullets=["point"], quiz=[{**QUESTION, "correct_answer": -1}], summary="A comforting lentil dal.")
+    
+    learner_pack, summary = _generate(generator)
+    
+    assert learner_pack == _template_pack(generator)
+    assert summary == f"{SUMMARY_HEADING}\n\nA comforting lentil dal."
+
+def test_empty_summary_falls_back_to_the_template(generator, respond):
+    respond(bullets=["point"], quiz=[QUESTION], summary="   ")
+    
+    learner_pack, summary = _generate(generator)
+    
+    assert learner_pack.bullets == ["point"]
+    assert summary == _template_summary(generator)
+
+def test_failed_call_uses_both_templates(generator, replay_gateway):
+    # Nothing recorded: the replay backend has no response
+    learner_pack, summary = _generate(generator)
+    
+    assert replay_gateway.backend.misses == 1
+    assert learner_pack == _template_pack(generator)
+    assert summary == _template_summary(generator)
+
+def test_fast_report_makes_no_gateway_call():
+    gateway = RaisingGateway()
+    generator = ReportGenerator(gateway)
+    
+    report = asyncio.run(generator.generate_report(
+        TITLE, 600.0, STEPS, INGREDIENTS, ["pressure cooker"], NUTRITION, [], 1.0, fast=True
+    ))
+    
+    assert gateway.calls == []
+    assert report.learner_pack == _template_pack(generator)
+    assert report.human_summary_markdown == f"{SUMMARY_HEADING}\n\n" + generator._template_summary(
+        TITLE, STEPS, INGREDIENTS, NUTRITION, report.authenticity_score, report.completeness_score
+    )
+
+def test_completeness_counts_tools():
+    generator = ReportGenerator(RaisingGateway())
+    
+    with_tools = generator._calculate_completeness_score(TITLE, STEPS, INGREDIENTS, ["kadai"], NUTRITION)
+    without_tools = generator._calculate_completeness_score(TITLE, STEPS, INGREDIENTS, [], NUTRITION)
+    
+    assert (with_tools, without_tools) == (100, 83)
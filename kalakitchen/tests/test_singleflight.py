@@ -0,0 +1,91 @@
+"""
+Single-flight coalescing of identical requests, including abandoned streams
+"""
+import asyncio
+import gc
+import time
+from kalakitchen.llm.backends import ReplayBackend
+from kalakitchen.llm.gateway import LLMGateway
+from kalakitchen.singleflight import SingleFlight
+
+def test_concurrent_calls_share_one_execution():
+    flights = SingleFlight("test")
+    executed = []
+    
+    async def work():
+        executed.append(1)
+        await asyncio.sleep(0.01)
+        return "done"
+    
+    async def run():
+        return await asyncio.gather(*(flights.do("key", work) for _ in range(5)))
+    
+    assert asyncio.run(run()) == ["done"] * 5
+    assert len(executed) == 1
+    assert flights.stats() == {"calls": 5, "executed": 1, "coalesced": 4}
+
+def test_abandon_after_finish_is_a_no_op():
+    flights = SingleFlight("test")
+    
+    async def run():
+        flight = flights.lead("key")
+        flights.finish("key", "done")
+        flights.abandon("key", flight)
+        return flight.result()
+    
+    assert asyncio.run(run()) == "done"
+
+def test_follower_of_streamed_call_gets_full_text(cassette, record):
+    record("prompt", "ans", "wer")
+    gateway = LLMGateway(backend=ReplayBackend(cassette, latency_seconds=0.05))
+    
+    async def read():
+        stream = await gateway.generate("prompt", bot="test", stream=True)
+        return "".join([chunk.text async for chunk in stream])
+    
+    async def run():
+        return tuple(await asyncio.gather(read(), read()))
+    
+    assert asyncio.run(run()) == ("answer", "answer")
+    assert gateway.telemetry.calls == {("test", "miss"): 1, ("test", "coalesced"): 1}
+
+def _follower_after(release_leader, cassette):
+    """Start a follower behind an unread leader stream, release the leader and time the follower"""
+    gateway = LLMGateway(backend=ReplayBackend(cassette))
+    
+    async def run():
+        streams = [await gateway.generate("prompt", bot="test", stream=True)]
+        follower = asyncio.create_task(gateway.generate("prompt", bot="test", deadline=5.0))
+        await asyncio.sleep(0.01)
+        assert not follower.done()
+        
+        started = time.monotonic()
+        await release_leader(streams)
+        response = await follower
+        return response.text, time.monotonic() - started
+    
+    return asyncio.run(run())
+
+def test_closed_leader_stream_releases_followers(cassette, record):
+    record("prompt", "ans", "wer")
+    
+    async def close(streams):
+        await streams[0].__anext__()
+        await streams[0].aclose()
+    
+    text, elapsed = _follower_after(close, cassette)
+    
+    assert text == "answer"
+    assert elapsed < 1.0
+
+def test_dropped_leader_stream_releases_followers(cassette, record):
+    record("prompt", "ans", "wer")
+    
+    async def drop(streams):
+        streams.clear()
+        gc.collect()
+    
+    text, elapsed = _follower_after(drop, cassette)
+    
+    assert text == "answer"
+    assert elapsed < 1.0
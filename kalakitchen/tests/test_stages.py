@@ -0,0 +1,115 @@
+"""
+Stage graph scheduling, progress and failure handling
+"""
+import asyncio
+import pytest
+from kalakitchen.stages import Stage, StageGraph
+
+def _stage(name, log, depends_on=(), delay=0.0, result=None, error=None, **kwargs):
+    async def run(inputs):
+        log.append(("start", name, sorted(inputs)))
+        await asyncio.sleep(delay)
+        if error:
+            raise error
+        log.append(("end", name))
+        return result if result is not None else name
+    return Stage(name, run, depends_on=depends_on, **kwargs)
+
+def test_independent_stages_overlap_and_dependents_wait():
+    log = []
+    graph = StageGraph([
+        _stage("asr", log, delay=0.05),
+        _stage("keyframes", log, delay=0.05),
+        _stage("claims", log, depends_on=("asr", "keyframes")),
+    ])
+    
+    outputs = asyncio.run(graph.run())
+    
+    assert outputs == {"asr": "asr", "keyframes": "keyframes", "claims": "claims"}
+    # Both independent stages start before either finishes
+    assert [entry[:2] for entry in log[:2]] == [("start", "asr"), ("start", "keyframes")]
+    assert log.index(("start", "claims", ["asr", "keyframes"])) > log.index(("end", "keyframes"))
+
+def test_progress_follows_completed_stage_weights():
+    log = []
+    updates = []
+    graph = StageGraph([
+        _stage("a", log, weight=3, label="Reading"),
+        _stage("b", log, depends_on=("a",), weight=1, label="Writing"),
+    ])
+    
+    asyncio.run(graph.run(on_progress=lambda progress, message: updates.append((progress, message))))
+    
+    assert updates == [(0, "Reading..."), (75, "Writing...")]
+
+def test_completed_stages_are_not_run_again():
+    log = []
+    saved = []
+    graph = StageGraph([_stage("a", log), _stage("b", log, depends_on=("a",))])
+    
+    async def on_complete(stage, output):
+        saved.append((stage.name, output))
+    
+    outputs = asyncio.run(graph.run(completed={"a": "restored", "stale": 1}, on_complete=on_complete))
+    
+    assert outputs == {"a": "restored", "b": "b"}
+    assert [entry[1] for entry in log] == ["b", "b"]
+    assert saved == [("b", "b")]
+
+def test_a_failure_cancels_running_stages_and_is_raised():
+    log = []
+    cancelled = []
+    
+    async def slow(inputs):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append("slow")
+            raise
+    
+    graph = StageGraph([
+        _stage("broken", log, error=RuntimeError("boom")),
+        Stage("slow", slow),
+        _stage("after", log, depends_on=("broken",)),
+    ])
+    
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(graph.run())
+    assert cancelled == ["slow"]
+    assert ("start", "after", ["broken"]) not in log
+
+@pytest.mark.parametrize("stages", [
+    [Stage("a", None), Stage("a", None)],
+    [Stage("a", None, depends_on=("b",)), Stage("b", None, depends_on=("a",))],
+    [Stage("a", None, depends_on=("missing",))],
+])
+def test_invalid_graphs_are_rejected(stages):
+    with pytest.raises(ValueError):
+        StageGraph(stages)
+
+def test_completion_callbacks_do_not_hold_back_dependent_stages():
+    log = []
+    graph = StageGraph([_stage("a", log), _stage("b", log, depends_on=("a",))])
+    
+    async def slow_checkpoint(stage, output):
+        await asyncio.sleep(0.05)
+        log.append(("written", stage.name))
+    
+    asyncio.run(graph.run(on_complete=slow_checkpoint))
+    
+    # b started while a's checkpoint was still being written, and run waited for both
+    assert log.index(("start", "b", ["a"])) < log.index(("written", "a"))
+    assert log[-2:] == [("written", "a"), ("written", "b")]
+
+def test_callbacks_of_finished_stages_complete_before_a_failure_is_raised():
+    log = []
+    written = []
+    graph = StageGraph([_stage("a", log), _stage("b", log, depends_on=("a",), error=RuntimeError("boom"))])
+    
+    async def slow_checkpoint(stage, output):
+        await asyncio.sleep(0.05)
+        written.append(stage.name)
+    
+    with pytest.raises(RuntimeError, match="boom"):
+        asyncio.run(graph.run(on_complete=slow_checkpoint))
+    assert written == ["a"]
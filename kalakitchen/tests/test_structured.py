@@ -0,0 +1,94 @@
+"""
+Incremental JSON parsing and structured output repairs
+"""
+import asyncio
+import json
+from typing import Optional
+from pydantic import BaseModel
+from kalakitchen.llm.backends import ReplayResponse
+from kalakitchen.llm.structured import IncrementalJSONParser, MalformedFragment, StructuredResponder
+
+class Item(BaseModel):
+    name: str
+    grams: float
+    note: Optional[str] = None
+
+class ScriptedClient:
+    """Streams the given response texts in order and keeps the requests"""
+    
+    def __init__(self, *responses: str):
+        self.responses = list(responses)
+        self.requests = []
+    
+    async def generate_content_async(self, contents, generation_config=None, stream=False):
+        self.requests.append((contents, generation_config))
+        text = self.responses.pop(0)
+        
+        async def chunks():
+            for i in range(0, len(text), 7):
+                yield ReplayResponse(text[i:i + 7])
+        
+        return chunks()
+
+def test_parser_reports_object_fields_as_they_complete():
+    parser = IncrementalJSONParser()
+    
+    assert parser.feed('```json\n{"name": "sa') == []
+    assert parser.feed('lt", "grams": 5') == [("name", "salt")]
+    assert parser.feed('.5, "tags": ["a", "b"]}\n```') == [("grams", 5.5), ("tags", ["a", "b"])]
+    assert parser.done
+
+def test_parser_reports_array_items_by_position():
+    parser = IncrementalJSONParser()
+    parser.feed('[{"name": "a"}, {"name": ')
+    parser.feed('"b"}, 3]')
+    
+    assert parser.close() == [(0, {"name": "a"}), (1, {"name": "b"}), (2, 3)]
+
+def test_parser_marks_malformed_and_truncated_children():
+    parser = IncrementalJSONParser()
+    parser.feed('{"grams": 5..0, "name": "sal')
+    items = parser.close()
+    
+    assert [key for key, _ in items] == ["grams", "name"]
+    assert all(isinstance(value, MalformedFragment) for _, value in items)
+    assert items[1][1].error == "truncated"
+
+def test_malformed_optional_field_is_repaired():
+    client = ScriptedClient('{"name": "salt", "grams": 5, "note": "pin', '{"note": "pinch"}')
+    
+    item = asyncio.run(StructuredResponder(client, max_repairs=1).generate_model("prompt", Item))
+    
+    assert item == Item(name="salt", grams=5, note="pinch")
+    repair_schema = client.requests[1][1]["response_schema"]
+    assert list(repair_schema["properties"]) == ["note"]
+
+def test_unrepaired_optional_field_keeps_default():
+    client = ScriptedClient('{"name": "salt", "grams": 5, "note": "pin')
+    
+    item = asyncio.run(StructuredResponder(client, max_repairs=0).generate_model("prompt", Item))
+    
+    assert item == Item(name="salt", grams=5)
+
+def test_list_repair_replaces_items_in_place():
+    client = ScriptedClient(
+        '[{"name": "salt", "grams": 5}, {"name": "oil", "grams": "lots"}, {"name": "rice", "grams": 200}]',
+        '{"1": {"name": "oil", "grams": 30}}'
+    )
+    
+    items = asyncio.run(StructuredResponder(client, max_repairs=1).generate_list("prompt", Item))
+    
+    assert [(item.name, item.grams) for item in items] == [("salt", 5), ("oil", 30), ("rice", 200)]
+    repair_prompt = client.requests[1][0][-1]
+    assert '"1"' in repair_prompt and "lots" in repair_prompt
+    assert list(client.requests[1][1]["response_schema"]["properties"]) == ["1"]
+
+def test_list_items_still_invalid_after_repair_are_dropped():
+    client = ScriptedClient(
+        '[{"name": "salt", "grams": 5}, {"name": "oil", "grams": "lots"}]',
+        '{"1": {"name": "oil", "grams": "plenty"}}'
+    )
+    
+    items = asyncio.run(StructuredResponder(client, max_repairs=1).generate_list("prompt", Item))
+    
+    assert [item.name for item in items] == ["salt"]
@@ -0,0 +1,106 @@
+"""
+FoodData Central snapshot import and food lookup
+"""
+import asyncio
+import csv
+import threading
+import pytest
+from kalakitchen.bots import web_enricher
+from kalakitchen.bots.web_enricher import WebEnricher
+from kalakitchen.models import NutritionPer100g
+from kalakitchen.reference.usda import USDASnapshot, import_snapshot
+
+# (fdc_id, data_type, description, {nutrient_id: amount}), after the real SR Legacy and Foundation rows
+FOODS = {
+    "sr_legacy": [
+        (1001, "sr_legacy_food", "Spices, turmeric, ground", {1008: 312, 1003: 9.7, 1093: 27}),
+        (1002, "sr_legacy_food", "Spices, curry powder", {1008: 325}),
+        (1003, "sr_legacy_food", "Spices, garlic powder", {1008: 331}),
+        (1004, "sr_legacy_food", "Spices, chili powder", {1008: 282}),
+        (1005, "sr_legacy_food", "Cocoa, dry powder, unsweetened", {1008: 228}),
+        (1006, "sr_legacy_food", "Onions, raw", {1008: 40, 2000: 4.2, 1063: 4.0}),
+        (1007, "sr_legacy_food", "Onions, sweet, raw", {1008: 32}),
+        (1008, "sr_legacy_food", "Onion rings, breaded, par fried, frozen, prepared, heated in oven", {1008: 407}),
+        (1009, "sr_legacy_food", "Peppers, sweet, red, raw", {1008: 31}),
+        (1010, "sr_legacy_food", "Cabbage, red, raw", {1008: 31}),
+        # Branded foods are not imported
+        (1011, "branded_food", "TURMERIC POWDER", {1008: 999}),
+    ],
+    "foundation": [
+        # Foundation foods report energy by Atwater factors only
+        (2001, "foundation_food", "Onions, red, raw", {2048: 42, 2047: 44, 1003: 0.9, 1162: ""}),
+        (2002, "foundation_food", "Onions, yellow, raw", {2047: 38}),
+    ],
+}
+
+def _write_dataset(directory, rows):
+    directory.mkdir()
+    with open(directory / "food.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["fdc_id", "data_type", "description", "food_category_id", "publication_date"])
+        writer.writerows((fdc_id, data_type, description, "", "") for fdc_id, data_type, description, _ in rows)
+    with open(directory / "food_nutrient.csv", "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "fdc_id", "nutrient_id", "amount"])
+        for fdc_id, _, _, amounts in rows:
+            # Nutrients outside NutritionPer100g are skipped
+            writer.writerow([f"{fdc_id}0", fdc_id, 1051, 80.0])
+            writer.writerows((f"{fdc_id}{nutrient_id}", fdc_id, nutrient_id, amount) for nutrient_id, amount in amounts.items())
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    for name, rows in FOODS.items():
+        _write_dataset(tmp_path / name, rows)
+    path = tmp_path / "usda.sqlite3"
+    assert import_snapshot([tmp_path / name for name in FOODS], path) == 12
+    return path
+
+@pytest.fixture
+def snapshot(snapshot_path):
+    return USDASnapshot(snapshot_path)
+
+def test_spice_powders_find_the_ground_spice(snapshot):
+    turmeric = snapshot.lookup("turmeric powder")
+    
+    assert (turmeric.calories, turmeric.protein_g, turmeric.sodium_mg) == (312, 9.7, 27)
+    assert snapshot.lookup("Garlic Powder").calories == 331
+
+def test_a_variety_beats_the_plain_food_and_other_red_foods(snapshot):
+    assert snapshot.lookup("red onion").calories == 44
+    assert snapshot.lookup("onions").calories == 40
+
+def test_preferred_nutrient_sources_fill_each_field(snapshot):
+    onion = snapshot.lookup("onion")
+    red_onion = snapshot.lookup("red onion")
+    
+    # "Sugars, total including NLEA" before "Sugars, Total"; General before Specific Atwater energy
+    assert onion.sugar_g == 4.2
+    assert red_onion.calories == 44
+    # Empty amounts are missing values
+    assert red_onion.vitamin_c_mg is None and onion.fat_g is None
+
+def test_unknown_names_find_nothing(snapshot):
+    assert snapshot.lookup("asafoetida") is None
+    assert snapshot.lookup("!!") is None
+
+def test_reimport_replaces_the_snapshot(tmp_path, snapshot_path):
+    _write_dataset(tmp_path / "smaller", FOODS["foundation"])
+    
+    assert import_snapshot([tmp_path / "smaller"], snapshot_path) == 2
+    assert USDASnapshot(snapshot_path).lookup("turmeric") is None
+
+def test_enrichment_looks_the_snapshot_up_off_the_event_loop(replay_gateway, monkeypatch):
+    threads = []
+    
+    class RecordingSnapshot:
+        def lookup(self, name):
+            threads.append(threading.current_thread())
+            return NutritionPer100g(calories=312)
+    
+    monkeypatch.setattr(web_enricher, "get_usda_snapshot", RecordingSnapshot)
+    enricher = WebEnricher(replay_gateway)
+    
+    nutrition = asyncio.run(enricher._fetch_nutrition_data("turmeric", "turmeric"))
+    
+    assert nutrition.calories == 312
+    assert threads and threads[0] is not threading.main_thread()
@@ -3,27 +3,51 @@ KalaKitchen Main Workflow - Orchestrates the complete video analysis pipeline
 """
 import asyncio
 import time
+from datetime import datetime
 from pathlib import Path
 from typing import Dict, Any, Optional
-from .models import ProcessingStatus, RecipeAnalysisReport, VideoMetadata
+from .config import settings
+from .models import (
+    Ingredient, ProcessingStatus, RecipeAnalysisReport, VideoMetadata, QuantityResolutionStats,
+    TranscriptSegment, KeyframeData, ExtractedClaims, NutritionSummary
+)
+from .evidence import EvidenceIndex
 from .bots.video_ingest import VideoIngestBot
 from .bots.asr import ASRBot
 from .bots.keyframe import KeyframeBot
 from .bots.claim_extractor import ClaimExtractor
-from .bots.web_enricher import WebEnricher
+from .bots.web_enricher import (
+    WebEnricher, USDA_FLIGHTS, USDA_BREAKER, GEMINI_BREAKER, ENRICHMENT_MISSES, ENRICHED_FIELDS
+)
 from .bots.quantity_resolver import QuantityResolver
 from .bots.nutrition_mapper import NutritionMapper
 from .bots.report_generator import ReportGenerator
+from .llm.gateway import LLMGateway, get_default_gateway
+from .llm.telemetry import current_job
+from .enrichment_store import get_enrichment_store
+from .http_pool import HTTPClientPool, get_http_pool
+from .report_store import get_report_store
+from .checkpoint_store import get_checkpoint_store
+from .reference.canonical import get_canonicalizer
+from .stages import Stage, StageGraph
+
+# Checkpoint of the quantity resolution counts, saved with the quantities stage
+QUANTITY_STATS_CHECKPOINT = "quantity_resolution"
 
 class KalaKitchenWorkflow:
-    def __init__(self):
+    def __init__(self, gateway: Optional[LLMGateway] = None, http_pool: Optional[HTTPClientPool] = None):
+        # One gateway shared by every bot: common cache, rate limits and retries
+        self.gateway = gateway or get_default_gateway()
+        # One HTTP session shared by every job: keep-alive, DNS cache, per-host limits
+        self.http_pool = http_pool or get_http_pool()
+        
         self.video_ingest = VideoIngestBot()
-        self.asr = ASRBot()
-        self.keyframe = KeyframeBot()
-        self.claim_extractor = ClaimExtractor()
-        self.quantity_resolver = QuantityResolver()
+        self.asr = ASRBot(self.gateway)
+        self.keyframe = KeyframeBot(self.gateway)
+        self.claim_extractor = ClaimExtractor(self.gateway)
+        self.quantity_resolver = QuantityResolver(self.gateway)
         self.nutrition_mapper = NutritionMapper()
-        self.report_generator = ReportGenerator()
+        self.report_generator = ReportGenerator(self.gateway)
         
         # Status tracking
         self.processing_status: Dict[str, ProcessingStatus] = {}
@@ -32,9 +56,12 @@ class KalaKitchenWorkflow:
                           video_file: bytes,
                           filename: str,
                           language: str = "en",
-                          region: str = "US") -> str:
+                          region: str = "US",
+                          fast_report: bool = False) -> str:
         """
-        Start video analysis workflow and return video_id for status tracking
+        Start video analysis workflow and return video_id for status tracking.
+        fast_report builds the learner pack and summary from templates
+        instead of Gemini.
         """
         start_time = time.time()
         
@@ -53,8 +80,14 @@ class KalaKitchenWorkflow:
                 started_at=metadata.upload_time
             )
             
+            # Remember the job parameters so the job can be resumed
+            if settings.CHECKPOINTS_ENABLED:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, get_checkpoint_store().save_job, video_id, metadata, fast_report
+                )
+            
             # Run analysis pipeline asynchronously
-            asyncio.create_task(self._run_analysis_pipeline(video_id, metadata, start_time))
+            asyncio.create_task(self._run_analysis_pipeline(video_id, metadata, start_time, fast_report))
             
             return video_id
             
@@ -74,85 +107,251 @@ class KalaKitchenWorkflow:
     async def _run_analysis_pipeline(self,
                                    video_id: str,
                                    metadata: VideoMetadata,
-                                   start_time: float):
+                                   start_time: float,
+                                   fast_report: bool = False,
+                                   resume: bool = False):
         """
-        Run the complete analysis pipeline
+        Run the complete analysis pipeline. With resume, stages that have a
+        checkpoint from an earlier run are restored instead of run again.
         """
+        # Attribute every LLM call made from this task to the job
+        current_job.set(video_id)
+        self.processing_status[video_id].llm_usage = self.gateway.telemetry.start_job(video_id)
+        
         try:
-            # Step 2: Audio Transcription
-            self._update_status(video_id, 15, "Transcribing audio...")
-            proxy_path = self.video_ingest.get_proxy_path(video_id)
-            transcript = await self.asr.transcribe_video(proxy_path)
-            
-            # Step 3: Keyframe Analysis
-            self._update_status(video_id, 30, "Analyzing keyframes...")
-            keyframes_path = self.video_ingest.get_keyframes_path(video_id)
-            keyframes = await self.keyframe.analyze_keyframes(keyframes_path)
+            graph = self._analysis_stages(video_id, metadata, start_time, fast_report)
+            completed = {}
+            if resume:
+                completed = await asyncio.get_running_loop().run_in_executor(
+                    None, self._load_checkpoints, video_id, graph
+                )
+                self.processing_status[video_id].completed_stages = list(completed)
+                if "quantities" in completed:
+                    # The restored stage is not run again, so keep the counts of the earlier run
+                    quantity_stats = await asyncio.get_running_loop().run_in_executor(
+                        None, self._load_quantity_stats, video_id
+                    )
+                    self.processing_status[video_id].quantity_resolution = quantity_stats
             
-            # Step 4: Claim Extraction
-            self._update_status(video_id, 45, "Extracting recipe claims...")
-            claims = await self.claim_extractor.extract_claims(
-                transcript, keyframes, metadata.duration_seconds, 
-                metadata.language, metadata.region
+            outputs = await graph.run(
+                lambda progress, stage: self._update_status(video_id, progress, stage),
+                completed=completed,
+                on_complete=lambda stage, output: self._checkpoint(video_id, stage, output)
             )
+            report = outputs["report"]
             
-            # Step 5: Quantity Resolution
-            self._update_status(video_id, 60, "Resolving ingredient quantities...")
-            resolved_ingredients = await self.quantity_resolver.resolve_quantities(
-                claims["ingredients"], transcript, keyframes
-            )
+            # Complete
+            self._update_status(video_id, 100, "Analysis complete!")
+            self.processing_status[video_id].status = "completed"
+            self.processing_status[video_id].result = report
+            self.processing_status[video_id].completed_at = metadata.upload_time
             
-            # Step 6: Web Enrichment
-            self._update_status(video_id, 75, "Enriching with web data...")
-            async with WebEnricher() as enricher:
-                enriched_ingredients = await enricher.enrich_ingredients(resolved_ingredients)
+            # Keep the report for later requests and nutrition recomputation
+            if settings.REPORT_STORE_ENABLED:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, get_report_store().save, video_id, report
+                )
             
-            # Step 7: Nutrition Mapping
-            self._update_status(video_id, 85, "Calculating nutrition...")
-            nutrition_summary = self.nutrition_mapper.calculate_nutrition_summary(
-                enriched_ingredients
-            )
+            # Cleanup temporary files and checkpoints
+            self.video_ingest.cleanup_temp_files(video_id)
+            if settings.CHECKPOINTS_ENABLED:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, get_checkpoint_store().clear, video_id
+                )
             
-            # Step 8: Report Generation
-            self._update_status(video_id, 95, "Generating final report...")
+        except Exception as e:
+            # Update status with error
+            self.processing_status[video_id].status = "failed"
+            self.processing_status[video_id].error_message = str(e)
+            print(f"Analysis pipeline failed for video {video_id}: {e}")
+        finally:
+            self.gateway.telemetry.finish_job(video_id)
+    
+    def _analysis_stages(self,
+                         video_id: str,
+                         metadata: VideoMetadata,
+                         start_time: float,
+                         fast_report: bool) -> StageGraph:
+        """
+        Pipeline stages as a dependency graph. Transcription and keyframe
+        analysis are independent, and enrichment needs only the extracted
+        ingredient names, so it runs alongside quantity resolution. Both work
+        on their own copies of the ingredients, merged before nutrition.
+        """
+        
+        async def transcribe(inputs):
+            return await self.asr.transcribe_video(self.video_ingest.get_proxy_path(video_id))
+        
+        async def analyze_keyframes(inputs):
+            return await self.keyframe.analyze_keyframes(self.video_ingest.get_keyframes_path(video_id))
+        
+        async def extract_claims(inputs):
+            extracted = await self.claim_extractor.extract_claims(
+                inputs["transcript"], inputs["keyframes"], metadata.duration_seconds,
+                metadata.language, metadata.region
+            )
+            claims = ExtractedClaims(
+                recipe_title=extracted["recipe_title"],
+                steps=extracted["steps"],
+                ingredients=extracted["ingredients"],
+                tools=extracted["tools"]
+            )
+            # Map ingredient names to canonical IDs once for all later stages
+            await asyncio.get_running_loop().run_in_executor(
+                None, get_canonicalizer().canonicalize_ingredients, claims.ingredients
+            )
+            return claims
+        
+        async def resolve_quantities(inputs):
+            transcript, keyframes = inputs["transcript"], inputs["keyframes"]
+            quantity_stats = QuantityResolutionStats()
+            self.processing_status[video_id].quantity_resolution = quantity_stats
+            return await self.quantity_resolver.resolve_quantities(
+                [ingredient.copy(deep=True) for ingredient in inputs["claims"].ingredients],
+                transcript, keyframes, EvidenceIndex(transcript, keyframes), quantity_stats
+            )
+        
+        async def enrich(inputs):
+            async with WebEnricher(self.gateway, session=self.http_pool.session()) as enricher:
+                return await enricher.enrich_ingredients(
+                    [ingredient.copy(deep=True) for ingredient in inputs["claims"].ingredients]
+                )
+        
+        async def merge_ingredients(inputs):
+            return [
+                _with_enrichment(resolved, enriched)
+                for resolved, enriched in zip(inputs["quantities"], inputs["enrichment"])
+            ]
+        
+        async def map_nutrition(inputs):
+            return self.nutrition_mapper.calculate_nutrition_summary(inputs["ingredients"])
+        
+        async def generate_report(inputs):
+            claims, ingredients = inputs["claims"], inputs["ingredients"]
             
             # Collect all citations from enriched ingredients
             citations = []
-            for ingredient in enriched_ingredients:
+            for ingredient in ingredients:
                 for note in ingredient.medicinal_notes:
                     citations.extend(note.sources)
             
-            processing_time = time.time() - start_time
-            
             report = await self.report_generator.generate_report(
-                recipe_title=claims["recipe_title"],
+                recipe_title=claims.recipe_title,
                 duration_seconds=metadata.duration_seconds,
-                steps=claims["steps"],
-                ingredients=enriched_ingredients,
-                tools=claims["tools"],
-                nutrition_summary=nutrition_summary,
+                steps=claims.steps,
+                ingredients=ingredients,
+                tools=claims.tools,
+                nutrition_summary=inputs["nutrition"],
                 citations=citations,
-                processing_time=processing_time
+                processing_time=time.time() - start_time,
+                fast=fast_report
             )
             
             # Add raw data for debugging
-            report.raw_transcript = transcript
-            report.raw_keyframes = keyframes
-            
-            # Step 9: Complete
-            self._update_status(video_id, 100, "Analysis complete!")
-            self.processing_status[video_id].status = "completed"
-            self.processing_status[video_id].result = report
-            self.processing_status[video_id].completed_at = metadata.upload_time
-            
-            # Cleanup temporary files
-            self.video_ingest.cleanup_temp_files(video_id)
-            
+            report.raw_transcript = inputs["transcript"]
+            report.raw_keyframes = inputs["keyframes"]
+            return report
+        
+        return StageGraph([
+            Stage("transcript", transcribe, weight=25, label="Transcribing audio",
+                  artifact=TranscriptSegment, many=True),
+            Stage("keyframes", analyze_keyframes, weight=25, label="Analyzing keyframes",
+                  artifact=KeyframeData, many=True),
+            Stage("claims", extract_claims, ["transcript", "keyframes"], weight=20,
+                  label="Extracting recipe claims", artifact=ExtractedClaims),
+            Stage("quantities", resolve_quantities, ["transcript", "keyframes", "claims"], weight=10,
+                  label="Resolving ingredient quantities", artifact=Ingredient, many=True),
+            Stage("enrichment", enrich, ["claims"], weight=10, label="Enriching with web data",
+                  artifact=Ingredient, many=True),
+            Stage("ingredients", merge_ingredients, ["quantities", "enrichment"], weight=0,
+                  label="Merging ingredient data", artifact=Ingredient, many=True),
+            Stage("nutrition", map_nutrition, ["ingredients"], weight=2, label="Calculating nutrition",
+                  artifact=NutritionSummary),
+            Stage("report", generate_report, ["claims", "ingredients", "nutrition", "transcript", "keyframes"],
+                  weight=8, label="Generating final report"),
+        ])
+    
+    async def _checkpoint(self, video_id: str, stage: Stage, output: Any):
+        """Record a finished stage and persist its output for resuming"""
+        self.processing_status[video_id].completed_stages.append(stage.name)
+        if not settings.CHECKPOINTS_ENABLED or stage.artifact is None:
+            return
+        loop = asyncio.get_running_loop()
+        store = get_checkpoint_store()
+        try:
+            # Counts first, so a restored quantities stage always has its counts
+            quantity_stats = self.processing_status[video_id].quantity_resolution
+            if stage.name == "quantities" and quantity_stats is not None:
+                await loop.run_in_executor(None, store.save, video_id, QUANTITY_STATS_CHECKPOINT, quantity_stats)
+            await loop.run_in_executor(None, store.save, video_id, stage.name, output)
         except Exception as e:
-            # Update status with error
-            self.processing_status[video_id].status = "failed"
-            self.processing_status[video_id].error_message = str(e)
-            print(f"Analysis pipeline failed for video {video_id}: {e}")
+            # The job goes on; a later resume just repeats this stage
+            print(f"Could not checkpoint stage {stage.name} of {video_id}: {e}")
+    
+    def _load_checkpoints(self, video_id: str, graph: StageGraph) -> Dict[str, Any]:
+        """Outputs of the stages checkpointed by an earlier run of this job"""
+        store = get_checkpoint_store()
+        completed = {}
+        for name in graph.order:
+            stage = graph.stages[name]
+            if stage.artifact is None or not all(dep in completed for dep in stage.depends_on):
+                continue
+            try:
+                output = store.load(video_id, name, stage.artifact, stage.many)
+            except Exception as e:
+                print(f"Ignoring unreadable checkpoint {name} of {video_id}: {e}")
+                continue
+            if output is not None:
+                completed[name] = output
+        return completed
+    
+    def _load_quantity_stats(self, video_id: str) -> Optional[QuantityResolutionStats]:
+        """Quantity resolution counts checkpointed with the quantities stage"""
+        try:
+            return get_checkpoint_store().load(video_id, QUANTITY_STATS_CHECKPOINT, QuantityResolutionStats)
+        except Exception as e:
+            print(f"Ignoring unreadable checkpoint {QUANTITY_STATS_CHECKPOINT} of {video_id}: {e}")
+            return None
+    
+    async def resume_analysis(self, video_id: str) -> str:
+        """
+        Restart a failed or interrupted job (also one from an earlier process)
+        from its checkpointed stages. Raises KeyError when the job has no
+        checkpoint and ValueError while it is still running.
+        """
+        previous = self.processing_status.get(video_id)
+        if previous and previous.status == "processing":
+            raise ValueError(f"Analysis of {video_id} is still in progress")
+        
+        # Claim the job before awaiting the checkpoint read, so a second
+        # resume request arriving meanwhile is rejected above
+        status = ProcessingStatus(
+            video_id=video_id,
+            status="processing",
+            progress=0,
+            current_stage="Resuming from checkpoints",
+            started_at=datetime.now()
+        )
+        self.processing_status[video_id] = status
+        try:
+            job = await asyncio.get_running_loop().run_in_executor(
+                None, get_checkpoint_store().load_job, video_id
+            )
+            if job is None:
+                raise KeyError(video_id)
+        except Exception:
+            if previous is None:
+                del self.processing_status[video_id]
+            else:
+                self.processing_status[video_id] = previous
+            raise
+        metadata, fast_report = job
+        status.started_at = metadata.upload_time
+        
+        asyncio.create_task(
+            self._run_analysis_pipeline(video_id, metadata, time.time(), fast_report, resume=True)
+        )
+        return video_id
     
     def _update_status(self, video_id: str, progress: int, stage: str):
         """Update processing status"""
@@ -164,22 +363,76 @@ class KalaKitchenWorkflow:
         """Get processing status for a video"""
         return self.processing_status.get(video_id)
     
+    async def warm_up(self):
+        """
+        Open the shared HTTP pool and preload reusable per-ingredient enrichment
+        so common ingredients are local reads
+        """
+        await self.http_pool.start()
+        if settings.ENRICHMENT_STORE_ENABLED:
+            store = get_enrichment_store()
+            loaded = await asyncio.get_running_loop().run_in_executor(
+                None, store.warm, settings.ENRICHMENT_STORE_WARM_ENTRIES
+            )
+            print(f"Enrichment store warmed with {loaded} entries")
+    
+    async def close(self):
+        """Release process-wide resources (pooled HTTP connections)"""
+        await self.http_pool.close()
+        if settings.ENRICHMENT_STORE_ENABLED:
+            await asyncio.get_running_loop().run_in_executor(None, get_enrichment_store().flush)
+    
+    def get_enrichment_stats(self) -> Dict[str, Any]:
+        """Enrichment lookups served from the persistent store"""
+        if not settings.ENRICHMENT_STORE_ENABLED:
+            return {"enabled": False}
+        return {"enabled": True, **get_enrichment_store().stats()}
+    
+    def get_breaker_stats(self) -> Dict[str, Any]:
+        """Enrichment source circuit breakers and cached "not found" answers"""
+        return {
+            "usda": USDA_BREAKER.stats(),
+            "gemini_enrichment": GEMINI_BREAKER.stats(),
+            "negative_cache": ENRICHMENT_MISSES.stats()
+        }
+    
+    def get_coalescing_stats(self) -> Dict[str, Any]:
+        """Calls saved by single-flight coalescing of identical concurrent requests"""
+        return {
+            "llm": self.gateway.flights.stats(),
+            "usda": USDA_FLIGHTS.stats()
+        }
+    
+    def get_metrics(self) -> str:
+        """Process-wide LLM and coalescing metrics in Prometheus text format"""
+        lines = [
+            "# HELP kalakitchen_coalesced_calls_total Calls saved by single-flight coalescing",
+            "# TYPE kalakitchen_coalesced_calls_total counter",
+        ]
+        for group, stats in self.get_coalescing_stats().items():
+            lines.append(f'kalakitchen_coalesced_calls_total{{group="{group}"}} {stats["coalesced"]}')
+        return self.gateway.telemetry.render_prometheus() + "\n".join(lines) + "\n"
+    
     def get_result(self, video_id: str) -> Optional[RecipeAnalysisReport]:
         """Get analysis result for a completed video"""
         status = self.processing_status.get(video_id)
         if status and status.status == "completed":
             return status.result
+        if status is None and settings.REPORT_STORE_ENABLED:
+            # Finished in an earlier process (possibly recomputed since)
+            return get_report_store().load(video_id)
         return None
     
     async def analyze_video_sync(self,
                                video_file: bytes,
                                filename: str,
                                language: str = "en",
-                               region: str = "US") -> RecipeAnalysisReport:
+                               region: str = "US",
+                               fast_report: bool = False) -> RecipeAnalysisReport:
         """
         Synchronous version that waits for complete analysis
         """
-        video_id = await self.analyze_video(video_file, filename, language, region)
+        video_id = await self.analyze_video(video_file, filename, language, region, fast_report)
         
         # Wait for completion
         while True:
@@ -193,4 +446,8 @@ class KalaKitchenWorkflow:
                 raise Exception(f"Analysis failed: {status.error_message}")
             
             # Wait before checking again
-            await asyncio.sleep(1)
\ No newline at end of file
+            await asyncio.sleep(1)
+
+def _with_enrichment(resolved: Ingredient, enriched: Ingredient) -> Ingredient:
+    """The resolved ingredient carrying the enrichment results of its enriched copy"""
+    return resolved.copy(update={field: getattr(enriched, field) for field in ENRICHED_FIELDS})
\ No newline at end of file